@@ -0,0 +1,101 @@
+"""
+下载性能测试：在本地启动 HTTP 服务提供测试文件，对比逐字节下载与分块下载的吞吐量，
+并测试中断后的 Range 续传
+
+用法（在项目根目录下）：
+    python benchmarks/bench_download.py [文件大小MB] [逐字节下载的大小MB]
+"""
+import asyncio
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+
+from utils.requests import close_client, download  # noqa: E402
+
+
+def make_handler(data: bytes):
+    class Handler(BaseHTTPRequestHandler):
+        """提供测试文件，支持 Range 请求"""
+
+        def do_GET(self):
+            start = 0
+            range_header = self.headers.get('Range')
+            if range_header:
+                start = int(range_header.split('=')[1].split('-')[0])
+                if start >= len(data):
+                    self.send_response(416)
+                    self.send_header('Content-Range', f'bytes */{len(data)}')
+                    self.end_headers()
+                    return
+                self.send_response(206)
+                self.send_header('Content-Range', f'bytes {start}-{len(data) - 1}/{len(data)}')
+            else:
+                self.send_response(200)
+            self.send_header('Content-Length', str(len(data) - start))
+            self.end_headers()
+            self.wfile.write(data[start:])
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+async def download_bytewise(url: str, save_path: Path):
+    """优化前的方式：每次读取1字节"""
+    async with httpx.AsyncClient().stream(method='GET', url=url, follow_redirects=True) as datas:
+        with save_path.open('wb') as f:
+            async for chunk in datas.aiter_bytes(1):
+                f.write(chunk)
+
+
+async def bench(url: str, tmp_dir: Path, size_mb: int, legacy_url: str, legacy_mb: int, data: bytes):
+    start_time = time.perf_counter()
+    await download_bytewise(legacy_url, tmp_dir / 'legacy.bin')
+    legacy_speed = legacy_mb / (time.perf_counter() - start_time)
+
+    start_time = time.perf_counter()
+    digest = await download(url, tmp_dir / 'chunked.bin')
+    chunked_speed = size_mb / (time.perf_counter() - start_time)
+    assert digest == hashlib.md5(data).hexdigest()
+
+    # 模拟下载中断：.part 中只有前一半内容
+    part_path = tmp_dir / 'resume.bin.part'
+    part_path.write_bytes(data[:len(data) // 2])
+    start_time = time.perf_counter()
+    digest = await download(url, tmp_dir / 'resume.bin', hashlib.md5(data).hexdigest())
+    resume_time = time.perf_counter() - start_time
+    await close_client()
+
+    print(f"逐字节下载（{legacy_mb}MB）：{legacy_speed:.2f} MB/秒")
+    print(f"分块下载（{size_mb}MB）：{chunked_speed:.2f} MB/秒（{chunked_speed / legacy_speed:.0f}倍）")
+    print(f"续传剩余一半用时：{resume_time:.2f} 秒，哈希校验通过")
+
+
+def main():
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    legacy_mb = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    data = os.urandom(size_mb * 1024 * 1024)
+    servers = []
+    for payload in (data, data[:legacy_mb * 1024 * 1024]):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(payload))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    url, legacy_url = (f'http://127.0.0.1:{server.server_port}/file.bin' for server in servers)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        asyncio.run(bench(url, Path(tmp_dir), size_mb, legacy_url, legacy_mb, data))
+    for server in servers:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+日志性能测试：对比每条日志都读取配置文件获取版本号与缓存版本号两种方式的每秒日志条数
+
+两种方式交替运行 ROUNDS 轮，取每秒条数的中位数
+
+用法（在项目根目录下）：
+    python benchmarks/bench_log.py [日志条数]
+"""
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loguru import logger  # noqa: E402
+
+from utils import log as log_module  # noqa: E402
+from utils.config import ConfigurationManager  # noqa: E402
+
+ROUNDS = 5
+
+
+def get_ver_uncached():
+    """优化前的方式：每条日志都读取一次配置文件"""
+    ver = ConfigurationManager.read_json_file(
+        ConfigurationManager.CONFIG_FILE_NAME).get("version", "")
+    if ver == "":
+        month, day, hour, minute = log_module.get_folder_modified_time('map')
+        ver = f"{month:02d}{day:02d}{hour:02d}{minute:02d}"
+    return ver
+
+
+def make_patch(get_ver):
+    def update_extra(record):
+        record["new_module"] = f"{record['module']}.{record['function']}:{record['line']}"
+        record["VER"] = get_ver()
+    return update_extra
+
+
+def bench(get_ver, count: int) -> float:
+    """返回每秒日志条数"""
+    bench_log = logger.patch(make_patch(get_ver))
+    start_time = time.perf_counter()
+    for index in range(count):
+        bench_log.info(f"执行map_1-1_1文件:{index}/{count}")
+    return count / (time.perf_counter() - start_time)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    logger.remove()
+    logger.add(lambda message: None, format="{time:HH:mm:ss} - {new_module} - {VER} - {message}")
+    ConfigurationManager().config_file  # 预先读取配置
+
+    results = {get_ver_uncached: [], log_module.get_ver: []}
+    for _ in range(ROUNDS):
+        for get_ver, rates in results.items():
+            rates.append(bench(get_ver, count))
+    before = statistics.median(results[get_ver_uncached])
+    after = statistics.median(results[log_module.get_ver])
+    print(f"每条日志读取配置：{before:,.0f} 条/秒")
+    print(f"缓存版本号：{after:,.0f} 条/秒（{after / before:.1f}倍）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+移动计时精度测试：对比 handle_move 原来的忙等循环与 MoveTimer 的超时分布（实际时间 - 计划时间）
+与占用的 CPU 时间，MoveTimer 同时按 Handle.RUN_FIX_INTERVAL 执行一个模拟识图的回调。
+按键通过 RecordingBackend 记录，按住时间取按下与抬起事件的时间差
+
+用法（在项目根目录下）：
+    python benchmarks/bench_move_timing.py [次数] [识图耗时毫秒]
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.input_backend import RecordingBackend  # noqa: E402
+from utils.move_timer import MoveTimer  # noqa: E402
+
+RUN_FIX_INTERVAL = 0.02
+RUN_FIX_LIMIT = 0.3
+
+
+def busy_loop(backend: RecordingBackend, value: float, check_cost: float):
+    """优化前的方式：前 0.3 秒内连续识图，之后忙等到结束"""
+    backend.press("w")
+    start_time = time.perf_counter()
+    while time.perf_counter() - start_time < value:
+        if time.perf_counter() - start_time <= RUN_FIX_LIMIT:
+            time.sleep(check_cost)
+    backend.release("w")
+
+
+def move_timer(backend: RecordingBackend, value: float, check_cost: float):
+    backend.press("w")
+    timer = MoveTimer(value)
+    timer.at(0, lambda _: time.sleep(check_cost), RUN_FIX_INTERVAL, RUN_FIX_LIMIT)
+    timer.wait()
+    backend.release("w")
+
+
+def bench(func, values: list, check_cost: float) -> tuple:
+    overshoots = []
+    backend = RecordingBackend()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    for value in values:
+        func(backend, value, check_cost)
+        down, up = backend.events[-2:]
+        overshoots.append((up.ts - down.ts - value) * 1000)
+    cpu_ratio = (time.process_time() - cpu_start) / (time.perf_counter() - wall_start)
+    return sorted(overshoots), cpu_ratio
+
+
+def report(name: str, overshoots: list, cpu_ratio: float):
+    def percentile(p):
+        return overshoots[min(len(overshoots) - 1, int(len(overshoots) * p))]
+    print(f"{name}：超时 中位数 {statistics.median(overshoots):.3f}ms  P90 {percentile(0.9):.3f}ms  "
+          f"P99 {percentile(0.99):.3f}ms  最大 {overshoots[-1]:.3f}ms  "
+          f">50ms {sum(o > 50 for o in overshoots)}次  CPU占用 {cpu_ratio:.0%}")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    check_cost = (float(sys.argv[2]) if len(sys.argv) > 2 else 5) / 1000
+    random.seed(0)
+    values = [round(random.uniform(0.05, 1.5), 4) for _ in range(count)]
+    report("忙等循环", *bench(busy_loop, values, check_cost))
+    report("MoveTimer", *bench(move_timer, values, check_cost))
+
+
+if __name__ == "__main__":
+    main()
@@ -89,7 +89,7 @@ def main():
     if start:
         map_instance = Map()
         cfg.config_fix()
-        log.info(f"config.json:{cfg.load_config()}")
+        log.info(f"config.json:{dict(cfg.config_file)}")
         log.info("切换至游戏窗口，请确保1号位角色普攻为远程，黄泉地图1号位为黄泉")
         check_mult_screen()
         switch_window()
@@ -101,17 +101,17 @@ def main():
         start_time = datetime.datetime.now()
         map_instance.process_map(start, start_in_mid, dev=dev)  # 读取配置
         start_map = "1-1_0"
-        allow_run_again = cfg.read_json_file(cfg.CONFIG_FILE_NAME, False).get(
+        allow_run_again = cfg.config_file.get(
             "allow_run_again", False
         )
         if allow_run_again:
             map_instance.process_map(start_map, start_in_mid, dev=dev)
         end_time = datetime.datetime.now()
-        shutdown_type = cfg.read_json_file(cfg.CONFIG_FILE_NAME, False).get(
+        shutdown_type = cfg.config_file.get(
             "auto_shutdown", 0
         )
         shutdown_computer(shutdown_type)
-        if cfg.read_json_file(cfg.CONFIG_FILE_NAME, False).get(
+        if cfg.config_file.get(
             "allow_run_next_day", False
         ):
             log.info("开始执行跨日连锄")
@@ -136,7 +136,7 @@ def main():
                     map_instance.process_map(start_map, start_in_mid, dev=dev)
                 else:
                     log.info("等待时间过久，结束跨日连锄，等待时间需要 < 4小时")
-        # shutdown_type = cfg.read_json_file(cfg.CONFIG_FILE_NAME, False).get('auto_shutdown', 0)
+        # shutdown_type = cfg.config_file.get('auto_shutdown', 0)
         # shutdown_computer(shutdown_type)
         if dev:  # 开发者模式自动重选地图
             main()
@@ -157,7 +157,7 @@ def shutdown_computer(shutdown_type):
         os.system("shutdown /l /f")
     elif shutdown_type == 3:
         log.info("关闭指定进程")
-        taskkill_name = cfg.read_json_file(cfg.CONFIG_FILE_NAME, False).get(
+        taskkill_name = cfg.config_file.get(
             "taskkill_name", None
         )
         if taskkill_name:
@@ -38,8 +38,9 @@ def get_width():
     else:
         pass  # 不执行任何操作，避免输出日志
 
-    ConfigurationManager.modify_json_file(ConfigurationManager.CONFIG_FILE_NAME, "real_width", real_width)
-    ConfigurationManager.modify_json_file(ConfigurationManager.CONFIG_FILE_NAME, "real_height", real_height)
+    with ConfigurationManager.transaction():
+        ConfigurationManager.modify_json_file(ConfigurationManager.CONFIG_FILE_NAME, "real_width", real_width)
+        ConfigurationManager.modify_json_file(ConfigurationManager.CONFIG_FILE_NAME, "real_height", real_height)
 
 
 
@@ -0,0 +1,47 @@
+"""
+离线优化地图路线：合并连续同向移动、删除无效步骤，并输出差异报告与节约时间
+
+用法：
+    python map_optimize.py [地图版本] [--write] [--no-run]
+"""
+import json
+import os
+import sys
+
+from utils.route_optimizer import format_changes, optimize_map
+
+
+def process_map_version(map_dir, write=False, allow_run=True):
+    total_saved = 0.0
+    for json_file in sorted(f for f in os.listdir(map_dir) if f.endswith('.json')):
+        file_path = os.path.join(map_dir, json_file)
+        with open(file_path, 'r', encoding='utf-8-sig') as f:
+            map_data = json.load(f)
+        optimized, changes, saved, _ = optimize_map(map_data, allow_run)
+        if not changes:
+            continue
+        total_saved += saved
+        print(f"{json_file}：{len(changes)}处变更，预计节约{saved:.2f}秒")
+        for line in format_changes(changes):
+            print(line)
+        if write:
+            with open(file_path, 'w', encoding='utf-8') as f:
+                json.dump(optimized, f, indent=4, ensure_ascii=False)
+    print(f"{map_dir} 预计共节约{total_saved:.2f}秒")
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    write = '--write' in sys.argv
+    allow_run = '--no-run' not in sys.argv
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    map_root = os.path.join(script_dir, "map")
+    versions = args or sorted(os.listdir(map_root))
+    for version in versions:
+        map_dir = os.path.join(map_root, version)
+        if os.path.isdir(map_dir):
+            process_map_version(map_dir, write, allow_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,26 +11,63 @@ import datetime
 import hashlib
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from docopt import docopt
 
+HASH_CHUNK_SIZE = 1024 * 1024
+CACHE_FILE = 'star_list.cache.json'  # 上次生成时的 {路径: [大小, 修改时间, 哈希]}
+SUB_LISTS = {'map': 'map_list.json', 'picture': 'picture_list.json'}  # 按目录单独生成的文件清单
+EXCLUDE_FILES = ('version.json', 'star_list.json', CACHE_FILE, *SUB_LISTS.values())
+
+def file_md5(file_path: Path) -> str:
+    """分块计算文件的md5"""
+    hasher = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def load_cache() -> dict:
+    try:
+        with open(CACHE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def write_list(file_name: str, file_list: list):
+    with open(file_name, 'w', encoding='utf-8') as f:
+        json.dump(file_list, f, ensure_ascii=False, indent=2)
+
 def up_data():
+    """
+    生成文件清单：大小与修改时间未变化的文件沿用上次的哈希，其余文件并行分块计算。
+    同时生成全部文件的 star_list.json 与各目录的 map_list.json、picture_list.json
+    """
     star_path = Path(__file__).parent
     
-    star_list = []
-    
     this_path = str(Path(__file__).parent)
     
-    
+    files = {}  # 路径 -> (文件, 大小, 修改时间)
     for file in star_path.rglob('*'):
-        if '.git' not in str(file) and '__' not in str(file) and 'version.json' not in str(file) and 'star_list.json' not in str(file) and os.path.isfile(file):
-            star_list.append({
-                'path': str(file).replace(this_path, '').replace('\\', '/').lstrip('/'),
-                'hash': hashlib.md5(file.read_bytes()).hexdigest()
-            })
-    
-    with open('star_list.json', 'w', encoding='utf-8') as f:
-        json.dump(star_list, f, ensure_ascii=False, indent=2)
+        if '.git' not in str(file) and '__' not in str(file) and not any(name in str(file) for name in EXCLUDE_FILES) and os.path.isfile(file):
+            stat = file.stat()
+            files[str(file).replace(this_path, '').replace('\\', '/').lstrip('/')] = (file, stat.st_size, stat.st_mtime_ns)
+
+    cache = load_cache()
+    hashes = {path: cache[path][2] for path, (_, size, mtime) in files.items()
+              if path in cache and cache[path][:2] == [size, mtime]}
+    to_hash = [path for path in files if path not in hashes]
+    with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as pool:
+        hashes.update(zip(to_hash, pool.map(file_md5, (files[path][0] for path in to_hash))))
+    print(f'共{len(files)}个文件，重新计算{len(to_hash)}个文件的哈希')
+
+    star_list = [{'path': path, 'hash': hashes[path]} for path in files]
+    write_list('star_list.json', star_list)
+    for folder, file_name in SUB_LISTS.items():
+        write_list(file_name, [data for data in star_list if data['path'].startswith(f'{folder}/')])
+    with open(CACHE_FILE, 'w', encoding='utf-8') as f:
+        json.dump({path: [size, mtime, hashes[path]] for path, (_, size, mtime) in files.items()}, f, ensure_ascii=False)
     
     # 获取当前时间（UTC+8）
     current_time = datetime.datetime.utcnow() + datetime.timedelta(hours=8)
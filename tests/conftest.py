@@ -0,0 +1,23 @@
+"""
+测试在非 Windows 环境中运行时，将无法导入的 Windows、图形界面相关模块替换为 MagicMock，
+只用于导入 utils 中的模块，测试本身不依赖这些模块的行为
+"""
+import importlib
+import sys
+from unittest import mock
+
+PLATFORM_MODULES = ("cv2", "pyautogui", "keyboard", "win32api", "win32con", "win32gui",
+                    "win32com", "win32com.client", "PIL", "PIL.ImageGrab")
+
+
+def stub_missing_modules():
+    for name in PLATFORM_MODULES:
+        if name in sys.modules:
+            continue
+        try:
+            importlib.import_module(name)
+        except Exception:  # 未安装，或如 pyautogui 在没有显示器的环境中导入失败
+            sys.modules[name] = mock.MagicMock(name=name)
+
+
+stub_missing_modules()
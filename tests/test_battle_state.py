@@ -0,0 +1,91 @@
+"""
+战斗状态机：识别进入战斗（ENTERING）的状态转换与区域截图的记录方式
+"""
+import types
+
+import numpy as np
+import pytest
+
+import utils.log as log_module
+from utils.battle_state import BattleMonitor, BattleState
+
+
+@pytest.fixture(autouse=True)
+def log_version(monkeypatch):
+    """写日志时会读取配置中的版本号，使用固定值，不在仓库中生成 config.json"""
+    monkeypatch.setattr(log_module, "_version", "test")
+
+
+class FakeImg:
+    """按模板返回预设的匹配值序列，记录每次截图是否写入运行记录与截图缓存"""
+
+    def __init__(self, scores: dict):
+        self.main_ui = "main_ui"
+        self.doubt_ui = "doubt_ui"
+        self.scores = {name: list(values) for name, values in scores.items()}
+        self.captures = []  # [(offset, record)]
+        self.trace = types.SimpleNamespace(emit=lambda event, **fields: None)
+
+    def take_screenshot(self, offset=(0, 0, 0, 0), record=True):
+        self.captures.append((offset, record))
+        return np.zeros((10, 10, 3), dtype=np.uint8), 0, 0, 10, 10
+
+    def match_screenshot(self, screenshot, template, left, top):
+        values = self.scores[template]
+        return {"max_val": values.pop(0) if len(values) > 1 else values[0], "max_loc": (left, top)}
+
+
+def make_monitor(scores: dict, timeout: float = 15, clicked=None) -> BattleMonitor:
+    img = FakeImg(scores)
+    handle = types.SimpleNamespace(
+        img=img, mouse_event=None, attack_once=True,
+        cfg=types.SimpleNamespace(config_file={"detect_fight_status_time": timeout}),
+        no_in_fight_status=lambda: False,
+        click_action=lambda is_warning: clicked)
+    monitor = BattleMonitor(handle)
+    monitor.TICK = 0.01
+    return monitor
+
+
+def test_entering_starts_battle_when_main_ui_disappears():
+    monitor = make_monitor({"main_ui": [0.99, 0.99, 0.5], "doubt_ui": [0.1]})
+    monitor.enter_deadline = float("inf")
+    results = []
+    for _ in range(3):
+        monitor.frames.next_tick()
+        results.append(monitor.on_entering())
+
+    assert results == [False, False, True]
+    assert monitor.state == BattleState.IN_BATTLE
+    assert monitor.start_time > 0
+
+
+def test_entering_clicks_doubt_target():
+    monitor = make_monitor({"main_ui": [0.99], "doubt_ui": [0.95]}, clicked=True)
+    monitor.enter_deadline = float("inf")
+
+    assert monitor.on_entering()
+    assert monitor.state == BattleState.IN_BATTLE
+
+
+def test_entering_times_out_without_enemy():
+    monitor = make_monitor({"main_ui": [0.99], "doubt_ui": [0.1]}, timeout=0.05)
+
+    assert monitor.run() is False
+    assert monitor.state == BattleState.NO_FIGHT
+    assert monitor.start_time == 0.0
+    assert monitor.handle.attack_once is False
+
+
+@pytest.mark.parametrize("full", [False, True])
+def test_region_grabs_skip_frame_buffer(full):
+    monitor = make_monitor({"main_ui": [0.99], "doubt_ui": [0.1]})
+    monitor.enter_deadline = float("inf")
+    monitor.frames.next_tick()
+    if full:
+        monitor.frames.full()
+    monitor.on_entering()
+
+    # 主界面与疑问图标共用同一张区域截图；已有整屏截图时从中裁剪，不再截图
+    expected = [((0, 0, 0, 0), True)] if full else [(BattleMonitor.MAIN_UI_OFFSET, False)]
+    assert monitor.img.captures == expected
@@ -0,0 +1,43 @@
+"""
+配置修改的合并写入
+"""
+import orjson
+import pytest
+
+from utils.config import ConfigurationManager
+
+
+@pytest.fixture
+def config_file(monkeypatch, tmp_path):
+    """在临时目录中使用独立的配置文件与快照，不启动配置文件监视线程"""
+    path = tmp_path / ConfigurationManager.CONFIG_FILE_NAME
+    path.write_bytes(ConfigurationManager.dump_json({"forbid_map": ["A", "B", "C"], "version": "test"}))
+    monkeypatch.chdir(tmp_path)
+    ConfigurationManager.path_resolver.invalidate()
+    monkeypatch.setattr(ConfigurationManager, "_snapshot", None)
+    monkeypatch.setattr(ConfigurationManager, "_pending", {})
+    monkeypatch.setattr(ConfigurationManager, "_flush_timer", None)
+    ConfigurationManager.refresh_snapshot()
+    yield path
+    ConfigurationManager.flush_config()
+    ConfigurationManager.path_resolver.invalidate()
+
+
+def test_in_place_list_edits_are_written(config_file):
+    # 与 setting.py 中删除地图的方式相同：原地修改同一个列表后再次提交
+    config = ConfigurationManager.load_config()
+    forbid_map = config["forbid_map"]
+    for selected in ("A", "B"):
+        forbid_map.remove(selected)
+        ConfigurationManager.modify_json_file(ConfigurationManager.CONFIG_FILE_NAME, "forbid_map", forbid_map)
+        ConfigurationManager.flush_config()  # 两次删除之间合并写入的等待时间已过
+        assert ConfigurationManager().config_file["forbid_map"] == forbid_map
+
+    assert orjson.loads(config_file.read_bytes())["forbid_map"] == ["C"]
+
+
+def test_snapshot_does_not_share_caller_values(config_file):
+    value = ["X"]
+    ConfigurationManager.update_config({"allowlist_map": value})
+    value.append("Y")
+    assert ConfigurationManager().config_file["allowlist_map"] == ["X"]
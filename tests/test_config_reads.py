@@ -0,0 +1,60 @@
+"""
+路线执行过程中不应直接读取配置文件：配置项一律从 cfg.config_file 快照读取
+"""
+import types
+
+import pytest
+
+import utils.map as map_module
+from utils.config import ConfigSnapshot, ConfigurationManager
+from utils.route_ops import STEP_NEXT, OpRegistry
+
+ROUTE = {
+    "name": "测试地图",
+    "start": [],
+    "map": [{"w": 1.5}, {"w": 0.8}, {"await": 0}, {"d": 3.2}, {"e": 1}, {"fighting": 1}, {"s": 0.6}],
+}
+
+
+class FakePause:
+    def __init__(self, dev=False):
+        pass
+
+    def check_pause(self, dev, last_point):
+        return False
+
+
+def make_map(dispatched: list) -> map_module.Map:
+    """只包含路线循环需要的属性，步骤处理函数只记录调用"""
+    route_ops = OpRegistry("route")
+    route_ops.set_default("stub", lambda step, ctx: dispatched.append(step.raw) or STEP_NEXT)
+    handle = types.SimpleNamespace(route_ops=route_ops, f_key_error=False, last_step_run=False,
+                                   handle_view_set=lambda value: None)
+    instance = map_module.Map.__new__(map_module.Map)
+    instance.cfg = ConfigurationManager()
+    instance.handle = handle
+    instance.map_info = types.SimpleNamespace(map_version="default")
+    instance.calculated = types.SimpleNamespace(first_role_check=lambda: None)
+    instance.monthly_pass = types.SimpleNamespace(monthly_pass_check=lambda: None)
+    instance.prefetcher = types.SimpleNamespace(get_map_data=lambda path: ROUTE)
+    instance.now = map_module.datetime.datetime.now()
+    return instance
+
+
+@pytest.mark.parametrize("route_optimize", [False, True])
+def test_route_loop_does_not_read_config_file(monkeypatch, tmp_path, route_optimize):
+    config = {"route_optimize": route_optimize, "auto_run_in_map": True, "version": "test"}
+    (tmp_path / ConfigurationManager.CONFIG_FILE_NAME).write_bytes(ConfigurationManager.dump_json(config))
+    monkeypatch.chdir(tmp_path)
+    ConfigurationManager.path_resolver.invalidate()
+    monkeypatch.setattr(ConfigurationManager, "_snapshot", ConfigSnapshot(config, 1))
+    monkeypatch.setattr(map_module, "Pause", FakePause)
+    dispatched = []
+    instance = make_map(dispatched)
+
+    before = ConfigurationManager.raw_read_count
+    for _ in range(3):
+        instance.process_single_map_handle("map_1-1_1.json", normal_run=False)
+
+    assert ConfigurationManager.raw_read_count == before
+    assert len(dispatched) >= 3 * (len(ROUTE["map"]) - 2)
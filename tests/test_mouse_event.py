@@ -0,0 +1,46 @@
+"""
+拖动地图后等待画面静止：缓慢移动的画面不应被当作静止
+"""
+import types
+
+import numpy as np
+
+from utils.mouse_event import MouseEvent
+
+
+class FakeFrames:
+    """每次截图的灰度值增加 step，step 为 0 时画面静止"""
+
+    def __init__(self, step: float):
+        self.step = step
+        self.count = 0
+
+    def grab_region(self, rect, scale=4):
+        frame = np.full((16, 16), 100 + self.count * self.step, dtype=np.int16)
+        self.count += 1
+        return frame
+
+
+def make_mouse_event(frames: FakeFrames) -> MouseEvent:
+    mouse_event = MouseEvent.__new__(MouseEvent)
+    mouse_event.img = frames
+    mouse_event.cfg = types.SimpleNamespace(config_file={"adaptive_wait": True})
+    mouse_event.wait_saved = 0.0
+    return mouse_event
+
+
+def test_still_frames_settle_early():
+    frames = FakeFrames(step=0)
+    waited = make_mouse_event(frames).wait_settle((0, 0, 64, 64), 1.0)
+
+    assert frames.count == MouseEvent.SETTLE_FRAMES + 1
+    assert waited < 0.5
+
+
+def test_slowly_moving_frames_are_not_settled():
+    # 相邻两张截图的差异低于 SETTLE_DIFF，但画面一直在移动
+    frames = FakeFrames(step=MouseEvent.SETTLE_DIFF * 0.6)
+    waited = make_mouse_event(frames).wait_settle((0, 0, 64, 64), 0.3)
+
+    assert waited >= 0.3
+    assert frames.count > MouseEvent.SETTLE_FRAMES + 1
@@ -0,0 +1,113 @@
+"""
+Webhook 消息的合并发送、失败重试与退出前发送
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import orjson
+import pytest
+
+from utils.config import ConfigurationManager
+from utils.webhook import WebhookDispatcher
+
+
+class WebhookServer(ThreadingHTTPServer):
+    """记录收到的消息，按 statuses 依次返回状态码，用完后返回 204"""
+
+    def __init__(self, statuses=()):
+        super().__init__(("127.0.0.1", 0), WebhookHandler)
+        self.statuses = list(statuses)
+        self.received = []  # 每次请求的 content，包括失败的请求
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/webhook"
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.received.append(orjson.loads(body)["content"])
+        status = self.server.statuses.pop(0) if self.server.statuses else 204
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = WebhookServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def config_file(monkeypatch, tmp_path):
+    """发送失败时写日志会读取配置，在临时目录中使用测试配置，不在仓库中生成 config.json"""
+    path = tmp_path / ConfigurationManager.CONFIG_FILE_NAME
+    path.write_bytes(ConfigurationManager.dump_json({"version": "test"}))
+    monkeypatch.chdir(tmp_path)
+    ConfigurationManager.path_resolver.invalidate()
+    monkeypatch.setattr(ConfigurationManager, "_snapshot", None)
+    monkeypatch.setattr(ConfigurationManager, "_pending", {})
+    monkeypatch.setattr(ConfigurationManager, "_flush_timer", None)
+    ConfigurationManager.refresh_snapshot()
+    yield path
+    ConfigurationManager.path_resolver.invalidate()
+
+
+@pytest.fixture
+def dispatcher():
+    """不经过单例，每个测试使用独立的事件循环线程"""
+    dispatcher = WebhookDispatcher.__new__(WebhookDispatcher)
+    dispatcher.__init__()
+    dispatcher.RETRY_DELAY = 0.01
+    return dispatcher
+
+
+def test_messages_in_window_are_batched(server, dispatcher):
+    dispatcher.BATCH_WINDOW = 0.3
+    for message in ("开始运行", "地图1完成", "地图2完成"):
+        dispatcher.send(message, server.url)
+    with dispatcher._idle:  # 等待合并窗口结束后发送，不使用 flush
+        assert dispatcher._idle.wait_for(lambda: dispatcher._pending == 0, 5)
+
+    assert server.received == ["开始运行\n地图1完成\n地图2完成"]
+    assert (dispatcher.sent, dispatcher.failed) == (1, 0)
+
+
+def test_server_error_is_retried(server, dispatcher):
+    server.statuses = [503, 500]
+    dispatcher.send("运行完成", server.url)
+    assert dispatcher.flush(timeout=5)
+
+    assert server.received == ["运行完成"] * 3
+    assert (dispatcher.sent, dispatcher.failed) == (1, 0)
+
+
+def test_client_error_is_not_retried(server, dispatcher):
+    server.statuses = [404]
+    dispatcher.send("运行完成", server.url)
+    assert dispatcher.flush(timeout=5)
+
+    assert server.received == ["运行完成"]
+    assert (dispatcher.sent, dispatcher.failed) == (0, 1)
+
+
+def test_flush_sends_without_waiting_for_window(server, dispatcher):
+    # 程序退出时 atexit 调用 flush，不应等待合并窗口结束
+    dispatcher.BATCH_WINDOW = 30
+    dispatcher.send("程序退出", server.url)
+    start = time.monotonic()
+    assert dispatcher.flush(timeout=5)
+
+    assert time.monotonic() - start < 5
+    assert server.received == ["程序退出"]
+    assert dispatcher.sent == 1
@@ -0,0 +1,284 @@
+import time
+
+from utils.log import log
+
+
+class BattleState:
+    ENTERING = "entering"  # 识别是否进入战斗
+    IN_BATTLE = "in_battle"  # 战斗中
+    AUTO_OFF = "auto_off"  # 自动战斗未开启
+    DEFEAT = "defeat"  # 战斗失败或需要继续战斗
+    VICTORY = "victory"  # 战斗结束，识别到主界面
+    BACK_TO_MAIN = "back_to_main"  # 已回到主界面
+    TIMEOUT = "timeout"  # 战斗超时
+    NO_FIGHT = "no_fight"  # 识别时间内未进入战斗，此处可能无敌人
+
+
+class FrameSource:
+    """
+    一个检测周期内共用的截图：需要整屏时只截图一次，各区域从整屏截图中裁剪，
+    只检测小区域时直接截取该区域（每个区域每周期一次），区域截图不记录到运行记录与截图缓存
+    """
+
+    def __init__(self, img):
+        self.img = img
+        self._full = None
+        self._regions = {}  # offset -> (截图, 左, 上)
+
+    def next_tick(self):
+        self._full = None
+        self._regions = {}
+
+    def full(self) -> tuple:
+        if self._full is None:
+            self._full = self.img.take_screenshot()
+        return self._full
+
+    def region(self, offset: tuple) -> tuple:
+        """
+        说明：
+            获取区域截图
+        参数：
+            :param offset: 左、上、右、下，与 take_screenshot 的 offset 一致
+        返回：
+            :return (截图, 左, 上)
+        """
+        if self._full is None:
+            if offset not in self._regions:
+                screenshot, left, top, _, _ = self.img.take_screenshot(offset=offset, record=False)
+                self._regions[offset] = (screenshot, left, top)
+            return self._regions[offset]
+        screenshot, left, top, right, bottom = self._full
+        height, width = screenshot.shape[:2]
+        return (screenshot[offset[1]:height + offset[3], offset[0]:width + offset[2]],
+                left + offset[0], top + offset[1])
+
+    def match(self, template, offset: tuple = None) -> dict:
+        """在整屏或区域截图中匹配图片"""
+        if offset is None:
+            screenshot, left, top, _, _ = self.full()
+        else:
+            screenshot, left, top = self.region(offset)
+        return self.img.match_screenshot(screenshot, template, left, top)
+
+
+class BattleMonitor:
+    """
+    战斗状态机，替代 fight_elapsed 中每0.5秒整屏识图的循环。
+    进入战斗前（ENTERING）检测主界面与疑问图标，识别时间内未进入战斗时结束（NO_FIGHT）。
+    主界面只检测左上角小区域，并以 TICK 秒的间隔检测，
+    自动战斗、行动条、继续战斗等需要整屏的检测按原来的时间点与 SLOW_INTERVAL 间隔进行，
+    同一周期内的检测共用一张截图
+    """
+    TICK = 0.2  # 检测间隔（秒）
+    SLOW_INTERVAL = 0.5  # 整屏检测的最短间隔（秒）
+    MAIN_UI_OFFSET = (0, 0, -1630, -800)  # 主界面左上角区域
+    ACTION_BAR_OFFSET = (40, 20, -1725, -800)  # 行动条区域
+    AUTO_CHECK_TIME = 5  # 开始检测自动战斗按钮的时间（秒）
+    ACTION_BAR_TIME = (10, 15, 20)  # 记录行动条、第一次比较、第二次比较的时间（秒）
+    ACTION_BAR_WINDOW = 1.0  # 每次比较行动条的时长（秒）
+    STUCK_TIME = 90  # 开始检测继续战斗、战斗失败的时间（秒）
+    TIMEOUT = 600  # 战斗超时时间（秒）
+
+    def __init__(self, handle):
+        self.handle = handle
+        self.img = handle.img
+        self.mouse_event = handle.mouse_event
+        self.frames = FrameSource(self.img)
+        self.state = BattleState.ENTERING
+        self.start_time = 0.0
+        self.enter_timeout = 15  # 识别进入战斗的最长时间（秒）
+        self.enter_deadline = 0.0  # 识别进入战斗的截止时间
+        self.auto_switch = False  # 是否已检测自动战斗按钮
+        self.auto_switch_clicked = False  # 是否按过V开启自动战斗
+        self.action_bar = None  # 10秒时的行动条截图
+        self.action_bar_checks = [None, None]  # 两次行动条比较的结果
+        self.last_slow_check = 0.0
+        self.main_result = None  # 识别到主界面时的匹配结果
+        self.auto_reason = ""  # 开启自动战斗的原因，用于日志
+        self.defeat_target = None  # (图片地址, 匹配结果)
+        self.templates = {}
+
+    def template(self, path: str):
+        if path not in self.templates:
+            self.templates[path] = self.img.templates.get(path)
+        return self.templates[path]
+
+    def set_state(self, state: str):
+        if state != self.state:
+            self.img.trace.emit("battle_state", state=state, prev=self.state,
+                                seconds=round(self.elapsed(), 2) if self.start_time else 0)
+            self.state = state
+
+    def elapsed(self) -> float:
+        return time.time() - self.start_time
+
+    def run(self) -> bool:
+        """
+        说明：
+            识别进入战斗并等待战斗结束
+        返回：
+            :return 是否识别到敌人
+        """
+        self.enter_timeout = self.handle.cfg.config_file.get("detect_fight_status_time", 15)
+        self.handle.attack_once = False  # 检测fighting时仅攻击一次，避免连续攻击
+        log.info("开始识别是否进入战斗")
+        if self.handle.no_in_fight_status():
+            return False
+        self.enter_deadline = time.time() + self.enter_timeout
+        while True:
+            self.frames.next_tick()
+            handler = {
+                BattleState.ENTERING: self.on_entering,
+                BattleState.IN_BATTLE: self.on_in_battle,
+                BattleState.AUTO_OFF: self.on_auto_off,
+                BattleState.DEFEAT: self.on_defeat,
+                BattleState.VICTORY: self.on_victory,
+            }.get(self.state)
+            if handler is None:
+                return self.state != BattleState.NO_FIGHT
+            if handler():
+                continue
+            time.sleep(self.TICK)
+
+    def on_entering(self) -> bool:
+        """识别是否进入战斗：主界面消失时开始战斗，识别到疑问图标时点击攻击，超时后结束"""
+        if self.frames.match(self.img.main_ui, self.MAIN_UI_OFFSET)["max_val"] < 0.9:
+            self.start_battle()
+            return True
+        if self.frames.match(self.img.doubt_ui, self.MAIN_UI_OFFSET)["max_val"] > 0.92 and \
+                self.handle.click_action(is_warning=False):
+            self.start_battle()
+            return True
+        if time.time() >= self.enter_deadline:
+            log.info(f"结束识别，识别时长{self.enter_timeout}秒，此处可能无敌人")
+            self.set_state(BattleState.NO_FIGHT)
+            return True
+        return False
+
+    def start_battle(self):
+        self.start_time = time.time()
+        log.info("战斗开始")
+        self.img.trace.emit("fight_start")
+        self.set_state(BattleState.IN_BATTLE)
+
+    def on_in_battle(self) -> bool:
+        """战斗中：检测主界面、自动战斗与超时，返回是否立即处理下一个状态"""
+        elapsed_time = self.elapsed()
+        now = time.time()
+        slow_check = now - self.last_slow_check >= self.SLOW_INTERVAL
+        if slow_check:
+            # 需要整屏检测时先截取整屏，主界面区域从中裁剪，每个周期只截图一次
+            self.frames.full()
+        result = self.frames.match(self.img.main_ui, self.MAIN_UI_OFFSET)
+        if result["max_val"] > 0.92:
+            self.main_result = result
+            self.set_state(BattleState.VICTORY)
+            return True
+
+        if elapsed_time > self.TIMEOUT:
+            log.info("战斗超时")
+            self.img.trace.emit("fight_end", seconds=round(elapsed_time, 2), timeout=True)
+            self.img.frames.dump("fight_timeout", seconds=elapsed_time)
+            self.set_state(BattleState.TIMEOUT)
+            return True
+
+        if not slow_check:
+            return False
+        self.last_slow_check = now
+
+        if not self.auto_switch and elapsed_time > self.AUTO_CHECK_TIME:
+            self.auto_switch = True
+            if self.frames.match(self.template("./picture/auto.png"))["max_val"] > 0.95:
+                self.auto_reason = "开启自动战斗"
+                self.set_state(BattleState.AUTO_OFF)
+                return True
+
+        if self.check_action_bar(elapsed_time):
+            self.auto_reason = "开启自动战斗（通过行动条识别）"
+            self.set_state(BattleState.AUTO_OFF)
+            return True
+
+        if self.auto_switch_clicked and elapsed_time > self.ACTION_BAR_TIME[0]:
+            result = self.frames.match(self.template("./picture/not_auto.png"))
+            if result["max_val"] > 0.95:
+                log.info(f"开启自动战斗，识别'C'，匹配值：{result['max_val']}")
+                self.handle.press_auto_battle(2)
+                return True
+
+        if elapsed_time > self.STUCK_TIME:
+            for path in ("./picture/continue_fighting.png", "./picture/defeat.png"):
+                result = self.frames.match(self.template(path))
+                if result["max_val"] > 0.98:
+                    self.defeat_target = (path, result)
+                    self.set_state(BattleState.DEFEAT)
+                    return True
+        return False
+
+    def check_action_bar(self, elapsed_time: float) -> bool:
+        """
+        说明：
+            10秒时记录行动条，15秒与20秒时各比较1秒，两次都未变化说明未开启自动战斗
+        返回：
+            :return 是否需要开启自动战斗
+        """
+        record_time, first_time, second_time = self.ACTION_BAR_TIME
+        if elapsed_time <= record_time or None not in self.action_bar_checks:
+            return False
+        if self.action_bar is None:
+            self.action_bar, _, _ = self.frames.region(self.ACTION_BAR_OFFSET)
+            return False
+        for index, check_time in enumerate((first_time, second_time)):
+            if self.action_bar_checks[index] is not None or elapsed_time <= check_time:
+                continue
+            if index == 1 and not self.action_bar_checks[0]:
+                self.action_bar_checks[1] = False
+                return False
+            same = self.frames.match(self.action_bar, self.ACTION_BAR_OFFSET)["max_val"] > 0.97
+            if same or elapsed_time > check_time + self.ACTION_BAR_WINDOW:
+                self.action_bar_checks[index] = same
+                return index == 1 and same
+            return False
+        return False
+
+    def on_auto_off(self) -> bool:
+        """未开启自动战斗：按V开启后回到战斗中"""
+        self.handle.press_auto_battle(1)
+        log.info(self.auto_reason)
+        self.auto_switch_clicked = True
+        self.set_state(BattleState.IN_BATTLE)
+        return True
+
+    def on_defeat(self) -> bool:
+        """战斗失败或需要继续战斗：点击对应按钮后回到战斗中"""
+        path, result = self.defeat_target
+        points = self.img.img_center_point(result, self.template(path).shape)
+        self.mouse_event.click(points, result["max_val"])
+        self.set_state(BattleState.IN_BATTLE)
+        return False
+
+    def on_victory(self) -> bool:
+        """战斗结束：记录战斗数据并等待回到主界面"""
+        handle = self.handle
+        result = self.main_result
+        elapsed_time = self.elapsed()
+        points = self.img.img_center_point(result, self.img.main_ui.shape)
+        log.info(f"识别点位{points}")
+        handle.total_fight_time += elapsed_time
+        handle.fight_error_cnt(elapsed_time)
+        elapsed_minutes = int(elapsed_time // 60)
+        elapsed_seconds = elapsed_time % 60
+        formatted_time = f"{elapsed_minutes}分钟{elapsed_seconds:.2f}秒"
+        handle.total_fight_cnt += 1
+        colored_message = (
+            f"战斗完成,单场用时\033[1;92m『{formatted_time}』\033[0m")
+        log.info(colored_message)
+        match_details = f"匹配度: {result['max_val']:.2f} ({points[0]}, {points[1]})"
+        log.info(match_details)
+        self.img.trace.emit("fight_end", seconds=round(elapsed_time, 2), timeout=False)
+
+        while not self.img.on_main_interface(timeout=2):
+            time.sleep(0.1)
+        time.sleep(1)
+        self.set_state(BattleState.BACK_TO_MAIN)
+        return True
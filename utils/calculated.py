@@ -5,12 +5,12 @@ from datetime import datetime
 import cv2
 import numpy as np
 import pyautogui
-from pynput.keyboard import Controller as KeyboardController
 
 from utils.blackscreen import BlackScreen
 from utils.config import ConfigurationManager
 from utils.handle import Handle
 from utils.img import Img
+from utils.input_backend import input_backend
 from utils.log import log
 from utils.mini_asu import ASU
 from utils.monthly_pass import MonthlyPass
@@ -29,7 +29,7 @@ class Calculated:
         self.mouse_event = MouseEvent()
         self._config = None
         self._last_updated = None
-        self.keyboard = KeyboardController()
+        self.keyboard = input_backend()
         self.handle = Handle()
         self.asu = ASU()
         self.blackscreen = BlackScreen()
@@ -73,6 +73,7 @@ class Calculated:
             log.info(f'加载地图超时，已重试{error_count}次，强制执行下一步')
         end_time = time.time()
         loading_time = end_time - start_time
+        self.img.trace.emit("load", seconds=round(loading_time, 2), timeout=error_count >= max_error_count)
         if error_count < max_error_count:
             log.info(f'地图载毕，用时 {loading_time:.1f} 秒')
         time.sleep(1)  # 增加1秒等待防止人物未加载错轴
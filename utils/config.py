@@ -1,62 +1,327 @@
+import atexit
+import contextlib
+import copy
 import json
 import os
 import sys
+import threading
 import time
+from collections.abc import Mapping
+from types import MappingProxyType
 
 import orjson
 
 
-class ConfigurationManager:
-    CONFIG_FILE_NAME = "config.json"
+class ConfigSnapshot(Mapping):
+    """
+    只读配置快照，支持 snapshot["key"]、snapshot.get("key") 与 snapshot.key 三种读取方式，
+    属性读取时缺少的配置项返回 config_keys 中的默认值。
+    配置更新时整体替换为新的快照，读取方无需加锁
+    """
+    __slots__ = ("_data", "version", "mtime")
+
+    def __init__(self, data: dict, version: int = 0, mtime: int = 0):
+        # 深拷贝，调用方之后修改传入的列表等可变值时不会影响快照
+        object.__setattr__(self, "_data", MappingProxyType(copy.deepcopy(dict(data))))
+        object.__setattr__(self, "version", version)  # 快照版本，每次替换加1
+        object.__setattr__(self, "mtime", mtime)  # 读取时配置文件的修改时间（纳秒）
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def __getattr__(self, name):
+        try:
+            return self._data[name]
+        except KeyError:
+            defaults = ConfigurationManager.config_keys()
+            if name in defaults:
+                return defaults[name]
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ConfigSnapshot 为只读对象")
+
+    def __repr__(self):
+        return f"ConfigSnapshot(version={self.version}, {dict(self._data)})"
+
+
+class ConfigWatcher:
+    """
+    后台轮询配置文件的修改时间，发生变化时调用 on_change
+    """
+    POLL_INTERVAL = 1.0  # 轮询间隔（秒）
+
+    def __init__(self, filename: str, on_change):
+        self.filename = filename
+        self.on_change = on_change
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run, name="config_watcher", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.POLL_INTERVAL)
+            file_path = ConfigurationManager.normalize_file_path(self.filename)
+            if file_path is None:
+                continue
+            try:
+                mtime = os.stat(file_path).st_mtime_ns
+            except OSError:
+                continue
+            snapshot = ConfigurationManager._snapshot
+            if snapshot is None or mtime != snapshot.mtime:
+                self.on_change()
+
+
+class PathResolver:
+    """
+    文件路径解析缓存：依次在当前目录与上一级目录中查找文件，
+    按文件名缓存解析结果，按目录缓存文件列表，未找到的结果只保留 NEGATIVE_TTL 秒。
+    文件被外部修改（如资源更新）后需调用 invalidate
+    """
+    NEGATIVE_TTL = 2.0  # 未找到结果的缓存时间（秒）
 
     def __init__(self):
-        self._config = None
-        self._last_updated = None
+        self._resolved = {}  # (当前目录, 文件名) -> (路径或 None, 过期时间)
+        self._listings = {}  # 目录 -> (文件名集合或 None, 读取时间)
+        self._lock = threading.Lock()
+
+    def resolve(self, filename: str):
+        """
+        说明：
+            查找文件路径，未找到时返回 None
+        """
+        key = (os.getcwd(), filename)
+        entry = self._resolved.get(key)
+        now = time.monotonic()
+        if entry is not None and (entry[1] is None or entry[1] > now):
+            return entry[0]
+        current_dir = key[0]
+        file_path = None
+        for base_dir in (current_dir, os.path.dirname(current_dir)):
+            candidate = os.path.join(base_dir, filename)
+            if self._exists(candidate, now):
+                file_path = candidate
+                break
+        with self._lock:
+            self._resolved[key] = (file_path, None if file_path else now + self.NEGATIVE_TTL)
+        return file_path
+
+    def _exists(self, file_path: str, now: float) -> bool:
+        """通过缓存的目录列表判断文件是否存在"""
+        dir_path, name = os.path.split(os.path.normpath(file_path))
+        name = os.path.normcase(name)
+        listing = self._listings.get(dir_path)
+        if listing is not None and (name in (listing[0] or ()) or now - listing[1] < self.NEGATIVE_TTL):
+            return listing[0] is not None and name in listing[0]
+        try:
+            names = {os.path.normcase(entry) for entry in os.listdir(dir_path)}
+        except OSError:
+            names = None
+        with self._lock:
+            self._listings[dir_path] = (names, now)
+        return names is not None and name in names
+
+    def invalidate(self, path: str = None):
+        """
+        说明：
+            清除缓存
+        参数：
+            :param path: 发生变化的文件或目录，为空时清除全部缓存
+        """
+        with self._lock:
+            if path is None:
+                self._resolved.clear()
+                self._listings.clear()
+                return
+            path = os.path.normpath(os.path.abspath(path))
+            for dir_path in [d for d in self._listings if d == path or d == os.path.dirname(path)
+                             or d.startswith(path + os.sep)]:
+                del self._listings[dir_path]
+            for key in [k for k, v in self._resolved.items() if v[0] is None or
+                        os.path.normpath(v[0]) == path or os.path.normpath(v[0]).startswith(path + os.sep)]:
+                del self._resolved[key]
+
+
+class ConfigurationManager:
+    CONFIG_FILE_NAME = "config.json"
+    _snapshot = None  # 当前配置快照，所有实例共享
+    _lock = threading.RLock()  # 保护快照替换与配置写入
+    _watcher = None
+    _listeners = []  # 快照替换时的回调 listener(old, new)
+    raw_read_count = 0  # 本次运行直接读取配置文件的次数，用于排查重复读取
+    WRITE_DELAY = 0.5  # 合并写入的等待时间（秒）
+    _pending = {}  # 尚未写入文件的配置修改
+    _txn_depth = 0
+    _flush_timer = None
+    path_resolver = PathResolver()
 
     @property
-    def config_file(self):
+    def config_file(self) -> ConfigSnapshot:
         """
-        获取配置文件
+        获取配置快照，配置文件修改后由后台线程自动替换
         """
-        # 检查配置是否需要更新
-        if self._config is None or self._config_needs_update():
-            self._update_config()
-        return self._config
+        snapshot = ConfigurationManager._snapshot
+        if snapshot is None:
+            snapshot = ConfigurationManager.refresh_snapshot()
+            ConfigurationManager._start_watcher()
+        return snapshot
 
-    def _update_config(self):
+    @classmethod
+    def refresh_snapshot(cls) -> ConfigSnapshot:
         """
-        更新配置文件
+        说明：
+            重新读取配置文件并替换快照，读取失败（如文件正在写入）时保留原快照，
+            尚未写入文件的修改会覆盖在读取结果之上
         """
-        self._config = ConfigurationManager.read_json_file(
-            ConfigurationManager.CONFIG_FILE_NAME)
-        self._last_updated = time.time()
+        with cls._lock:
+            old = cls._snapshot
+            try:
+                file_path = cls.normalize_file_path(cls.CONFIG_FILE_NAME)
+                mtime = os.stat(file_path).st_mtime_ns if file_path else 0
+                data = cls.read_json_file(cls.CONFIG_FILE_NAME)
+            except (OSError, orjson.JSONDecodeError):
+                if old is None:
+                    raise
+                return old
+            data.update(cls._pending)
+            return cls._swap_snapshot(data, mtime)
 
-    def _config_needs_update(self):
+    @classmethod
+    def _swap_snapshot(cls, data: dict, mtime: int) -> ConfigSnapshot:
+        """替换快照，内容变化时通知监听函数，调用方需持有 _lock"""
+        old = cls._snapshot
+        if old is not None and dict(old) == data:
+            if old.mtime != mtime:  # 内容未变化，只更新修改时间
+                cls._snapshot = ConfigSnapshot(data, old.version, mtime)
+            return cls._snapshot
+        new = ConfigSnapshot(data, old.version + 1 if old else 1, mtime)
+        cls._snapshot = new
+        if old is not None:
+            for listener in list(cls._listeners):
+                listener(old, new)
+        return new
+
+    @classmethod
+    def add_config_listener(cls, listener):
+        """添加快照替换时的回调 listener(old, new)"""
+        if listener not in cls._listeners:
+            cls._listeners.append(listener)
+
+    @classmethod
+    def _start_watcher(cls):
+        if cls._watcher is None:
+            cls._watcher = ConfigWatcher(
+                cls.CONFIG_FILE_NAME, cls.refresh_snapshot)
+            cls._watcher.start()
+
+    @staticmethod
+    def dump_json(data) -> bytes:
+        """配置文件统一的序列化方式"""
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+
+    @classmethod
+    def _write_json(cls, file_path: str, data: dict):
+        """先写入临时文件再替换，避免写入中途退出导致文件损坏"""
+        tmp_path = f"{file_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(cls.dump_json(data))
+        os.replace(tmp_path, file_path)
+        cls.path_resolver.invalidate(file_path)
+
+    @classmethod
+    @contextlib.contextmanager
+    def transaction(cls):
         """
-        检查配置是否需要更新
+        说明：
+            批量修改配置，退出时一次性写入文件
+            with cfg.transaction():
+                cfg.modify_json_file(cfg.CONFIG_FILE_NAME, "angle", "1.0")
+                cfg.modify_json_file(cfg.CONFIG_FILE_NAME, "angle_set", True)
         """
-        if self._last_updated is None:
-            return True
+        with cls._lock:
+            cls._txn_depth += 1
+        try:
+            yield
+        finally:
+            with cls._lock:
+                cls._txn_depth -= 1
+                if cls._txn_depth == 0:
+                    cls.flush_config()
 
-        file_modified_time = os.path.getmtime(
-            ConfigurationManager.CONFIG_FILE_NAME)
-        return file_modified_time > self._last_updated
+    @classmethod
+    def update_config(cls, changes: dict):
+        """
+        说明：
+            修改配置，立即更新快照，并在 WRITE_DELAY 秒后合并写入文件（事务中则在事务结束时写入）
+        参数：
+            :param changes: {配置项: 值}
+        """
+        with cls._lock:
+            snapshot = cls._snapshot or cls.refresh_snapshot()
+            # 深拷贝：调用方可能原地修改后再次提交同一个列表，引用相同时会被误判为未修改
+            changes = {key: copy.deepcopy(value) for key, value in changes.items()
+                       if key in cls._pending or key not in snapshot or snapshot[key] != value}
+            if not changes:
+                return
+            cls._pending.update(changes)
+            cls._swap_snapshot({**snapshot, **changes}, snapshot.mtime)
+            if cls._txn_depth == 0 and cls._flush_timer is None:
+                cls._flush_timer = threading.Timer(cls.WRITE_DELAY, cls.flush_config)
+                cls._flush_timer.daemon = True
+                cls._flush_timer.start()
+
+    @classmethod
+    def flush_config(cls):
+        """将尚未写入的配置修改写入文件"""
+        with cls._lock:
+            if cls._flush_timer is not None:
+                cls._flush_timer.cancel()
+                cls._flush_timer = None
+            if not cls._pending or cls._txn_depth > 0:
+                return
+            data = dict(cls._snapshot)
+            file_path = cls.normalize_file_path(cls.CONFIG_FILE_NAME) or cls.CONFIG_FILE_NAME
+            cls._write_json(file_path, data)
+            cls._pending.clear()
+            cls._swap_snapshot(data, os.stat(file_path).st_mtime_ns)
 
     @classmethod
     def save_config(cls, config: dict):
         """
         保存配置文件
         """
-        with open(cls.CONFIG_FILE_NAME, "w", encoding="utf-8") as file:
-            json.dump(config, file, indent=4)
+        with cls._lock:
+            if cls._flush_timer is not None:
+                cls._flush_timer.cancel()
+                cls._flush_timer = None
+            cls._pending.clear()
+            cls._write_json(cls.CONFIG_FILE_NAME, config)
+            cls._swap_snapshot(dict(config), os.stat(cls.CONFIG_FILE_NAME).st_mtime_ns)
 
     @classmethod
     def load_config(cls) -> dict:
         """
         读取配置文件
         """
+        cls.flush_config()
         try:
             with open(cls.CONFIG_FILE_NAME, "r", encoding="utf-8") as file:
+                cls.raw_read_count += 1
                 return json.load(file)
         except FileNotFoundError:
             return {}
@@ -70,22 +335,9 @@ class ConfigurationManager:
     @staticmethod
     def normalize_file_path(filename):
         """
-        寻找文件路径
+        寻找文件路径，依次查找当前目录与上一级目录，未找到时返回 None
         """
-        # 尝试在当前目录下读取文件
-        current_dir = os.getcwd()
-        file_path = os.path.join(current_dir, filename)
-        if os.path.exists(file_path):
-            return file_path
-        else:
-            # 如果当前目录下没有该文件，则尝试在上一级目录中查找
-            parent_dir = os.path.dirname(current_dir)
-            file_path = os.path.join(parent_dir, filename)
-            if os.path.exists(file_path):
-                return file_path
-            else:
-                # 如果上一级目录中也没有该文件，则返回None
-                return None
+        return ConfigurationManager.path_resolver.resolve(filename)
 
     @staticmethod
     def get_project_root() -> str:
@@ -108,15 +360,21 @@ class ConfigurationManager:
         # 找到文件的绝对路径
         file_path = ConfigurationManager.normalize_file_path(filename)
         if file_path:
-            with open(file_path, "rb") as f:
-                content = f.read()
-                if content.startswith(b'\xef\xbb\xbf'):
-                    content = content[3:]
-                data = orjson.loads(content)
-                if path:
-                    return data, file_path
-                else:
-                    return data
+            if filename == ConfigurationManager.CONFIG_FILE_NAME:
+                ConfigurationManager.raw_read_count += 1
+            try:
+                with open(file_path, "rb") as f:
+                    content = f.read()
+            except FileNotFoundError:  # 缓存的路径已失效，重新查找
+                ConfigurationManager.path_resolver.invalidate(file_path)
+                return ConfigurationManager.read_json_file(filename, path)
+            if content.startswith(b'\xef\xbb\xbf'):
+                content = content[3:]
+            data = orjson.loads(content)
+            if path:
+                return data, file_path
+            else:
+                return data
         else:
             ConfigurationManager.init_config_file(0, 0)
             return ConfigurationManager.read_json_file(filename, path)
@@ -125,18 +383,19 @@ class ConfigurationManager:
     def modify_json_file(filename: str, key, value):
         """
         说明：
-            写入文件
+            写入文件，配置文件的修改会合并后延迟写入
         参数：
             :param filename: 文件名称
             :param key: key
             :param value: value
         """
-        # 先读，再写
+        if filename == ConfigurationManager.CONFIG_FILE_NAME:
+            ConfigurationManager.update_config({key: value})
+            return
         data, file_path = ConfigurationManager.read_json_file(
             filename, path=True)
         data[key] = value
-        with open(file_path, "wb") as f:
-            f.write(orjson.dumps(data))
+        ConfigurationManager._write_json(file_path, data)
 
     @staticmethod
     def config_keys(real_width=0, real_height=0):
@@ -174,7 +433,13 @@ class ConfigurationManager:
             "allowlist_mode_once": False,
             "allowlist_map": [],
             "angle": "1.0",
-            "angle_set": False
+            "angle_set": False,
+            "route_optimize": False,
+            "map_order_optimize": False,
+            "run_trace": False,
+            "frame_buffer_size": 20,
+            "drift_compensation": False,
+            "adaptive_wait": False
         }
 
         return config_keys
@@ -189,20 +454,15 @@ class ConfigurationManager:
     @classmethod
     def init_config_file(cls, real_width, real_height):
         if ConfigurationManager.normalize_file_path(cls.CONFIG_FILE_NAME) is None:
-            with open(cls.CONFIG_FILE_NAME, "wb+") as f:
-                f.write(
-                    orjson.dumps(
-                        cls.config_keys(real_width, real_height)
-                    )
-                )
+            cls._write_json(cls.CONFIG_FILE_NAME,
+                            cls.config_keys(real_width, real_height))
 
     @classmethod
     def config_issubset(cls) -> bool:
         """检查是否配置中都包含了必要配置
         """
         all_keys = cls.config_all_keys()
-        existing_keys = ConfigurationManager.read_json_file(
-            cls.CONFIG_FILE_NAME, False).keys()
+        existing_keys = cls().config_file.keys()
 
         return set(all_keys).issubset(existing_keys)
 
@@ -213,16 +473,11 @@ class ConfigurationManager:
         """
         if not cls.config_issubset():
             print("配置文件不完整，正在写入默认配置")
-            all_keys = cls.config_all_keys()
-            existing_keys = ConfigurationManager.read_json_file(
-                cls.CONFIG_FILE_NAME, False).keys()
-            missing_keys = set(all_keys) - set(existing_keys)
-
-            if missing_keys:
-                initial_dict = cls.config_keys(real_width=0, real_height=0)
-                for key in missing_keys:
-                    ConfigurationManager.modify_json_file(
-                        ConfigurationManager.CONFIG_FILE_NAME, key, initial_dict[key])
+            initial_dict = cls.config_keys(real_width=0, real_height=0)
+            existing = cls().config_file
+            cls.update_config({key: value for key, value in initial_dict.items()
+                               if key not in existing})
+            cls.flush_config()
 
     @staticmethod
     def get_file(path, exclude, exclude_file=None, get_path=False):
@@ -268,7 +523,9 @@ class ConfigurationManager:
     @classmethod
     def config_fix(cls):
         """运行前检查并修复配置"""
-        config = cls.load_config()
-        if config["map_version"] == "HuangQuan":
-            config["allow_fight_e_buy_prop"] = True
-        cls.save_config(config)
+        with cls.transaction():
+            if cls().config_file.get("map_version") == "HuangQuan":
+                cls.update_config({"allow_fight_e_buy_prop": True})
+
+
+atexit.register(ConfigurationManager.flush_config)  # 退出前写入尚未写入的配置
@@ -0,0 +1,92 @@
+import statistics
+from collections import deque
+
+from utils.config import ConfigurationManager
+from utils.log import log
+from utils.singleton import SingletonMeta
+
+AXES = {"w": (1, 1), "s": (1, -1), "a": (0, -1), "d": (0, 1)}  # 按键 -> (坐标轴, 方向)
+
+
+class DriftCompensator(metaclass=SingletonMeta):
+    """
+    移动误差补偿：记录每个方向最近 WINDOW 次按键的超时，预估下一次的固定超时；
+    同时累计当前路线在左右、前后两个方向上的位移误差（以步行秒数计），
+    之后在同一方向上的移动缩短或延长按键时间以抵消误差。
+    转动视角、战斗等步骤后位移误差无法继续按方向累计，会清零。
+    由配置项 drift_compensation 控制是否启用
+    """
+    WINDOW = 20  # 每个方向保留的超时样本数量
+    MIN_SAMPLES = 5  # 开始预估固定超时所需的样本数量
+    MAX_BIAS = 0.05  # 预估固定超时的上限（秒）
+    MAX_CORRECTION_RATIO = 0.5  # 单次修正不超过按键时间的比例
+    MIN_HOLD = 0.05  # 修正后的最短按键时间（秒）
+    KEEP_OPS = {"move", "await", "space", "r"}  # 不影响位移误差累计的步骤
+
+    def __init__(self):
+        self.cfg = ConfigurationManager()
+        self.overshoots = {key: deque(maxlen=self.WINDOW) for key in AXES}
+        self.debt = [0.0, 0.0]  # 两个坐标轴上累计的位移误差（步行秒数）
+        self.total_correction = 0.0  # 累计修正的按键时间（秒）
+        self.corrected_moves = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.cfg.config_file.get("drift_compensation", False)
+
+    def begin_map(self):
+        """开始新地图，清零位移误差"""
+        self.debt = [0.0, 0.0]
+
+    def on_step(self, phase: str, step, elapsed: float):
+        """OpRegistry 的监听函数，会改变朝向或位置的步骤执行后清零位移误差"""
+        if step.op not in self.KEEP_OPS:
+            self.debt = [0.0, 0.0]
+
+    def bias(self, key: str) -> float:
+        """该方向按键的预估固定超时（秒）"""
+        samples = self.overshoots.get(key)
+        if not samples or len(samples) < self.MIN_SAMPLES:
+            return 0.0
+        return min(max(statistics.median(samples), 0.0), self.MAX_BIAS)
+
+    def adjust(self, key: str, hold: float, speed: float = 1.0) -> float:
+        """
+        说明：
+            计算修正后的按键时间
+        参数：
+            :param key: 方向键
+            :param hold: 计划按键时间（秒）
+            :param speed: 移动速度相对步行的倍数，疾跑时为1.53
+        返回：
+            :return 修正后的按键时间
+        """
+        if not self.enabled or key not in AXES:
+            return hold
+        axis, sign = AXES[key]
+        target = hold - sign * self.debt[axis] / speed - self.bias(key)
+        lower = max(self.MIN_HOLD, hold * (1 - self.MAX_CORRECTION_RATIO))
+        target = round(min(max(target, lower), hold * (1 + self.MAX_CORRECTION_RATIO)), 4)
+        if abs(target - hold) >= 0.01:
+            log.debug(f"移动误差补偿：{key} {hold:.4f}秒 -> {target}秒")
+        return target
+
+    def record(self, key: str, planned: float, target: float, actual: float, speed: float = 1.0):
+        """
+        说明：
+            记录一次移动的结果
+        参数：
+            :param key: 方向键
+            :param planned: 未修正的按键时间（秒）
+            :param target: 修正后的按键时间（秒）
+            :param actual: 实际按键时间（秒）
+            :param speed: 移动速度相对步行的倍数
+        """
+        if not self.enabled or key not in AXES:
+            return
+        axis, sign = AXES[key]
+        self.overshoots[key].append(actual - target)
+        self.debt[axis] += sign * (actual - planned) * speed
+        if abs(planned - target) >= 0.001:
+            self.total_correction += planned - target
+            self.corrected_moves += 1
@@ -0,0 +1,138 @@
+import os
+import threading
+import time
+from collections import deque
+
+import cv2
+import orjson
+
+from utils.config import ConfigurationManager
+from utils.log import LOG_DIR, RUN_ID, log
+from utils.singleton import SingletonMeta
+
+
+class FrameBuffer(metaclass=SingletonMeta):
+    """
+    最近截图的环形缓存：在内存中保存最近 frame_buffer_size 张 JPEG 压缩后的截图与识图结果，
+    出现异常（查找图片超时、F键错误、战斗超时等）时写入 logs/frames 供排查。
+    压缩在后台线程进行，截图时不产生额外的编码耗时
+    """
+    DUMP_DIR = os.path.join(LOG_DIR, "frames")
+    JPEG_QUALITY = 70
+    MAX_PENDING = 4  # 等待压缩的截图数量上限，超过时丢弃最早一张的图像，只保留识图结果
+    DUMP_INTERVAL = 10  # 同一原因两次写入的最短间隔（秒），避免连续异常时反复写入
+
+    def __init__(self, dump_dir: str = None):
+        self.cfg = ConfigurationManager()
+        self.dump_dir = dump_dir or self.DUMP_DIR
+        self._frames = deque()  # [{"ts", "rect", "image", "jpg", "matches"}]，压缩后 image 为 None
+        self._pending = deque()  # 等待压缩的截图
+        self._thread = None
+        self._last_dump = {}  # 原因 -> 上次写入时间
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self.dropped = 0  # 来不及压缩而丢弃图像的截图数量
+
+    @property
+    def capacity(self) -> int:
+        return int(self.cfg.config_file.get("frame_buffer_size", 0))
+
+    def add(self, screenshot, rect: tuple):
+        """
+        说明：
+            保存一张截图，交给后台线程压缩为 JPEG，超过数量时丢弃最早的截图
+        参数：
+            :param screenshot: 截图（BGR），保存后不应再修改
+            :param rect: 截图在屏幕中的范围 (左, 上, 右, 下)
+        """
+        capacity = self.capacity
+        if capacity <= 0:
+            return
+        if self._thread is None:
+            self._start()
+        frame = {"ts": time.time(), "rect": rect, "image": screenshot, "jpg": None, "matches": []}
+        with self._lock:
+            self._frames.append(frame)
+            while len(self._frames) > capacity:
+                self._frames.popleft()["image"] = None
+            self._pending.append(frame)
+            while len(self._pending) > self.MAX_PENDING:
+                dropped = self._pending.popleft()
+                if dropped["image"] is not None:
+                    dropped["image"] = None
+                    self.dropped += 1
+            self._ready.notify()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="frame_buffer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._ready:
+                while not self._pending:
+                    self._ready.wait()
+                frame = self._pending.popleft()
+                image = frame["image"]
+            if image is None:  # 已移出缓存
+                continue
+            jpg = self._encode(image)
+            with self._lock:
+                if frame["image"] is image:
+                    frame["jpg"], frame["image"] = jpg, None
+
+    @classmethod
+    def _encode(cls, image):
+        """压缩为 JPEG，失败时返回 None"""
+        ok, jpg = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, cls.JPEG_QUALITY])
+        return jpg.tobytes() if ok else None
+
+    def annotate(self, **match):
+        """为最近一张截图添加识图结果，如 name、score、loc、threshold"""
+        with self._lock:
+            if self._frames:
+                self._frames[-1]["matches"].append(match)
+
+    def dump(self, reason: str, **detail):
+        """
+        说明：
+            将缓存的截图与识图结果写入 logs/frames/<运行编号>_<时间>_<原因>/
+        参数：
+            :param reason: 写入原因，如 click_timeout、f_key_error、fight_timeout
+            :param detail: 需要一同保存的信息
+        返回：
+            :return 写入的目录，未写入时返回 None
+        """
+        now = time.time()
+        with self._lock:
+            if not self._frames or now - self._last_dump.get(reason, 0) < self.DUMP_INTERVAL:
+                return None
+            self._last_dump[reason] = now
+            frames = [dict(frame) for frame in self._frames]
+        folder = os.path.join(
+            self.dump_dir, f"{RUN_ID}_{time.strftime('%H%M%S', time.localtime(now))}_{reason}")
+        try:
+            os.makedirs(folder, exist_ok=True)
+            meta = []
+            for index, frame in enumerate(frames):
+                name = f"{index:02d}.jpg"
+                jpg = frame["jpg"]
+                if jpg is None and frame["image"] is not None:  # 后台线程还未压缩
+                    jpg = self._encode(frame["image"])
+                if jpg is None:
+                    continue
+                with open(os.path.join(folder, name), "wb") as f:
+                    f.write(jpg)
+                meta.append({"file": name, "ts": frame["ts"],
+                             "rect": frame["rect"], "matches": list(frame["matches"])})
+            with open(os.path.join(folder, "meta.json"), "wb") as f:
+                f.write(orjson.dumps({"reason": reason, "detail": detail, "frames": meta},
+                                     option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+        except (OSError, TypeError) as e:
+            log.warning(f"保存异常截图失败：{e}")
+            return None
+        log.info(f"已保存最近{len(frames)}张截图用于排查：{folder}")
+        return folder
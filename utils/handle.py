@@ -1,27 +1,34 @@
-import asyncio
 import random
-import threading
 import time
+from concurrent.futures import wait
 from datetime import datetime
 
 import cv2
 import numpy as np
 import pyautogui
 import win32api
-import win32con
-from pynput.keyboard import Controller as KeyboardController
-from pynput.keyboard import Key as KeyboardKey
 
+from utils.battle_state import BattleMonitor
 from utils.config import ConfigurationManager
+from utils.drift import DriftCompensator
 from utils.exceptions import CustomException
 from utils.img import Img
+from utils.input_backend import input_backend
 from utils.keyboard_event import KeyboardEvent
 from utils.log import log
 from utils.mouse_event import MouseEvent
+from utils.move_timer import MoveTimer
+from utils.route_ops import OpRegistry
+from utils.route_optimizer import SPRINT_SPEED
+from utils.route_timing import RouteTimingDB
 from utils.singleton import SingletonMeta
+from utils.vision_worker import VisionWorker
 
 
 class Handle(metaclass=SingletonMeta):
+    RUN_FIX_INTERVAL = 0.02  # 移动开始后检测疾跑意外开启的间隔（秒）
+    RUN_FIX_LIMIT = 0.3  # 检测疾跑意外开启的时间窗口（秒），与 move_run_fix 的 time_limit 一致
+
     def __init__(self):
         self.mouse_event = MouseEvent()
         self.img = Img()
@@ -48,11 +55,41 @@ class Handle(metaclass=SingletonMeta):
 
         self.multi_config = 1.0
 
-        self.running = False
-        self.thread = None
+        self.run_check = None  # 确认疾跑开启的识图任务
 
         self.arrow_0 = cv2.imread("./picture/screenshot_arrow.png")
 
+        self.route_ops = OpRegistry("route")  # 地图路线步骤分发表
+        self._register_route_ops()
+        self.timing_db = RouteTimingDB()
+        self.drift = DriftCompensator()  # 移动误差补偿
+        self.route_ops.add_listener(self.drift.on_step)
+
+    def _register_route_ops(self):
+        """
+        注册路线步骤处理函数，ctx 为 {"normal_run", "last_key", "weekday"}
+        """
+        ops = self.route_ops
+        ops.register("space", lambda step, ctx: self.handle_space(step.value, step.key))
+        ops.register("caps", lambda step, ctx: self.handle_caps(step.value))
+        ops.register("r", lambda step, ctx: self.handle_r(step.value, step.key))
+        ops.register("f", lambda step, ctx: self.handle_f(step.value))
+        ops.register("check", lambda step, ctx: self.handle_check(step.value, ctx["weekday"]))
+        ops.register("mouse_move", lambda step, ctx: self.mouse_event.mouse_move(step.value))
+        ops.register("fighting", lambda step, ctx: self.handle_fighting(step.value))
+        ops.register("scroll", lambda step, ctx: self.scroll(step.value))
+        ops.register("e", lambda step, ctx: self.handle_e(step.value))  # 用E进入战斗
+        ops.register("esc", lambda step, ctx: self.handle_esc(step.value))
+        ops.register(['1', '2', '3', '4', '5'],
+                     lambda step, ctx: self.handle_num(step.value, step.key), op="num")
+        ops.register("main", lambda step, ctx: self.handle_main(step.value))
+        ops.register("view_set", lambda step, ctx: self.handle_view_set(step.value))
+        ops.register("view_reset", lambda step, ctx: self.handle_view_reset(step.value))
+        ops.register("view_rotate", lambda step, ctx: self.handle_view_rotate(step.value))
+        ops.register("await", lambda step, ctx: self.handle_await(step.value))
+        ops.set_default("move", lambda step, ctx: self.handle_move(
+            step.value, step.key, ctx["normal_run"], ctx["last_key"]))
+
     def handle_space(self, value, key):
         """按下space键，延迟value秒后抬起
         """
@@ -97,6 +134,7 @@ class Handle(metaclass=SingletonMeta):
         else:
             log.info("检测到非正常'F'情况，不执行并跳过'F'")
             self.f_key_error = True
+            self.img.frames.dump("f_key_error")
 
     def _check_f_img(self, value=15, timeout=5):
         """
@@ -314,10 +352,7 @@ class Handle(metaclass=SingletonMeta):
         按下esc键，等待3秒后抬起
         """
         if value == 1:
-            win32api.keybd_event(win32con.VK_ESCAPE, 0, 0, 0)
-            time.sleep(random.uniform(0.09, 0.15))
-            win32api.keybd_event(win32con.VK_ESCAPE, 0,
-                                 win32con.KEYEVENTF_KEYUP, 0)
+            input_backend().tap("esc", random.uniform(0.09, 0.15))
             time.sleep(3)
         else:
             raise CustomException("map数据错误, esc参数只能为1")
@@ -327,9 +362,7 @@ class Handle(metaclass=SingletonMeta):
         按下数字键，等待value秒后抬起
         """
         time.sleep(value)
-        KeyboardController().press(key)
-        time.sleep(0.3)
-        KeyboardController().release(key)
+        input_backend().tap(key, 0.3)
 
     def handle_main(self, value):
         """
@@ -439,10 +472,11 @@ class Handle(metaclass=SingletonMeta):
 
         if offset_list:
             self.multi_config = np.median(offset_list)
-            self.cfg.modify_json_file(
-                filename=self.cfg.CONFIG_FILE_NAME, key="angle", value=str(self.multi_config))
-            self.cfg.modify_json_file(
-                filename=self.cfg.CONFIG_FILE_NAME, key="angle_set", value=True)
+            with self.cfg.transaction():
+                self.cfg.modify_json_file(
+                    filename=self.cfg.CONFIG_FILE_NAME, key="angle", value=str(self.multi_config))
+                self.cfg.modify_json_file(
+                    filename=self.cfg.CONFIG_FILE_NAME, key="angle_set", value=True)
             log.info(f"校准完成，angle: {self.multi_config}")
         else:
             log.info("校准失败")
@@ -524,65 +558,66 @@ class Handle(metaclass=SingletonMeta):
                     log.info('未进入战斗')
 
         self.run_fix_time = 0
-        KeyboardController().press(key)
-        start_time = time.perf_counter()
+        input_backend().press(key)
+        timer = MoveTimer(value)
+        start_time = timer.start
         allow_run = self.cfg.config_file.get("auto_run_in_map", False)
-        add_time = True
         run_in_road = False
         temp_time = 0
         self.run_fixed = False  # 强制断开初始化为否
-        while time.perf_counter() - start_time < value:
-            if value > 2 and not run_in_road and allow_run and not normal_run:
-                self.move_run_fix(start_time)
-                if time.perf_counter() - start_time > 1:
-                    self.enable_run()
-                    self.start_checking()
-                    run_in_road = True
-                    temp_value = value
-                    value = round((value - 1) / 1.53, 4) + 1
-                    self.tatol_save_time += (temp_value - value)
-                    self.last_step_run = True
-            elif value <= 1 and allow_run and add_time and self.last_step_run:
-                value = value + 0.07
-                self.move_run_fix(start_time)
-                add_time = False
-                self.last_step_run = False
-            elif value <= 2:
-                self.move_run_fix(start_time)
-                self.last_step_run = False
+
+        def run_fix(timer):
+            self.move_run_fix(start_time)
+
+        def start_run(timer):
+            nonlocal run_in_road, value
+            self.enable_run()
+            self.start_checking()
+            run_in_road = True
+            temp_value = value
+            value = round((value - 1) / 1.53, 4) + 1
+            timer.duration = self.drift.adjust(key, value, SPRINT_SPEED)
+            self.tatol_save_time += (temp_value - value)
+            # 缩短后不超过2秒的移动与原逻辑一致，不记为疾跑
+            self.last_step_run = value > 2
+
+        # 疾跑识别在前 RUN_FIX_LIMIT 秒内按间隔执行，其余时间休眠等待
+        sprint_planned = value > 2 and allow_run and not normal_run
+        if sprint_planned:
+            timer.at(0, run_fix, self.RUN_FIX_INTERVAL, self.RUN_FIX_LIMIT)
+            timer.at(1, start_run)
+        elif value <= 1 and allow_run and self.last_step_run:
+            value = value + 0.07
+            timer.duration = value
+            timer.at(0, run_fix, self.RUN_FIX_INTERVAL, self.RUN_FIX_LIMIT)
+            self.last_step_run = False
+        elif value <= 2:
+            timer.at(0, run_fix, self.RUN_FIX_INTERVAL, self.RUN_FIX_LIMIT)
+            self.last_step_run = False
+        if not sprint_planned:
+            timer.duration = self.drift.adjust(key, value)
+        timer.wait()
         self.stop_checking()
         temp_time = time.perf_counter() - start_time
-        KeyboardController().release(KeyboardKey.shift)
-        KeyboardController().release(key)
+        with input_backend().batch() as keyboard:
+            keyboard.release("shift")
+            keyboard.release(key)
+        target = timer.duration  # 误差补偿后的按键时间
+        self.drift.record(key, value, target, temp_time, SPRINT_SPEED if run_in_road else 1.0)
+        self.timing_db.note_move(key, value - target, temp_time - target)
+        self.img.trace.emit("key", key=key, hold=round(temp_time, 4), planned=value,
+                            target=round(target, 4), sprint=run_in_road)
         if allow_run:
             time.sleep(0.03)
 
         # 系统卡顿识别
         time_error_check = True
-        if time_error_check and value >= 0.2:
-            extra_time = temp_time - value
+        if time_error_check and target >= 0.2:
+            extra_time = temp_time - target
             if extra_time > 0.05:
                 log.info(f"警告，此处出现系统卡顿，实际多移动{extra_time:.4f}秒，可能造成路线错误")
                 self.time_error_cnt += 1
 
-        # 暂不启用
-        extra_fix = False
-        if extra_fix:
-            extra_time = temp_time - value
-            extra_time = extra_time if not run_in_road else round(
-                extra_time*1.53, 4)
-            if extra_time > 0.05:
-                log.info("强制断开疾跑")
-                fix_start_time = time.perf_counter()
-                key_dict = {'w': 's', 's': 'w', 'a': 'd', 'd': 'a'}
-                if key in key_dict:
-                    KeyboardController().press(key_dict.get(key))
-                    while time.perf_counter() - fix_start_time < extra_time:
-                        pass
-                    KeyboardController().release(key_dict.get(key))
-                    KeyboardController().press(key)
-                    KeyboardController().release(key)
-
     def is_running(self):
         """
         判断是否在疾跑状态
@@ -591,50 +626,40 @@ class Handle(metaclass=SingletonMeta):
             self.img.switch_run, (1720, 930, 0, 0))
         return result['max_val'] > 0.996
 
-    async def check_running_async(self):
-        """异步检测疾跑状态"""
-        count = 0
-        while self.running and count < 2:
-            await asyncio.sleep(0.12)
-            if not self.is_running():
-                log.warning(f"疾跑未能成功开启，再尝试一次，当前{count + 1}次")
-                KeyboardController().press(KeyboardKey.shift)
-                log.info("开启疾跑")
-            else:
+    def confirm_running(self, job, attempts=2, interval=0.12):
+        """
+        在识图线程中确认疾跑已开启，未开启时再按一次 shift，
+        每次检测前等待 interval 秒，移动结束时任务会被取消
+        """
+        for count in range(attempts):
+            if job.wait(interval):
+                return False
+            if self.is_running():
                 log.info("疾跑已成功开启")
-                break
-            count += 1
-        self.running = False
+                return True
+            log.warning(f"疾跑未能成功开启，再尝试一次，当前{count + 1}次")
+            input_backend().press("shift")
+            log.info("开启疾跑")
+        return False
 
     def start_checking(self):
         """启动检测疾跑任务"""
-        self.running = True
-        self.thread = threading.Thread(
-            target=self._run_async_task, daemon=True)
-        self.thread.start()
+        self.run_check = VisionWorker().submit(self.confirm_running)
 
     def stop_checking(self):
-        """停止检测疾跑任务"""
-        if not self.running:
-            # log.warning("检测任务未运行")
+        """停止检测疾跑任务，等待正在进行的识图结束，避免松开按键后再按下 shift"""
+        job, self.run_check = self.run_check, None
+        if job is None or job.done():
             return
-        self.running = False
-        if self.thread:
-            self.thread.join()
-            self.thread = None
+        job.cancel()
+        wait([job])
         log.info("检测任务已停止")
 
-    def _run_async_task(self):
-        """运行异步任务，处理疾跑状态"""
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.run_until_complete(self.check_running_async())
-
     def enable_run(self):
         """强制开启疾跑"""
         log.info("调用enable_run")
         if not self.is_running():
-            KeyboardController().press(KeyboardKey.shift)
+            input_backend().press("shift")
             log.info("开启疾跑")
 
     def move_run_fix(self, start_time, time_limit=0.3):
@@ -664,9 +689,9 @@ class Handle(metaclass=SingletonMeta):
                     if result_run['max_val'] > 0.996:
                         log.info(f"疾跑匹配度: {result_run['max_val']}")
                         log.info("强制断开疾跑")
-                        KeyboardController().press(KeyboardKey.shift)
+                        input_backend().press("shift")
                         time.sleep(0.05)
-                        KeyboardController().release(KeyboardKey.shift)
+                        input_backend().release("shift")
                         self.run_fix_time = current_time  # 更新修复时间
                         self.run_fixed = True
             else:
@@ -689,30 +714,6 @@ class Handle(metaclass=SingletonMeta):
                 return True
         return False
 
-    def detect_fight_status(self, timeout=5.0):
-        start_time = time.time()
-        action_executed = False
-        self.attack_once = False  # 检测fighting时仅攻击一次，避免连续攻击
-        log.info("开始识别是否进入战斗")
-        if self.no_in_fight_status():
-            return False
-        while time.time() - start_time < timeout:
-            main_result = self.img.scan_screenshot(
-                self.img.main_ui, offset=(0, 0, -1630, -800))
-            doubt_result = self.img.scan_temp_screenshot(self.img.doubt_ui)
-            # warn_result = self.img.scan_temp_screenshot(self.img.warn_ui)
-            if main_result['max_val'] < 0.9:
-                return True
-            elif doubt_result["max_val"] > 0.92:
-                action_executed = self.click_action(is_warning=False)
-            # elif warn_result["max_val"] > 0.9:
-            #     action_executed = self.click_action(is_warning=True)
-            if action_executed:
-                return action_executed
-            time.sleep(0.5)
-        log.info(f"结束识别，识别时长{timeout}秒，此处可能无敌人")
-        return False
-
     def click_action(self, is_warning, timeout=8):
         """
         点击攻击怪物
@@ -746,97 +747,12 @@ class Handle(metaclass=SingletonMeta):
         返回：
             是否识别到敌人
         """
-        detect_fight_status_time = self.cfg.config_file.get(
-            "detect_fight_status_time", 15)
-        fight_status = self.detect_fight_status(
-            timeout=detect_fight_status_time)
-        if not fight_status:
-            # 结束识别，此处可能无敌人
-            return False
-
-        start_time = time.time()
-        log.info("战斗开始")
-        not_auto = cv2.imread("./picture/auto.png")
-        not_auto_c = cv2.imread("./picture/not_auto.png")
-        auto_switch = False
-        auto_switch_clicked = False
-        auto_check_cnt = 0
-        first_auto_check = False
-        screenshot_auto_check = None
-        while True:
-            result = self.img.scan_screenshot(self.img.main_ui)
-            elapsed_time = time.time() - start_time
-            if result["max_val"] > 0.92:
-                points = self.img.img_center_point(
-                    result, self.img.main_ui.shape)
-                log.info(f"识别点位{points}")
-                self.total_fight_time += elapsed_time
-                self.fight_error_cnt(elapsed_time)
-                elapsed_minutes = int(elapsed_time // 60)
-                elapsed_seconds = elapsed_time % 60
-                formatted_time = f"{elapsed_minutes}分钟{elapsed_seconds:.2f}秒"
-                self.total_fight_cnt += 1
-                colored_message = (
-                    f"战斗完成,单场用时\033[1;92m『{formatted_time}』\033[0m")
-                log.info(colored_message)
-                match_details = f"匹配度: {result['max_val']:.2f} ({points[0]}, {points[1]})"
-                log.info(match_details)
-
-                # self.rotate()
-                while not self.img.on_main_interface(timeout=2):
-                    time.sleep(0.1)
-                time.sleep(1)
-                return True
+        return BattleMonitor(self).run()
 
-            if not auto_switch and elapsed_time > 5:
-                not_auto_result = self.img.scan_screenshot(not_auto)
-                if not_auto_result["max_val"] > 0.95:
-                    pyautogui.press('v')
-                    log.info("开启自动战斗")
-                    time.sleep(1)
-                    auto_switch_clicked = True
-
-                auto_switch = True
-
-            if elapsed_time > 10 and auto_check_cnt < 2:
-                if screenshot_auto_check is None:
-                    screenshot_auto_check, * \
-                        _ = self.img.take_screenshot(
-                            offset=(40, 20, -1725, -800))
-                if elapsed_time > 15:
-                    if auto_check_cnt == 0:
-                        first_auto_check = self.img.on_interface(check_list=[
-                            screenshot_auto_check], timeout=1, threshold=0.97, offset=(40, 20, -1725, -800), allow_log=False)
-                        auto_check_cnt += 1
-                    if elapsed_time > 20 and first_auto_check and auto_check_cnt == 1:
-                        auto_check_cnt += 1
-                        if self.img.on_interface(check_list=[screenshot_auto_check], timeout=1, threshold=0.97, offset=(40, 20, -1725, -800), allow_log=False):
-                            pyautogui.press('v')
-                            log.info("开启自动战斗（通过行动条识别）")
-                            time.sleep(1)
-                            auto_switch_clicked = True
-
-            if auto_switch_clicked and auto_switch and elapsed_time > 10:
-                not_auto_result_c = self.img.scan_screenshot(not_auto_c)
-                while not_auto_result_c["max_val"] > 0.95:
-                    log.info(
-                        f"开启自动战斗，识别'C'，匹配值：{not_auto_result_c['max_val']}")
-                    pyautogui.press('v')
-                    time.sleep(2)
-                    not_auto_result_c = self.img.scan_screenshot(not_auto_c)
-
-            if elapsed_time > 90:
-                # self.mouse_event.click_target("./picture/auto.png", 0.98, False)
-                self.mouse_event.click_target(
-                    "./picture/continue_fighting.png", 0.98, False)
-                self.mouse_event.click_target(
-                    "./picture/defeat.png", 0.98, False)
-                # self.mouse_event.click_target("./picture/map_4-2_point_3.png", 0.98, False)
-                # self.mouse_event.click_target("./picture/orientation_close.png", 0.98, False)
-                if elapsed_time > 600:
-                    log.info("战斗超时")
-                    return True
-            time.sleep(0.5)
+    def press_auto_battle(self, delay: float = 1):
+        """按V开启自动战斗，之后等待 delay 秒"""
+        pyautogui.press('v')
+        time.sleep(delay)
 
     def fighting(self):
         self.mouse_event.click_center()
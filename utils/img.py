@@ -1,16 +1,73 @@
+import threading
 import time
+from collections import OrderedDict
 
 import cv2
 import numpy as np
 from PIL import ImageGrab
 
+from utils.frame_buffer import FrameBuffer
 from utils.log import log
+from utils.singleton import SingletonMeta
+from utils.trace import RunTrace
 from utils.window import Window
 
 
+class TemplateCache(metaclass=SingletonMeta):
+    """
+    模板图片缓存，按图片地址保存解码后的原图与颜色反转图，
+    供识图与预加载线程共用，超过 MAX_SIZE 张时丢弃最久未使用的图片
+    """
+    MAX_SIZE = 128
+
+    def __init__(self):
+        self._templates = OrderedDict()  # 图片地址 -> (原图, 颜色反转图)
+        self._lock = threading.Lock()
+
+    def load(self, img_path: str) -> tuple:
+        """
+        说明：
+            读取并缓存图片，已缓存时直接返回
+        参数：
+            :param img_path: 图片地址
+        返回：
+            :return (原图, 颜色反转图)，读取失败时为 (None, None)
+        """
+        with self._lock:
+            templates = self._templates.get(img_path)
+            if templates is not None:
+                self._templates.move_to_end(img_path)
+                return templates
+        original = cv2.imread(img_path)
+        if original is None:
+            return None, None
+        templates = (original, cv2.bitwise_not(original))
+        with self._lock:
+            templates = self._templates.setdefault(img_path, templates)
+            while len(self._templates) > self.MAX_SIZE:
+                self._templates.popitem(last=False)
+        return templates
+
+    def get(self, img_path: str):
+        """获取原图"""
+        return self.load(img_path)[0]
+
+    def get_inverted(self, img_path: str):
+        """获取颜色反转图"""
+        return self.load(img_path)[1]
+
+    def clear(self):
+        """清空缓存，资源文件更新后使用"""
+        with self._lock:
+            self._templates.clear()
+
+
 class Img:
     def __init__(self, image_paths: dict = None):
         self.window = Window()
+        self.templates = TemplateCache()
+        self.trace = RunTrace()
+        self.frames = FrameBuffer()
         self.temp_screenshot = (0, 0, 0, 0, 0)  # 初始化临时截图
         self.search_img_allow_retry = False  # 初始化查找图片允许重试为不允许
 
@@ -120,7 +177,7 @@ class Img:
                 log.debug(f'图片匹配值未达到阈值，当前值：{max_val:.3f}')
         return False
 
-    def take_screenshot(self, offset=(0, 0, 0, 0), max_retries=50, retry_interval=2):
+    def take_screenshot(self, offset=(0, 0, 0, 0), max_retries=50, retry_interval=2, record=True):
         """
         说明：
             获取游戏窗口的屏幕截图
@@ -129,6 +186,7 @@ class Img:
             :param offset: 左、上、右、下，正值为向右或向下偏移
             :param max_retries: 最大重试次数
             :param retry_interval: 重试间隔（秒）
+            :param record: 是否记录到运行记录与截图缓存，高频的小区域截图不记录，避免挤出整屏截图
         """
         if self.window.check_window_visibility():
             screenshot_left, screenshot_top, screenshot_right, screenshot_bottom = self.cal_screenshot()
@@ -148,12 +206,18 @@ class Img:
             retries = 0
             while retries <= max_retries:
                 try:
+                    capture_start = time.perf_counter()
                     picture = ImageGrab.grab(
                         (screenshot_left, screenshot_top, screenshot_right, screenshot_bottom), all_screens=True)
                     # 保存截图到本地，测试用
                     # picture.save("test.png")
                     screenshot = np.array(picture)
                     screenshot = cv2.cvtColor(screenshot, cv2.COLOR_BGR2RGB)
+                    if record:
+                        self.trace.emit("capture", ms=round((time.perf_counter() - capture_start) * 1000, 1),
+                                        size=screenshot.shape[1::-1])
+                        self.frames.add(
+                            screenshot, (screenshot_left, screenshot_top, screenshot_right, screenshot_bottom))
                     self.temp_screenshot = (
                         screenshot, screenshot_left, screenshot_top, screenshot_right, screenshot_bottom)
                     return screenshot, screenshot_left, screenshot_top, screenshot_right, screenshot_bottom
@@ -163,6 +227,24 @@ class Img:
                     time.sleep(retry_interval)
             raise RuntimeError(f"截图尝试失败，已达到最大重试次数 {max_retries} 次）")
 
+    @staticmethod
+    def grab_region(rect: tuple, scale: int = 4):
+        """
+        说明：
+            截取屏幕区域的缩小灰度图，用于判断画面是否静止，不记录到运行记录与截图缓存
+        参数：
+            :param rect: 屏幕范围 (左, 上, 右, 下)
+            :param scale: 缩小倍数
+        返回：
+            :return 灰度图，截图失败时为 None
+        """
+        try:
+            picture = ImageGrab.grab(rect, all_screens=True).convert("L")
+        except Exception:
+            return None
+        picture = picture.reduce(scale) if scale > 1 else picture
+        return np.asarray(picture, dtype=np.int16)
+
     def scan_screenshot(self, prepared, offset=(0, 0, 0, 0)) -> dict:
         """
         说明：
@@ -209,8 +291,7 @@ class Img:
         """
         颜色反转
         """
-        original_target = cv2.imread(target_path)
-        inverted_target = cv2.bitwise_not(original_target)
+        inverted_target = self.templates.get_inverted(target_path)
         result = self.scan_screenshot(inverted_target, offset)
         return inverted_target, result
 
@@ -220,7 +301,7 @@ class Img:
         """
         retry = 0
         while retry < 5:
-            original_target = cv2.imread(target_path)
+            original_target = self.templates.get(target_path)
             target,  result_inverted = self.img_trans_bitwise(
                 target_path, offset)
             result_original = self.scan_screenshot(original_target, offset)
@@ -0,0 +1,231 @@
+import ctypes
+import ctypes.wintypes
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import contextmanager
+from typing import List, NamedTuple, Optional
+
+KEY_NAMES = {
+    "shift": 0x10, "ctrl": 0x11, "alt": 0x12, "caps": 0x14, "caps_lock": 0x14,
+    "esc": 0x1B, "space": 0x20, "enter": 0x0D, "tab": 0x09, "backspace": 0x08,
+    **{f"f{index}": 0x6F + index for index in range(1, 13)},
+}
+
+INPUT_MOUSE = 0
+INPUT_KEYBOARD = 1
+KEYEVENTF_KEYUP = 0x0002
+MOUSEEVENTF_MOVE = 0x0001
+MOUSEEVENTF_LEFTDOWN = 0x0002
+MOUSEEVENTF_LEFTUP = 0x0004
+
+
+class KEYBDINPUT(ctypes.Structure):
+    _fields_ = [("wVk", ctypes.wintypes.WORD), ("wScan", ctypes.wintypes.WORD),
+                ("dwFlags", ctypes.wintypes.DWORD), ("time", ctypes.wintypes.DWORD),
+                ("dwExtraInfo", ctypes.c_size_t)]
+
+
+class MOUSEINPUT(ctypes.Structure):
+    _fields_ = [("dx", ctypes.wintypes.LONG), ("dy", ctypes.wintypes.LONG),
+                ("mouseData", ctypes.wintypes.DWORD), ("dwFlags", ctypes.wintypes.DWORD),
+                ("time", ctypes.wintypes.DWORD), ("dwExtraInfo", ctypes.c_size_t)]
+
+
+class HARDWAREINPUT(ctypes.Structure):
+    _fields_ = [("uMsg", ctypes.wintypes.DWORD), ("wParamL", ctypes.wintypes.WORD),
+                ("wParamH", ctypes.wintypes.WORD)]
+
+
+class _INPUTUNION(ctypes.Union):
+    _fields_ = [("ki", KEYBDINPUT), ("mi", MOUSEINPUT), ("hi", HARDWAREINPUT)]
+
+
+class INPUT(ctypes.Structure):
+    _fields_ = [("type", ctypes.wintypes.DWORD), ("union", _INPUTUNION)]
+
+
+class InputEvent(NamedTuple):
+    ts: float  # 提交时间（time.perf_counter）
+    kind: str  # key_down、key_up、mouse_down、mouse_up、move、move_to
+    key: str = ""
+    x: int = 0
+    y: int = 0
+
+
+def key_name(key) -> str:
+    """统一按键名称，兼容 pynput 的 Key 对象"""
+    return getattr(key, "name", key)
+
+
+class InputBackend(ABC):
+    """
+    键盘鼠标输入。同一批次（batch）中的事件会一次性提交，每个事件记录提交时间，
+    最近 HISTORY_SIZE 个事件保存在 history 中。子类实现 _send 发送事件。
+    批次按线程区分，识图线程发送的按键不会并入路线线程正在收集的批次
+    """
+    HISTORY_SIZE = 200
+
+    def __init__(self):
+        self.history = deque(maxlen=self.HISTORY_SIZE)
+        self._local = threading.local()
+
+    @property
+    def _batch(self) -> Optional[List[InputEvent]]:
+        """当前线程正在收集的批次，不在批次中时为 None"""
+        return getattr(self._local, "batch", None)
+
+    @_batch.setter
+    def _batch(self, events: Optional[List[InputEvent]]):
+        self._local.batch = events
+
+    def press(self, key):
+        self._submit([InputEvent(0, "key_down", key_name(key))])
+
+    def release(self, key):
+        self._submit([InputEvent(0, "key_up", key_name(key))])
+
+    def tap(self, key, delay: float = 0):
+        """按下按键，延迟 delay 秒后抬起"""
+        self.press(key)
+        time.sleep(delay)
+        self.release(key)
+
+    def mouse_down(self):
+        self._submit([InputEvent(0, "mouse_down")])
+
+    def mouse_up(self):
+        self._submit([InputEvent(0, "mouse_up")])
+
+    def move_to(self, x: int, y: int):
+        """移动鼠标到屏幕坐标"""
+        self._submit([InputEvent(0, "move_to", x=int(x), y=int(y))])
+
+    def move(self, dx: int, dy: int = 0):
+        """鼠标相对移动，用于转动视角"""
+        self._submit([InputEvent(0, "move", x=int(dx), y=int(dy))])
+
+    @contextmanager
+    def batch(self):
+        """
+        说明：
+            合并同时发生的事件（如松开 shift 与方向键），在退出时一次性提交
+        """
+        if self._batch is not None:
+            yield self
+            return
+        self._batch = []
+        try:
+            yield self
+        finally:
+            events, self._batch = self._batch, None
+            if events:
+                self._flush(events)
+
+    def _submit(self, events: List[InputEvent]):
+        if self._batch is not None:
+            self._batch.extend(events)
+        else:
+            self._flush(events)
+
+    def _flush(self, events: List[InputEvent]):
+        now = time.perf_counter()
+        events = [event._replace(ts=now) for event in events]
+        self._send(events)
+        self.history.extend(events)
+
+    @abstractmethod
+    def _send(self, events: List[InputEvent]):
+        """发送一个批次的事件"""
+
+
+class Win32InputBackend(InputBackend):
+    """通过 SendInput 发送输入，一个批次只调用一次 SendInput"""
+
+    def __init__(self):
+        super().__init__()
+        self.user32 = ctypes.windll.user32
+        self._vk_cache = {}
+
+    def virtual_key(self, key: str) -> int:
+        vk = self._vk_cache.get(key)
+        if vk is None:
+            if key.lower() in KEY_NAMES:
+                vk = KEY_NAMES[key.lower()]
+            elif len(key) == 1:
+                vk = self.user32.VkKeyScanW(ord(key)) & 0xFF
+            else:
+                raise ValueError(f"不支持的按键：{key}")
+            self._vk_cache[key] = vk
+        return vk
+
+    def _send(self, events: List[InputEvent]):
+        inputs = []
+        for event in events:
+            if event.kind == "move_to":
+                # SetCursorPos 不经过 SendInput，先提交之前的事件以保证顺序
+                self._send_inputs(inputs)
+                inputs = []
+                self.user32.SetCursorPos(event.x, event.y)
+            elif event.kind in ("key_down", "key_up"):
+                vk = self.virtual_key(event.key)
+                flags = KEYEVENTF_KEYUP if event.kind == "key_up" else 0
+                inputs.append(INPUT(type=INPUT_KEYBOARD, union=_INPUTUNION(ki=KEYBDINPUT(
+                    wVk=vk, wScan=self.user32.MapVirtualKeyW(vk, 0), dwFlags=flags))))
+            else:
+                flags = {"mouse_down": MOUSEEVENTF_LEFTDOWN, "mouse_up": MOUSEEVENTF_LEFTUP,
+                         "move": MOUSEEVENTF_MOVE}[event.kind]
+                inputs.append(INPUT(type=INPUT_MOUSE, union=_INPUTUNION(mi=MOUSEINPUT(
+                    dx=event.x, dy=event.y, dwFlags=flags))))
+        self._send_inputs(inputs)
+
+    def _send_inputs(self, inputs: list):
+        if inputs:
+            array = (INPUT * len(inputs))(*inputs)
+            self.user32.SendInput(len(inputs), array, ctypes.sizeof(INPUT))
+
+
+class RecordingBackend(InputBackend):
+    """
+    只记录事件、不产生输入，用于在非 Windows 环境中测试路线执行与计时。
+    events 保存全部事件，submissions 为每次提交的事件数量
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.events = []
+        self.submissions = []
+
+    def _send(self, events: List[InputEvent]):
+        self.events.extend(events)
+        self.submissions.append(len(events))
+
+    def held_keys(self) -> set:
+        """当前仍处于按下状态的按键"""
+        held = set()
+        for event in self.events:
+            if event.kind == "key_down":
+                held.add(event.key)
+            elif event.kind == "key_up":
+                held.discard(event.key)
+        return held
+
+
+_backend: Optional[InputBackend] = None
+
+
+def input_backend() -> InputBackend:
+    """获取当前使用的输入后端，Windows 下为 Win32InputBackend，其余系统为 RecordingBackend"""
+    global _backend
+    if _backend is None:
+        _backend = Win32InputBackend() if os.name == "nt" else RecordingBackend()
+    return _backend
+
+
+def set_input_backend(backend: InputBackend) -> InputBackend:
+    """替换输入后端（如测试时使用 RecordingBackend），返回原来的后端"""
+    global _backend
+    previous, _backend = _backend, backend
+    return previous
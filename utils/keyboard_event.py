@@ -1,22 +1,18 @@
-import time
-
-from pynput.keyboard import Controller as KeyboardController
-from pynput.keyboard import Key as KeyboardKey
+from utils.input_backend import input_backend
+from utils.trace import RunTrace
 
 
 class KeyboardEvent:
     def __init__(self):
-        self.keyboard = KeyboardController()
+        self.keyboard = input_backend()
 
     @staticmethod
     def translate_key(key_name: str):
         """
         转换key
         """
-        if key_name == "space":
-            key_name = KeyboardKey.space
         if key_name == "caps":
-            key_name = KeyboardKey.caps_lock
+            key_name = "caps_lock"
 
         return key_name
 
@@ -25,7 +21,6 @@ class KeyboardEvent:
         """
         按下键盘后延迟抬起
         """
+        RunTrace().emit("key", key=key_name, hold=delay)
         key_name = KeyboardEvent.translate_key(key_name)
-        KeyboardController().press(key_name)
-        time.sleep(delay)
-        KeyboardController().release(key_name)
+        input_backend().tap(key_name, delay)
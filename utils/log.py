@@ -15,22 +15,34 @@ import requests
 
 from loguru import logger
 
-from utils.requests import post
+
+_version = None  # 缓存的版本号，配置中的 version 变化时清空
+
+
+def _reset_ver(old, new):
+    global _version
+    if old.get("version") != new.get("version"):
+        _version = None
 
 
 def get_ver():
-    from utils.config import ConfigurationManager
-    cfg = ConfigurationManager()
-    ver = cfg.config_file.get("version", "")
-    if ver == "":
-        month, day, hour, minute = get_folder_modified_time('map')
-        ver = f"{month:02d}{day:02d}{hour:02d}{minute:02d}"
-    return ver
+    global _version
+    if _version is None:
+        from utils.config import ConfigurationManager
+        ConfigurationManager.add_config_listener(_reset_ver)
+        cfg = ConfigurationManager()
+        ver = cfg.config_file.get("version", "")
+        if ver == "":
+            month, day, hour, minute = get_folder_modified_time('map')
+            ver = f"{month:02d}{day:02d}{hour:02d}{minute:02d}"
+        _version = ver
+    return _version
 
 
 log = logger
 LOG_DIR = "logs"
 PATH_LOG = os.path.join(LOG_DIR, '日志文件.log')
+RUN_ID = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")  # 本次运行编号
 
 
 def update_extra(record):
@@ -62,16 +74,8 @@ log.add(PATH_LOG,
 
 def webhook_and_log(message):
     log.info(message)
-    from utils.config import ConfigurationManager  # Circular import
-    cfg = ConfigurationManager()
-    url = cfg.read_json_file(
-        filename=cfg.CONFIG_FILE_NAME, path=False).get("webhook_url")
-    if url == "" or url is None:
-        return
-    try:
-        post(url, json={"content": message})
-    except Exception as e:
-        log.error(f"Webhook发送失败: {e}")
+    from utils.webhook import WebhookDispatcher  # Circular import
+    WebhookDispatcher().send(message)
 
 
 def fetch_php_file_content():
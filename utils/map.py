@@ -1,4 +1,5 @@
 import datetime
+import functools
 import time
 
 import cv2 as cv
@@ -11,12 +12,18 @@ from utils.handle import Handle
 from utils.img import Img
 from utils.log import log, webhook_and_log
 from utils.map_info import MapInfo
+from utils.map_order import MapOrderPlanner
 from utils.map_statu import MapStatu
 from utils.monthly_pass import MonthlyPass
 from utils.mouse_event import MouseEvent
 from utils.time_utils import TimeUtils
 from utils.pause import Pause
+from utils.prefetch import MapPrefetcher
+from utils.route_ops import STEP_BREAK, STEP_CONTINUE, STEP_NEXT, OpRegistry
+from utils.route_optimizer import optimize_map
+from utils.route_timing import RouteTimingDB
 from utils.switch_window import switch_window
+from utils.trace import RunTrace
 
 
 class Map:
@@ -31,6 +38,8 @@ class Map:
         self.blackscreen = BlackScreen()
         self.map_statu = MapStatu()
         self.map_info = MapInfo()
+        self.prefetcher = MapPrefetcher()
+        self.timing_db = RouteTimingDB()
         self.open_map_btn = "m"
 
         self.now = datetime.datetime.now()
@@ -41,6 +50,14 @@ class Map:
         self.planet_png_lst = ["picture\\orientation_2.png", "picture\\orientation_3.png",
                                "picture\\orientation_4.png", "picture\\orientation_5.png", "picture\\orientation_6.png"]
 
+        self.start_ops = OpRegistry("start")  # 传送阶段步骤分发表
+        self._register_start_ops()
+        self.start_ops.add_listener(self.timing_db.record_step)
+        self.handle.route_ops.add_listener(self.timing_db.record_step)
+        self.trace = RunTrace()
+        self.start_ops.add_listener(self.trace.record_step)
+        self.handle.route_ops.add_listener(self.trace.record_step)
+
     def open_map(self):
         """
         尝试打开地图并识别地图标志性的目标图片
@@ -78,7 +95,7 @@ class Map:
             :param offset: 查找偏移，None 时使用默认移动逻辑
         """
         start_time = time.time()
-        target = cv.imread(key)
+        target = self.img.templates.get(key)
 
         while time.time() - start_time < timeout:
             if self._is_target_found(target, threshold):
@@ -144,8 +161,7 @@ class Map:
             :param timeout:超时时间（秒）
         """
         start_time = time.time()
-        target = cv.imread(key)
-        inverted_target = cv.bitwise_not(target)
+        target, inverted_target = self.img.templates.load(key)
         target_list = [target, inverted_target]
         direction_names = ["向下移动", "向上移动"]
         while not self.img.have_screenshot(target_list, (0, 0, 0, 0), threshold) and time.time() - start_time < timeout and threshold >= min_threshold:
@@ -172,14 +188,27 @@ class Map:
         else:
             map_list = self.map_info.map_list[start_index:]
 
+        if self.cfg.config_file.get("map_order_optimize", False):
+            planner = MapOrderPlanner(self.map_info.map_version)
+            ordered = planner.optimize(map_list)
+            planner.log_plan(map_list, ordered)
+            map_list = ordered
         return map_list
 
+    def get_map_path(self, map_json) -> str:
+        """
+        获取地图文件地址
+        """
+        map_base = map_json.split('.')[0]
+        return f"map/{self.map_info.map_version}/{map_base}.json"
+
     def reset_round_count(self):
         """
         重置该锄地轮次相关的计数
         """
         self.handle.total_fight_time = 0
         self.handle.tatol_save_time = 0
+        self.mouse_event.wait_saved = 0.0
         self.handle.total_fight_cnt = 0
         self.handle.total_no_fight_cnt = 0
         self.handle.auto_final_fight_e_cnt = 0
@@ -382,13 +411,20 @@ class Map:
         if f'map_{start}.json' in self.map_info.map_list:
             total_start_time = time.time()
             self.reset_round_count()  # 重置该锄地轮次相关的计数
+            self.start_ops.reset_timings()
+            self.handle.route_ops.reset_timings()
             # map_list = self.map_list[self.map_list.index(f'map_{start}.json'):len(self.map_list)]
             map_list = self.get_map_list(start, start_in_mid)
             max_index = max(index for index, _ in enumerate(map_list))
             self.map_statu.next_map_drag = False  # 初始化下一张图拖动为否
+            self.prefetcher.prefetch(self.get_map_path(map_list[0]))
 
             for index, map_json in enumerate(map_list):
+                if index < max_index:  # 运行当前地图时预加载下一张地图
+                    self.prefetcher.prefetch(
+                        self.get_map_path(map_list[index + 1]))
                 self.process_single_map(index, map_json, dev)
+                self.log_eta(map_list[index + 1:])
                 if self.map_statu.skip_this_map:
                     continue
 
@@ -409,28 +445,71 @@ class Map:
             log.info(
                 "未战斗次数在非黄泉地图首次锄地参考值：70-80，不作为漏怪标准，漏怪具体请在背包中对材料进行溯源查找")
             log.info(f"系统卡顿次数：{self.handle.time_error_cnt}")
+            if self.cfg.config_file.get("adaptive_wait", False):
+                log.info(
+                    f"自适应等待节约的时间为 {self.time_mgr.format_time(self.mouse_event.wait_saved)}")
             log.info(f"奇巧零食使用次数：{self.handle.snack_used}")
             log.debug(
                 f"匹配值小于0.99的图片：{self.mouse_event.img_search_val_dict}")
+            log.debug(f"配置文件读取次数：{self.cfg.raw_read_count}")
             log.info(
                 f"开始地图：{self.map_statu.start_map_name}，结束地图：{self.map_statu.end_map_name}")
             log.info(
                 f"异常F键地图：{self.map_statu.map_f_key_error}"
             )
+            log.info("各类步骤耗时统计：")
+            self.start_ops.log_timings()
+            self.handle.route_ops.log_timings()
+            self.log_timing_history()
         else:
             log.info(f'地图编号 {start} 不存在，请尝试检查地图文件')
 
+    def log_eta(self, remaining_maps: list):
+        """
+        根据历史用时输出剩余地图的预计用时
+        """
+        if not remaining_maps:
+            return
+        map_files = [map_json.split('.')[0] for map_json in remaining_maps]
+        eta, known = self.timing_db.predict_remaining(
+            self.map_info.map_version, map_files)
+        if eta:
+            log.info(
+                f"剩余{len(map_files)}张地图，预计用时{self.time_mgr.format_time(eta)}（{known}张有历史记录）")
+
+    def log_timing_history(self, top: int = 5, runs: int = 3):
+        """
+        输出历史用时占比最高的地图、耗时波动过大的步骤与最近几次运行的移动误差
+        """
+        map_version = self.map_info.map_version
+        for map_file, duration, share in self.timing_db.map_shares(map_version)[:top]:
+            log.info(
+                f"历史用时占比：{map_file} {self.time_mgr.format_time(duration)}（{share:.1%}）")
+        for map_file, phase, step_index, op, count, mean, cv in self.timing_db.unstable_steps(map_version)[:top]:
+            log.info(
+                f"步骤耗时波动过大，路线可能异常：{map_file} {phase}第{step_index + 1}步({op})，{count}次平均{mean:.1f}秒，变异系数{cv:.2f}")
+        for run_id, count, mean, stdev, corrected, correction, drift in self.timing_db.move_errors(map_version)[-runs:]:
+            drift_text = "，".join(f"{axis}{error * 1000:+.1f}毫秒" for axis, error in drift.items())
+            log.info(
+                f"移动误差：运行{run_id} {count}次移动，平均位移误差{mean * 1000:+.1f}毫秒，标准差{stdev * 1000:.1f}毫秒，"
+                f"误差补偿{corrected}次共{correction:.2f}秒" + (f"，累计位移误差{drift_text}" if drift_text else ""))
+
     def process_single_map(self, index, map_json, dev: bool = False):
         """
         处理单张地图
         """
         start_time = time.time()
+        self.timing_db.begin_map(
+            self.map_info.map_version, map_json.split('.')[0])
+        self.trace.begin_map(map_json.split('.')[0])
+        self.handle.drift.begin_map()
         self.process_single_map_start(index, map_json)
 
         self.map_statu.teleport_click_count = 0  # 在每次地图循环结束后重置计数器
 
         # 'check'过期邮包/传送识别失败/无法购买 时 跳过，执行下一张图
         if self.map_statu.skip_this_map:
+            self.timing_db.flush()
             return
 
         self.process_single_map_handle(
@@ -440,16 +519,183 @@ class Map:
         processing_time = end_time - start_time
         formatted_time = self.time_mgr.format_time(processing_time)
         self.map_statu.total_processing_time += processing_time
+        self.timing_db.record_map(processing_time)
+        self.trace.emit("map", seconds=round(processing_time, 2))
         log.info(
             f"{map_json}用时\033[1;92m『{formatted_time}』\033[0m,总计:\033[1;92m『{self.time_mgr.format_time(self.map_statu.total_processing_time)}』\033[0m")
 
+    def _register_start_ops(self):
+        """
+        注册传送阶段（map_data['start']）步骤处理函数，ctx 为 map_data
+        """
+        ops = self.start_ops
+        ops.register("check", self._start_check, parser=self._parse_weekdays)  # 判断周几
+        ops.register("need_allow_map_buy", functools.partial(
+            self._start_need_allow, hint="如果需要开启购买请改为 True 并且【自行确保】能够正常购买对应物品"))
+        ops.register("need_allow_snack_buy", functools.partial(
+            self._start_need_allow, hint="如果需要开启购买请改为 True 并且【自行确保】能够正常购买对应物品"))
+        ops.register("need_allow_memory_token", functools.partial(
+            self._start_need_allow, hint="如果需要开启请改为 True 并且【自行确保】能够正常获得对应物品"))
+        ops.register("normal_run", self._start_normal_run)
+        ops.register("blackscreen", lambda step, ctx: self.calculated.run_mapload_check())  # 强制执行地图加载检测
+        ops.register("esc", lambda step, ctx: pyautogui.press('esc'))
+        ops.register("map", lambda step, ctx: self.open_map())
+        ops.register("main", self._start_main)
+        ops.register("b", lambda step, ctx: self.handle.handle_b())
+        ops.register("await", lambda step, ctx: self.handle.handle_await(step.value))
+        ops.register("space", lambda step, ctx: self.handle.handle_space(step.value, step.key))
+        ops.register(["w", "a", "s", "d"],
+                     lambda step, ctx: self.handle.handle_move(step.value, step.key), op="move")
+        ops.register("F4", lambda step, ctx: pyautogui.press(step.key))
+        ops.register("f", lambda step, ctx: self.handle.handle_f(step.value))
+        ops.register("picture\\max.png", self._start_buy_max)
+        ops.register("picture\\transfer.png", self._start_transfer)
+        # 其余图片：等待后点击，并统计传送点击次数
+        parse_delay = self._parse_picture_delay
+        ops.register(["picture\\1floor.png", "picture\\2floor.png", "picture\\3floor.png"],
+                     self._picture_op(lambda step, ctx: self.handle_floor(step.key)),
+                     parser=parse_delay, op="floor")
+        # 有可能未找到该图片，冗余查找
+        ops.register(["picture\\fanhui_1.png", "picture\\fanhui_2.png"],
+                     self._picture_op(lambda step, ctx: self.handle_back(step.key)),
+                     parser=parse_delay, op="back")
+        ops.register_prefix("picture\\check_4-1_point",
+                            self._picture_op(self._start_check_point), parser=parse_delay)
+        ops.register("picture\\map_4-1_point_2.png",
+                     self._picture_op(self._start_dream_border_point), parser=parse_delay)  # 筑梦边境尝试性修复
+        ops.register("picture\\orientation_1.png",
+                     self._picture_op(lambda step, ctx: self.handle_orientation(step.key, ctx)),
+                     parser=parse_delay)
+        ops.register_prefix("picture\\map_4-3_point",
+                            self._picture_op(self._start_map_4_3_point), parser=parse_delay)
+        ops.register(self.planet_png_lst,
+                     self._picture_op(lambda step, ctx: self.handle_planet(step.key)),
+                     parser=parse_delay, op="planet")
+        ops.set_default("transfer_point", self._picture_op(self._start_transfer_point),
+                        parser=parse_delay)
+        # 路线阶段中需要 Map 处理的步骤
+        self.handle.route_ops.register(
+            "shutdown", lambda step, ctx: self.calculated.handle_shutdown())
+
+    @staticmethod
+    def _parse_weekdays(value):
+        """1代表每天，其余为星期列表，0代表周一，6代表周日"""
+        return [0, 1, 2, 3, 4, 5, 6] if value == 1 else value
+
+    @staticmethod
+    def _parse_picture_delay(value):
+        """图片点击前的等待时间，最长0.8秒"""
+        return min(value, 0.8)
+
+    def _start_check(self, step, map_data):
+        if self.time_mgr.day_init(step.arg):
+            log.info(f"今天{self.now.strftime('%A')}，尝试购买")
+            self.map_statu.skip_this_map = False
+            return STEP_CONTINUE
+        log.info(f"今天{self.now.strftime('%A')}，跳过")
+        self.map_statu.skip_this_map = True
+        return STEP_BREAK
+
+    def _start_need_allow(self, step, map_data, hint=""):
+        config_key = step.key[len("need_"):]
+        self.map_statu.skip_this_map = not self.cfg.config_file.get(
+            config_key, False)
+        if self.map_statu.skip_this_map:
+            log.info(
+                f" config.json 中的 {config_key} 为 False ，跳过该图{map_data['name']}，{hint}")
+            return STEP_BREAK
+        return STEP_NEXT
+
+    def _start_normal_run(self, step, map_data):
+        self.map_statu.normal_run = True  # 此地图json将会被强制设定为禁止疾跑
+
+    def _start_main(self, step, map_data):
+        self.handle.back_to_main()  # 检测并回到主界面
+        time.sleep(2)
+
+    def _start_buy_max(self, step, map_data):
+        if self.calculated.allow_buy_item():
+            self.map_statu.skip_this_map = False
+            self.mouse_event.click_target(step.key, 0.93)
+            return STEP_CONTINUE
+        self.map_statu.skip_this_map = True
+        return STEP_BREAK
+
+    def _start_transfer(self, step, map_data):
+        time.sleep(0.2)
+        if not self.mouse_event.click_target(step.key, 0.93):
+            self.map_statu.skip_this_map = True
+            return STEP_BREAK
+        self.calculated.run_mapload_check()
+        if self.map_statu.temp_point:
+            log.info(f'地图加载前的传送点为 {self.map_statu.temp_point}')
+        return STEP_NEXT
+
+    def _picture_op(self, handler):
+        """
+        包装图片点击步骤：等待 step.arg 秒，执行 handler，
+        统计传送点击次数，并在图片查找超时时标记重试
+        """
+        def run(step, map_data):
+            time.sleep(step.arg)
+            handler(step, map_data)
+            self.map_statu.teleport_click_count += 1
+            log.info(
+                f'传送点击（{self.map_statu.teleport_click_count}）')
+            if self.img.search_img_allow_retry:
+                self.img.frames.dump("search_img_retry", step=step.key,
+                                     retry=self.start_retry_cnt + 1)
+                self.start_retry = True
+                self.start_retry_cnt += 1
+                if self.start_retry_cnt == self.retry_cnt_max:
+                    self.map_statu.skip_this_map = True
+                    self.map_statu.next_map_drag = True
+                return STEP_BREAK
+            return STEP_NEXT
+        return run
+
+    def _start_check_point(self, step, map_data):
+        self.find_transfer_point(step.key, threshold=0.992)
+        if self.mouse_event.click_target(step.key, 0.992, retry_in_map=False):
+            log.info("筑梦机关检查通过")
+        else:
+            log.info("筑梦机关检查不通过，请将机关调整到正确的位置上")
+            self.map_statu.error_check_point = True
+        time.sleep(1)
+
+    def _start_dream_border_point(self, step, map_data):
+        self.find_transfer_point(step.key, threshold=0.975)
+        self.mouse_event.click_target(step.key, 0.95)
+        self.map_statu.temp_point = step.key
+
+    def _start_map_4_3_point(self, step, map_data):
+        self.find_transfer_point(step.key, threshold=0.975)
+        self.mouse_event.click_target(step.key, 0.93)
+        self.map_statu.temp_point = step.key
+        time.sleep(1.7)
+
+    def _start_transfer_point(self, step, map_data):
+        key = step.key
+        if self.allow_drap_map_switch or self.map_drag:
+            self.find_transfer_point(
+                key, threshold=0.975, offset=self.drag_exact)
+        if self.allow_scene_drag_switch:
+            self.find_scene(key, threshold=0.990)
+        if self.img.on_main_interface(timeout=0.5, allow_log=False):
+            log.info("执行alt")
+            self.mouse_event.click_target_with_alt(
+                key, 0.93, clicks=self.multi_click)
+        else:
+            self.mouse_event.click_target(
+                key, 0.93, clicks=self.multi_click, retry_in_map=self.allow_retry_in_map_switch)
+        self.map_statu.temp_point = key
+
     def process_single_map_start(self, index, map_json):
         """
         处理单张地图的开始
         """
         map_base = map_json.split('.')[0]
-        map_data = self.cfg.read_json_file(
-            f"map/{self.map_info.map_version}/{map_base}.json")
+        map_data = self.prefetcher.get_map_data(self.get_map_path(map_json))
         map_data_name = map_data['name']
         map_data_author = map_data['author']
         # 白名单模式下，只运行白名单中的地图
@@ -461,11 +707,12 @@ class Map:
         self.map_drag = self.map_statu.next_map_drag
         self.map_statu.next_map_drag = False
         self.handle.f_key_error = False  # 初始化F键为未发生错误
+        plan = self.start_ops.compile(map_data['start'])
 
-        retry = True
-        retry_cnt = 0
-        while retry and retry_cnt < self.retry_cnt_max:
-            retry = False
+        self.start_retry = True
+        self.start_retry_cnt = 0
+        while self.start_retry and self.start_retry_cnt < self.retry_cnt_max:
+            self.start_retry = False
             # 选择地图
             self.map_statu.start_map_name = map_data_name if index == 0 else self.map_statu.start_map_name
             self.map_statu.end_map_name = map_data_name if index > 0 else self.map_statu.end_map_name
@@ -476,146 +723,42 @@ class Map:
             self.map_statu.skip_this_map = False  # 跳过这张地图
             self.map_statu.temp_point = ""  # 用于输出传送前的点位
             self.map_statu.normal_run = False  # 初始化跑步模式为默认
-            for start in map_data['start']:
-                key = list(start.keys())[0]
-                log.info(key)
-                value = start[key]
+            for step in plan:
+                log.info(step.key)
                 self.img.search_img_allow_retry = False
-                self.allow_map_drag(start)  # 是否强制允许拖动地图初始化
-                self.allow_scene_drag(start)  # 是否强制允许拖动右侧场景初始化
-                self.allow_multi_click(start)  # 多次点击
-                self.allow_retry_in_map(start)  # 是否允许重试
-                if key == "check":  # 判断周几
-                    if value == 1:
-                        value = [0, 1, 2, 3, 4, 5, 6]
-                    # 1代表周二，4代表周五，6代表周日
-                    if self.time_mgr.day_init(value):
-                        log.info(f"今天{self.now.strftime('%A')}，尝试购买")
-                        self.map_statu.skip_this_map = False
-                        continue
-                    else:
-                        log.info(f"今天{self.now.strftime('%A')}，跳过")
-                        self.map_statu.skip_this_map = True
-                        break
-                elif key == "need_allow_map_buy":
-                    self.map_statu.skip_this_map = not self.cfg.read_json_file(
-                        self.cfg.CONFIG_FILE_NAME, False).get('allow_map_buy', False)
-                    if self.map_statu.skip_this_map:
-                        log.info(
-                            f" config.json 中的 allow_map_buy 为 False ，跳过该图{map_data['name']}，如果需要开启购买请改为 True 并且【自行确保】能够正常购买对应物品")
-                        break
-                elif key == "need_allow_snack_buy":
-                    self.map_statu.skip_this_map = not self.cfg.read_json_file(
-                        self.cfg.CONFIG_FILE_NAME, False).get('allow_snack_buy', False)
-                    if self.map_statu.skip_this_map:
-                        log.info(
-                            f" config.json 中的 allow_snack_buy 为 False ，跳过该图{map_data['name']}，如果需要开启购买请改为 True 并且【自行确保】能够正常购买对应物品")
-                        break
-                elif key == "need_allow_memory_token":
-                    self.map_statu.skip_this_map = not self.cfg.read_json_file(
-                        self.cfg.CONFIG_FILE_NAME, False).get('allow_memory_token', False)
-                    if self.map_statu.skip_this_map:
-                        log.info(
-                            f" config.json 中的 allow_memory_token 为 False ，跳过该图{map_data['name']}，如果需要开启请改为 True 并且【自行确保】能够正常获得对应物品")
-                        break
-                elif key == "normal_run":
-                    self.map_statu.normal_run = True  # 此地图json将会被强制设定为禁止疾跑
-                elif key == "blackscreen":
-                    self.calculated.run_mapload_check()  # 强制执行地图加载检测
-                elif key == "esc":
-                    pyautogui.press('esc')
-                elif key == 'map':
-                    self.open_map()
-                elif key == 'main':
-                    self.handle.back_to_main()  # 检测并回到主界面
-                    time.sleep(2)
-                elif key == 'b':
-                    self.handle.handle_b()
-                elif key == 'await':
-                    self.handle.handle_await(value)
-                elif key == "space":
-                    self.handle.handle_space(value, key)
-                elif key in ["w", "a", "s", "d"]:
-                    self.handle.handle_move(value, key)
-                elif key in ["F4"]:
-                    pyautogui.press(key)
-                elif key == "f":
-                    self.handle.handle_f(value)
-                elif key == "picture\\max.png":
-                    if self.calculated.allow_buy_item():
-                        self.map_statu.skip_this_map = False
-                        self.mouse_event.click_target(key, 0.93)
-                        continue
-                    else:
-                        self.map_statu.skip_this_map = True
-                        break
-                elif key in ["picture\\transfer.png"]:
-                    time.sleep(0.2)
-                    if not self.mouse_event.click_target(key, 0.93):
-                        self.map_statu.skip_this_map = True
-                        break
-                    self.calculated.run_mapload_check()
-                    if self.map_statu.temp_point:
-                        log.info(f'地图加载前的传送点为 {self.map_statu.temp_point}')
-                else:
-                    value = min(value, 0.8)
-                    time.sleep(value)
-                    if key in ["picture\\1floor.png", "picture\\2floor.png", "picture\\3floor.png"]:
-                        self.handle_floor(key)
-                    # 有可能未找到该图片，冗余查找
-                    elif key in ["picture\\fanhui_1.png", "picture\\fanhui_2.png"]:
-                        self.handle_back(key)
-                    elif key.startswith("picture\\check_4-1_point"):
-                        self.find_transfer_point(key, threshold=0.992)
-                        if self.mouse_event.click_target(key, 0.992, retry_in_map=False):
-                            log.info("筑梦机关检查通过")
-                        else:
-                            log.info("筑梦机关检查不通过，请将机关调整到正确的位置上")
-                            self.map_statu.error_check_point = True
-                        time.sleep(1)
-                    elif key == "picture\\map_4-1_point_2.png":  # 筑梦边境尝试性修复
-                        self.find_transfer_point(key, threshold=0.975)
-                        self.mouse_event.click_target(key, 0.95)
-                        self.map_statu.temp_point = key
-                    elif key == "picture\\orientation_1.png":
-                        self.handle_orientation(key, map_data)
-                    elif key.startswith("picture\\map_4-3_point"):
-                        self.find_transfer_point(key, threshold=0.975)
-                        self.mouse_event.click_target(key, 0.93)
-                        self.map_statu.temp_point = key
-                        time.sleep(1.7)
-                    elif key in self.planet_png_lst:
-                        self.handle_planet(key)
-                    else:
-                        if self.allow_drap_map_switch or self.map_drag:
-                            self.find_transfer_point(
-                                key, threshold=0.975, offset=self.drag_exact)
-                        if self.allow_scene_drag_switch:
-                            self.find_scene(key, threshold=0.990)
-                        if self.img.on_main_interface(timeout=0.5, allow_log=False):
-                            log.info("执行alt")
-                            self.mouse_event.click_target_with_alt(
-                                key, 0.93, clicks=self.multi_click)
-                        else:
-                            self.mouse_event.click_target(
-                                key, 0.93, clicks=self.multi_click, retry_in_map=self.allow_retry_in_map_switch)
-                        self.map_statu.temp_point = key
-                    self.map_statu.teleport_click_count += 1
-                    log.info(
-                        f'传送点击（{self.map_statu.teleport_click_count}）')
-                    if self.img.search_img_allow_retry:
-                        retry = True
-                        retry_cnt += 1
-                        if retry_cnt == self.retry_cnt_max:
-                            self.map_statu.skip_this_map = True
-                            self.map_statu.next_map_drag = True
-                        break
+                self.allow_map_drag(step.raw)  # 是否强制允许拖动地图初始化
+                self.allow_scene_drag(step.raw)  # 是否强制允许拖动右侧场景初始化
+                self.allow_multi_click(step.raw)  # 多次点击
+                self.allow_retry_in_map(step.raw)  # 是否允许重试
+                signal = self.start_ops.dispatch(step, map_data)
+                if signal == STEP_BREAK:
+                    break
+                if signal == STEP_CONTINUE:
+                    continue
 
                 if self.handle.f_key_error:
                     log.info("F键错误，跳过当前地图")
                     self.map_statu.map_f_key_error.append(map_data_name)
                     break
 
+    def optimize_route(self, map_data, map_base):
+        """
+        说明：
+            开启 route_optimize 时，合并连续同向移动并删除无效步骤
+        参数：
+            :param map_data: 地图数据
+            :param map_base: 地图文件名（不含扩展名），用于日志
+        返回：
+            :return (地图数据, 每个步骤在原路线中的序号)，未开启时序号为 None
+        """
+        if not self.cfg.config_file.get("route_optimize", False):
+            return map_data, None
+        optimized, changes, saved, step_ids = optimize_map(
+            map_data, self.cfg.config_file.get("auto_run_in_map", False))
+        if changes:
+            log.info(f"{map_base}路线优化：{len(changes)}处变更，预计节约{saved:.2f}秒")
+        return optimized, step_ids
+
     def process_single_map_handle(self, map_json, normal_run, dev=False, last_point=""):
         """
         处理单张地图的详细信息
@@ -624,8 +767,8 @@ class Map:
         map_base = map_json.split('.')[0]
         # self.asu.screen = self.img.take_screenshot()[0]
         # self.ang = self.asu.get_now_direc()
-        map_data = self.cfg.read_json_file(
-            f"map/{self.map_info.map_version}/{map_base}.json")
+        map_data, step_ids = self.optimize_route(
+            self.prefetcher.get_map_data(self.get_map_path(map_json)), map_base)
         map_data_name = map_data['name']
         map_filename = map_base
         self.handle.fighting_count = sum(
@@ -634,13 +777,18 @@ class Map:
         total_map_count = len(map_data['map'])
         self.calculated.first_role_check()  # 1号位为跑图角色
         dev_restart = True  # 初始化开发者重开
+        ctx = {"normal_run": normal_run, "last_key": "",
+               "weekday": self.now.strftime('%A')}  # 路线步骤上下文
         self.handle.handle_view_set(0.1)
         # 开发群657378574，密码hoe2333
         while dev_restart:
             dev_restart = False  # 不进行重开
             last_key = ""
             self.handle.last_step_run = False  # 初始化上一次为走路
-            for map_index, map_value in enumerate(map_data["map"]):
+            plan = self.handle.route_ops.compile(map_data["map"], step_ids)
+            for map_index, step in enumerate(plan):
+                map_value = step.raw
+                ctx["last_key"] = last_key
                 press_key = self.pause.check_pause(
                     dev=dev, last_point=last_point)
                 if press_key:
@@ -656,53 +804,17 @@ class Map:
                             self.calculated.run_mapload_check()
                         if press_key == 'F10':
                             pass
-                        map_data = self.cfg.read_json_file(
-                            f"map/{self.map_info.map_version}/{map_base}.json")  # 重新读取最新地图文件
+                        map_data, step_ids = self.optimize_route(self.cfg.read_json_file(
+                            f"map/{self.map_info.map_version}/{map_base}.json"), map_base)  # 重新读取最新地图文件
                         break
                 log.info(
                     f"执行{map_filename}文件:{map_index + 1}/{total_map_count} {map_value}")
 
-                key, value = next(iter(map_value.items()))
                 self.monthly_pass.monthly_pass_check()  # 行进前识别是否接近月卡时间
-                if key == "space":
-                    self.handle.handle_space(value, key)
-                elif key == "caps":
-                    self.handle.handle_caps(value)
-                elif key == "r":
-                    self.handle.handle_r(value, key)
-                elif key == "f":
-                    self.handle.handle_f(value)
-                elif key == "check":
-                    self.handle.handle_check(value, self.now.strftime('%A'))
-                elif key == "mouse_move":
-                    self.handle.mouse_move(value)
-                elif key == "fighting":
-                    self.handle.handle_fighting(value)
-                elif key == "scroll":
-                    self.handle.scroll(value)
-                elif key == "shutdown":
-                    self.handle.handle_shutdown()
-                elif key == "e":
-                    self.handle.handle_e(value)  # 用E进入战斗
-                elif key == "esc":
-                    self.handle.handle_esc(value)
-                elif key in ['1', '2', '3', '4', '5']:
-                    self.handle.handle_num(value, key)
-                elif key == "main":
-                    self.handle.handle_main(value)
-                elif key == "view_set":
-                    self.handle.handle_view_set(value)
-                elif key == "view_reset":
-                    self.handle.handle_view_reset(value)
-                elif key == "view_rotate":
-                    self.handle.handle_view_rotate(value)
-                elif key == "await":
-                    self.handle.handle_await(value)
-                else:
-                    self.handle.handle_move(value, key, normal_run, last_key)
+                self.handle.route_ops.dispatch(step, ctx)
 
                 if self.map_info.map_version == "HuangQuan":
-                    last_key = key
+                    last_key = step.key
 
                 if self.handle.f_key_error:
                     log.info("F键错误，跳过当前地图")
@@ -0,0 +1,148 @@
+import re
+import statistics
+
+from utils.config import ConfigurationManager
+from utils.log import log
+from utils.route_timing import RouteTimingDB
+
+MAP_NAME_PATTERN = re.compile(r"^map_(\d+)-(\d+)_(\d+)")
+GATE_KEYS = ("check", "need_allow_map_buy", "need_allow_snack_buy",
+             "need_allow_memory_token", "picture\\max.png")  # 购买、周几判断等有前置条件的地图
+PLANET_SWITCH_COST = 12.0  # 无历史记录时切换星球的额外用时（秒）
+AREA_SWITCH_COST = 2.0  # 无历史记录时同星球切换区域的额外用时（秒）
+MIN_SAMPLES = 5  # 使用历史记录估算切换开销所需的最少样本数
+
+
+def parse_map_name(map_json: str):
+    """
+    说明：
+        解析地图文件名 map_<星球>-<区域>_<序号>
+    返回：
+        :return (星球, 区域, 序号)，无法解析时返回 None
+    """
+    match = MAP_NAME_PATTERN.match(map_json)
+    if match is None:
+        return None
+    return tuple(int(value) for value in match.groups())
+
+
+def group_key(map_json: str):
+    """同一星球同一区域的地图为一组，无法解析的地图单独成组"""
+    parsed = parse_map_name(map_json)
+    return parsed[:2] if parsed else (map_json,)
+
+
+def is_gated_map(map_data: dict) -> bool:
+    """传送阶段包含购买或周几判断的地图"""
+    return any(key in step for step in map_data.get("start", []) for key in GATE_KEYS)
+
+
+def switch_kind(prev_json: str, next_json: str) -> str:
+    """
+    返回两张地图之间的切换类型：area 同区域，planet 同星球不同区域，other 不同星球
+    """
+    prev_key, next_key = group_key(prev_json), group_key(next_json)
+    if prev_key == next_key:
+        return "area"
+    if len(prev_key) == 2 and len(next_key) == 2 and prev_key[0] == next_key[0]:
+        return "planet"
+    return "other"
+
+
+class MapOrderPlanner:
+    """
+    地图运行顺序优化：在不改变同区域地图顺序、起始地图与前置条件地图位置的前提下，
+    将同一星球的区域排在一起，减少切换星球与区域带来的传送、加载开销
+    """
+
+    def __init__(self, map_version: str):
+        self.map_version = map_version
+        self.timing_db = RouteTimingDB()
+        self.switch_costs = self.estimate_switch_costs()
+
+    def estimate_switch_costs(self) -> dict:
+        """
+        说明：
+            根据历史传送阶段用时估算切换开销，样本不足时使用默认值
+        返回：
+            :return {"area": 0, "planet": 同星球切换区域开销, "other": 切换星球开销}
+        """
+        samples = {"area": [], "planet": [], "other": []}
+        for sequence in self.timing_db.start_sequences(self.map_version):
+            for (prev_file, _), (next_file, elapsed) in zip(sequence, sequence[1:]):
+                samples[switch_kind(prev_file, next_file)].append(elapsed)
+        costs = {"area": 0.0, "planet": AREA_SWITCH_COST, "other": PLANET_SWITCH_COST}
+        if len(samples["area"]) < MIN_SAMPLES:
+            return costs
+        base = statistics.median(samples["area"])
+        for kind in ("planet", "other"):
+            if len(samples[kind]) >= MIN_SAMPLES:
+                costs[kind] = max(statistics.median(samples[kind]) - base, 0.0)
+        return costs
+
+    def transition_cost(self, prev_json: str, next_json: str) -> float:
+        return self.switch_costs[switch_kind(prev_json, next_json)]
+
+    def order_cost(self, map_list: list) -> float:
+        """按顺序运行 map_list 时切换地图的总开销"""
+        return sum(self.transition_cost(prev_json, next_json)
+                   for prev_json, next_json in zip(map_list, map_list[1:]))
+
+    def is_gated(self, map_json: str) -> bool:
+        map_base = map_json.split('.')[0]
+        map_data = ConfigurationManager.read_json_file(
+            f"map/{self.map_version}/{map_base}.json")
+        return is_gated_map(map_data)
+
+    def optimize(self, map_list: list) -> list:
+        """
+        说明：
+            计算切换开销更小的运行顺序。
+            前置条件地图作为分隔点，各组只在分隔点之间调整顺序，分隔点前后的同区域地图分属不同的组；
+            每段内保持第一组不变，之后贪心选择切换开销最小的组，开销相同时保持原顺序
+        参数：
+            :param map_list: 原运行顺序，第一张为起始地图
+        """
+        groups = []  # [[组键, [地图文件], 是否前置条件组]]
+        index_of = {}
+        for map_json in map_list:
+            key = group_key(map_json)
+            if self.is_gated(map_json):
+                groups.append([key, [map_json], True])
+                index_of = {}  # 之后的地图不能合并到分隔点之前的组
+                continue
+            if key not in index_of:
+                index_of[key] = len(groups)
+                groups.append([key, [], False])
+            groups[index_of[key]][1].append(map_json)
+
+        ordered = []
+        segment = []
+        for group in groups:
+            if group[2]:
+                ordered += self._order_segment(segment, ordered[-1] if ordered else None)
+                ordered += group[1]
+                segment = []
+            else:
+                segment.append(group[1])
+        ordered += self._order_segment(segment, ordered[-1] if ordered else None)
+        return ordered
+
+    def _order_segment(self, segment: list, prev_json) -> list:
+        """贪心排列一段内的地图组"""
+        ordered = []
+        remaining = list(segment)
+        if remaining and prev_json is None:
+            ordered += remaining.pop(0)  # 起始地图所在的组保持在最前
+        while remaining:
+            last = ordered[-1] if ordered else prev_json
+            best = min(range(len(remaining)),
+                       key=lambda i: self.transition_cost(last, remaining[i][0]))
+            ordered += remaining.pop(best)
+        return ordered
+
+    def log_plan(self, original: list, ordered: list):
+        saved = self.order_cost(original) - self.order_cost(ordered)
+        if ordered != original:
+            log.info(f"地图顺序已优化，预计减少切换用时{saved:.1f}秒"
+                     f"（切换区域{self.switch_costs['planet']:.1f}秒，切换星球{self.switch_costs['other']:.1f}秒）")
@@ -1,25 +1,31 @@
 import ctypes
 import time
 
-import cv2
+import numpy as np
 import pyautogui
 import win32api
 import win32con
 
 from utils.config import ConfigurationManager
 from utils.img import Img
+from utils.input_backend import input_backend
 from utils.log import log
 from utils.singleton import SingletonMeta
 from utils.window import Window
 
 
 class MouseEvent(metaclass=SingletonMeta):
+    SETTLE_INTERVAL = 0.03  # 等待画面静止时的截图间隔（秒）
+    SETTLE_DIFF = 2.0  # 截图与基准截图的平均灰度差低于该值时视为未变化
+    SETTLE_FRAMES = 3  # 连续多少张截图与基准截图一致时视为画面静止
+
     def __init__(self):
         self.img = Img()
         self.window = Window()
         self.cfg = ConfigurationManager()
 
         self.img_search_val_dict = {}  # 图片匹配值
+        self.wait_saved = 0.0  # 自适应等待节约的时间（秒）
         self.multi_num = 1
         try:
             self.scale = ctypes.windll.user32.GetDpiForWindow(self.window.hwnd) / 96.0
@@ -47,7 +53,7 @@ class MouseEvent(metaclass=SingletonMeta):
         for _ in range(clicks):
             self.mouse_press(x, y, delay)
 
-    def mouse_press(self, x, y, delay: float = 0.05):
+    def mouse_press(self, x, y, delay: float = 0.05, hold_key: str = None):
         """
         说明：
             鼠标点击
@@ -55,13 +61,23 @@ class MouseEvent(metaclass=SingletonMeta):
             :param x: 起始点相对坐标x
             :param y: 起始点相对坐标y
             :param delay: 鼠标点击与抬起之间的延迟（秒）
+            :param hold_key: 点击期间按住的按键，与移动光标、抬起鼠标分别合并为一次提交
         """
-        win32api.SetCursorPos((x, y))
-        time.sleep(0.1)
-        win32api.mouse_event(win32con.MOUSEEVENTF_LEFTDOWN, 0, 0, 0, 0)
-        time.sleep(delay)
-        time.sleep(0.01)
-        win32api.mouse_event(win32con.MOUSEEVENTF_LEFTUP, 0, 0, 0, 0)
+        backend = input_backend()
+        with backend.batch():
+            if hold_key:
+                backend.press(hold_key)
+            backend.move_to(x, y)
+        try:
+            time.sleep(0.1)  # 等待悬停效果，游戏响应前画面不会变化，不使用自适应等待
+            backend.mouse_down()
+            time.sleep(delay)
+            time.sleep(0.01)
+        finally:
+            with backend.batch():
+                backend.mouse_up()
+                if hold_key:
+                    backend.release(hold_key)
 
     def mouse_drag(self, x, y, end_x, end_y):
         """
@@ -73,7 +89,54 @@ class MouseEvent(metaclass=SingletonMeta):
         pyautogui.mouseDown()
         pyautogui.moveTo(left + end_x, top + end_y, duration=0.2)
         pyautogui.mouseUp()
-        time.sleep(1)
+        # 地图拖动后有惯性，等待画面中部静止
+        width, height = right - left, bottom - top
+        self.wait_settle((left + width // 4, top + height // 4, right - width // 4, bottom - height // 4),
+                         1.0, min_wait=0.2)
+
+    def wait_settle(self, rect: tuple, max_wait: float, min_wait: float = 0.0, scale: int = 4) -> float:
+        """
+        说明：
+            输入后等待画面静止：至少等待 min_wait 秒，之后每隔 SETTLE_INTERVAL 秒截取 rect 区域，
+            连续 SETTLE_FRAMES 张截图都与基准截图基本一致时结束，最多等待 max_wait 秒。
+            与基准截图而不是上一张截图比较，缓慢移动的画面会逐渐累积差异，不会被当作静止。
+            未开启配置项 adaptive_wait 时固定等待 max_wait 秒
+        参数：
+            :param rect: 检测的屏幕范围 (左, 上, 右, 下)
+            :param max_wait: 最长等待时间（秒），即原来的固定等待时间
+            :param min_wait: 最短等待时间（秒）
+            :param scale: 截图缩小倍数
+        返回：
+            :return 实际等待时间（秒）
+        """
+        if not self.cfg.config_file.get("adaptive_wait", False):
+            time.sleep(max_wait)
+            return max_wait
+        start_time = time.perf_counter()
+        deadline = start_time + max_wait
+        time.sleep(min_wait)
+        anchor = None  # 基准截图
+        stable = 0  # 与基准截图一致的连续截图数量
+        while True:
+            frame = self.img.grab_region(rect, scale)
+            if frame is None:
+                time.sleep(max(0.0, deadline - time.perf_counter()))
+                break
+            if anchor is not None and anchor.shape == frame.shape and \
+                    np.abs(frame - anchor).mean() < self.SETTLE_DIFF:
+                stable += 1
+                if stable >= self.SETTLE_FRAMES:
+                    break
+            else:
+                anchor, stable = frame, 0
+            remaining = deadline - time.perf_counter()
+            if remaining <= self.SETTLE_INTERVAL:
+                time.sleep(max(0.0, remaining))
+                break
+            time.sleep(self.SETTLE_INTERVAL)
+        waited = time.perf_counter() - start_time
+        self.wait_saved += max(0.0, max_wait - waited)
+        return waited
 
     def mouse_press_alt(self, x, y, delay: float = 0.4):
         """
@@ -83,9 +146,7 @@ class MouseEvent(metaclass=SingletonMeta):
             :param x:相对坐标x
             :param y:相对坐标y
         """
-        win32api.keybd_event(win32con.VK_MENU, 0, 0, 0)
-        self.mouse_press(x, y, delay)
-        win32api.keybd_event(win32con.VK_MENU, 0, win32con.KEYEVENTF_KEYUP, 0)
+        self.mouse_press(x, y, delay, hold_key="alt")
 
     def relative_click(self, points):
         """
@@ -112,7 +173,7 @@ class MouseEvent(metaclass=SingletonMeta):
             x, y = int((left + right) / 2), int((top + bottom) / 2)
             self.mouse_press(x, y)
 
-    def click_target_above_threshold(self, target, threshold, offset, clicks=1, delay=0.05):
+    def click_target_above_threshold(self, target, threshold, offset, clicks=1, delay=0.05, name=""):
         """
         尝试点击匹配度大于阈值的目标图像。
         参数:
@@ -120,10 +181,15 @@ class MouseEvent(metaclass=SingletonMeta):
             :param threshold: 匹配阈值
             :param offset: 左、上、右、下，正值为向右或向下偏移
             :param clicks: 连续点击次数
+            :param name: 目标图像地址，用于运行记录
         返回:
             :return: 是否点击成功
         """
+        match_start = time.perf_counter()
         result = self.img.scan_screenshot(target, offset)
+        self.img.trace.emit("match", name=name, score=round(result["max_val"], 4), loc=result["max_loc"],
+                            threshold=threshold, ms=round((time.perf_counter() - match_start) * 1000, 1))
+        self.img.frames.annotate(name=name, score=result["max_val"], loc=result["max_loc"], threshold=threshold)
         if result["max_val"] > threshold:
             points = self.img.img_center_point(result, target.shape)
             self.click(points, result['max_val'], clicks, delay)
@@ -146,19 +212,18 @@ class MouseEvent(metaclass=SingletonMeta):
             :return 是否点击成功
         """
         # 定义目标图像与颜色反转后的图像
-        original_target = cv2.imread(target_path)
-        inverted_target = cv2.bitwise_not(original_target)
+        original_target, inverted_target = self.img.templates.load(target_path)
         start_time = time.time()
         assigned = False
 
         while time.time() - start_time < timeout:
             click_it, img_search_val = self.click_target_above_threshold(
-                original_target, threshold, offset, clicks, delay)
+                original_target, threshold, offset, clicks, delay, name=target_path)
             if click_it:
                 return True
             if time.time() - start_time > 1:  # 如果超过1秒，同时匹配原图像和颜色反转后的图像
                 click_it, _ = self.click_target_above_threshold(
-                    inverted_target, threshold, offset, clicks, delay)
+                    inverted_target, threshold, offset, clicks, delay, name=f"{target_path}(inverted)")
                 if click_it:
                     log.info("阴阳变转")
                     return True
@@ -179,6 +244,8 @@ class MouseEvent(metaclass=SingletonMeta):
 
         log.info(
             f"查找图片超时 {target_path} ，最相似图片匹配值 {img_search_val}，所需匹配值 {threshold}")
+        self.img.frames.dump("click_timeout", target=target_path,
+                             score=img_search_val, threshold=threshold)
         self.img.search_img_allow_retry = retry_in_map
         return False
 
@@ -240,7 +307,7 @@ class MouseEvent(metaclass=SingletonMeta):
             self.multi_num = self.get_multi_num()
             dx = int(16.5 * y * self.multi_num * self.scale)
             log.debug(f"dx2:{dx}")
-        win32api.mouse_event(win32con.MOUSEEVENTF_MOVE, dx, 0)  # 进行视角移动
+        input_backend().move(dx)  # 进行视角移动
         time.sleep(0.2 * fine)
         if x != y:
             self.mouse_move(x - y, fine, align)
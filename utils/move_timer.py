@@ -0,0 +1,101 @@
+import ctypes
+import heapq
+import os
+import time
+from typing import Callable, Optional
+
+SPIN_MARGIN = 0.0015  # 截止时间前改为忙等的时间（秒），需大于系统 sleep 的误差
+_timer_resolution_set = False
+
+
+def enable_timer_resolution():
+    """Windows 下将系统定时器精度设为 1 毫秒，使 sleep 的误差稳定在 SPIN_MARGIN 以内"""
+    global _timer_resolution_set
+    if _timer_resolution_set or os.name != "nt":
+        return
+    _timer_resolution_set = True
+    try:
+        ctypes.windll.winmm.timeBeginPeriod(1)
+    except (AttributeError, OSError):
+        pass
+
+
+def sleep_until(deadline: float, spin_margin: float = SPIN_MARGIN):
+    """
+    说明：
+        等待到 perf_counter 的指定时刻：先 sleep 到截止时间前 spin_margin 秒，最后一小段忙等
+    参数：
+        :param deadline: 截止时刻（time.perf_counter）
+        :param spin_margin: 忙等的时间
+    """
+    remaining = deadline - time.perf_counter()
+    if remaining > spin_margin:
+        time.sleep(remaining - spin_margin)
+    while time.perf_counter() < deadline:
+        pass
+
+
+class MoveTimer:
+    """
+    移动计时：替代按键期间的忙等循环，在截止时间前休眠，并在指定时刻执行回调（如疾跑识别）。
+    回调中可以修改 duration 以延长或缩短本次移动
+    """
+
+    def __init__(self, duration: float, start: Optional[float] = None, spin_margin: float = SPIN_MARGIN):
+        enable_timer_resolution()
+        self.start = time.perf_counter() if start is None else start
+        self.deadline = self.start + duration
+        self.spin_margin = spin_margin
+        self._events = []  # [(执行时刻, 序号, 回调, 间隔, 结束时刻)]
+        self._seq = 0
+
+    @property
+    def duration(self) -> float:
+        return self.deadline - self.start
+
+    @duration.setter
+    def duration(self, value: float):
+        self.deadline = self.start + value
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def at(self, offset: float, callback: Callable[["MoveTimer"], None],
+           interval: float = 0.0, until: Optional[float] = None):
+        """
+        说明：
+            在开始后 offset 秒执行回调
+        参数：
+            :param offset: 相对开始时间的偏移（秒）
+            :param callback: 回调函数，参数为计时器本身
+            :param interval: 大于0时每隔 interval 秒重复执行
+            :param until: 重复执行的结束偏移（秒），默认持续到移动结束
+        """
+        until = self.start + until if until is not None else None
+        heapq.heappush(self._events, (self.start + offset, self._seq, callback, interval, until))
+        self._seq += 1
+
+    def wait(self) -> float:
+        """
+        说明：
+            执行回调并等待到截止时间
+        返回：
+            :return 实际经过的时间（秒）
+        """
+        while True:
+            now = time.perf_counter()
+            if now >= self.deadline:
+                break
+            if self._events and self._events[0][0] <= now:
+                _, _, callback, interval, until = heapq.heappop(self._events)
+                callback(self)
+                if interval > 0:
+                    next_time = max(time.perf_counter(), now + interval)
+                    if until is None or next_time <= until:
+                        heapq.heappush(self._events, (next_time, self._seq, callback, interval, until))
+                        self._seq += 1
+                continue
+            target = min(self.deadline, self._events[0][0]) if self._events else self.deadline
+            if target - now > self.spin_margin:
+                time.sleep(target - now - self.spin_margin)
+        return time.perf_counter() - self.start
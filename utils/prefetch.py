@@ -0,0 +1,65 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.config import ConfigurationManager
+from utils.img import TemplateCache
+from utils.log import log
+from utils.singleton import SingletonMeta
+
+
+class MapPrefetcher(metaclass=SingletonMeta):
+    """
+    地图预加载：在当前地图运行时，后台读取下一张地图的路线文件，
+    并解码其传送阶段用到的全部图片
+    """
+    KEEP_COUNT = 2  # 保留的地图数量（当前地图 + 下一张地图）
+
+    def __init__(self):
+        self.templates = TemplateCache()
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="map_prefetch")
+        self._futures = {}  # 地图文件地址 -> Future(地图数据)
+        self._lock = threading.Lock()
+
+    def prefetch(self, map_path: str):
+        """
+        说明：
+            提交后台预加载任务
+        参数：
+            :param map_path: 地图文件地址，如 map/default/map_1-1_1.json
+        """
+        with self._lock:
+            if map_path in self._futures:
+                return
+            self._futures[map_path] = self._executor.submit(
+                self._load, map_path)
+            while len(self._futures) > self.KEEP_COUNT:
+                self._futures.pop(next(iter(self._futures)))
+
+    def _load(self, map_path: str) -> dict:
+        """读取地图文件并解码图片"""
+        map_data = ConfigurationManager.read_json_file(map_path)
+        for step in map_data.get("start", []):
+            key = next(iter(step), "")
+            if key.startswith("picture"):
+                self.templates.load(key)
+        log.debug(f"预加载完成：{map_path}")
+        return map_data
+
+    def get_map_data(self, map_path: str) -> dict:
+        """
+        说明：
+            获取地图数据，已预加载时直接返回，否则同步读取
+        参数：
+            :param map_path: 地图文件地址
+        """
+        with self._lock:
+            future = self._futures.get(map_path)
+        if future is not None:
+            try:
+                return future.result()
+            except Exception as e:
+                log.debug(f"预加载失败，重新读取{map_path}：{e}")
+                with self._lock:
+                    self._futures.pop(map_path, None)
+        return ConfigurationManager.read_json_file(map_path)
@@ -1,8 +1,37 @@
+import asyncio
+import hashlib
+import os
+import weakref
+
 import httpx
 import tqdm.asyncio
 from pathlib import Path
 from typing import Dict, Optional, Any, Union, Tuple
 
+CHUNK_SIZE = 64 * 1024  # 下载时每次读取的字节数
+_clients = weakref.WeakKeyDictionary()  # 事件循环 -> 共用的 AsyncClient
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    说明：
+        获取当前事件循环共用的 httpx 客户端，复用连接池
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(follow_redirects=True,
+                                   limits=httpx.Limits(max_connections=10, max_keepalive_connections=10))
+        _clients[loop] = client
+    return client
+
+
+async def close_client():
+    """关闭当前事件循环共用的 httpx 客户端"""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
 
 async def get(url: str,
                 *,
@@ -21,12 +50,11 @@ async def get(url: str,
         :param json: json
         :param timeout: 超时时间
     """
-    async with httpx.AsyncClient() as client:
-        return await client.get(url,
-                                headers=headers,
-                                params=params,
-                                timeout=timeout,
-                                **kwargs)
+    return await get_client().get(url,
+                                  headers=headers,
+                                  params=params,
+                                  timeout=timeout,
+                                  **kwargs)
 
 async def post(url: str,
                 *,
@@ -45,31 +73,79 @@ async def post(url: str,
         :param json: json
         :param timeout: 超时时间
     """
-    async with httpx.AsyncClient() as client:
-        return await client.post(url,
-                                headers=headers,
-                                params=params,
-                                timeout=timeout,
-                                **kwargs)
+    return await get_client().post(url,
+                                   headers=headers,
+                                   params=params,
+                                   timeout=timeout,
+                                   **kwargs)
 
-async def download(url: str, save_path: Path):
+async def download(url: str, save_path: Path, expected_hash: str = "", hash_name: str = "md5", progress: bool = True) -> str:
     """
     说明：
-        下载文件(带进度条)
+        下载文件(带进度条)，先写入 .part 文件，中断后再次下载时通过 Range 续传，
+        续传时以 If-Range 携带首次下载时的 ETag/Last-Modified，远程文件已变化时服务器返回完整文件并重新下载，
+        没有记录校验值的 .part 不续传。下载的同时计算哈希值，完成后替换为 save_path
     参数：
         :param url: url
         :param save_path: 保存路径
+        :param expected_hash: 期望的哈希值，不一致时删除文件并抛出 ValueError
+        :param hash_name: 哈希算法
+        :param progress: 是否显示进度条
+    返回：
+        :return 文件的哈希值
     """
+    save_path = Path(save_path)
     save_path.parent.mkdir(parents=True, exist_ok=True)
-    async with httpx.AsyncClient().stream(method='GET', url=url, follow_redirects=True) as datas:
-        size = int(datas.headers.get('Content-Length', 0))
-        f = save_path.open('wb')
-        async for chunk in tqdm.asyncio.tqdm(iterable=datas.aiter_bytes(1),
-                                                desc=url.split('/')[-1],
-                                                unit='iB',
-                                                unit_scale=True,
-                                                unit_divisor=1024,
-                                                total=size,
-                                                colour='green'):
-            f.write(chunk)
-        f.close()
+    part_path = save_path.with_name(save_path.name + '.part')
+    validator_path = save_path.with_name(save_path.name + '.part.etag')  # .part 对应的远程文件校验值
+    hasher = hashlib.new(hash_name)
+    resume_size = part_path.stat().st_size if part_path.exists() else 0
+    validator = validator_path.read_text(encoding='utf-8').strip() if validator_path.exists() else ''
+    if not validator:
+        resume_size = 0
+    headers = {'Range': f'bytes={resume_size}-', 'If-Range': validator} if resume_size else None
+
+    async with get_client().stream(method='GET', url=url, headers=headers) as datas:
+        if datas.status_code == 416:  # 续传范围无效
+            total = datas.headers.get('Content-Range', '').rpartition('/')[2]
+            if total != str(resume_size):  # .part 与远程文件不一致，重新下载
+                part_path.unlink()
+                validator_path.unlink(missing_ok=True)
+                return await download(url, save_path, expected_hash, hash_name, progress)
+            datas = None  # .part 已下载完整
+        else:
+            datas.raise_for_status()
+            if datas.status_code != 206:  # 服务器不支持续传或远程文件已变化，重新下载
+                resume_size = 0
+                validator = datas.headers.get('ETag') or datas.headers.get('Last-Modified', '')
+                if validator:
+                    validator_path.write_text(validator, encoding='utf-8')
+                else:
+                    validator_path.unlink(missing_ok=True)
+        mode = 'ab' if resume_size else 'wb'
+        if resume_size:
+            with part_path.open('rb') as f:
+                while chunk := f.read(CHUNK_SIZE):
+                    hasher.update(chunk)
+        if datas is not None:
+            size = int(datas.headers.get('Content-Length', 0)) + resume_size
+            with part_path.open(mode) as f, tqdm.asyncio.tqdm(desc=url.split('/')[-1],
+                                                             unit='iB',
+                                                             unit_scale=True,
+                                                             unit_divisor=1024,
+                                                             initial=resume_size,
+                                                             total=size,
+                                                             colour='green',
+                                                             disable=not progress) as bar:
+                async for chunk in datas.aiter_bytes(CHUNK_SIZE):
+                    f.write(chunk)
+                    hasher.update(chunk)
+                    bar.update(len(chunk))
+
+    digest = hasher.hexdigest()
+    validator_path.unlink(missing_ok=True)
+    if expected_hash and digest != expected_hash:
+        part_path.unlink(missing_ok=True)
+        raise ValueError(f"{save_path.name} 哈希校验失败: {digest} != {expected_hash}")
+    os.replace(part_path, save_path)
+    return digest
@@ -0,0 +1,144 @@
+import time
+from collections import namedtuple
+
+from utils.log import log
+
+# 步骤处理函数的返回值
+STEP_NEXT = None  # 继续执行该步骤之后的检查
+STEP_CONTINUE = "continue"  # 跳过该步骤之后的检查，直接执行下一步
+STEP_BREAK = "break"  # 结束当前步骤列表
+
+RouteStep = namedtuple(
+    "RouteStep", ["index", "key", "value", "arg", "op", "handler", "raw"])
+RouteStep.__doc__ = """
+预解析后的路线步骤
+    index: 步骤在地图文件中的序号，路线优化合并步骤后仍为原序号
+    key/value: 地图文件中的原始键值
+    arg: 经过解析函数处理后的参数
+    op: 步骤类型名称，用于耗时统计
+    handler: 处理函数，调用方式为 handler(step, ctx)
+    raw: 地图文件中的原始字典
+"""
+
+
+class OpRegistry:
+    """
+    路线步骤分发表，步骤类型 -> 处理函数
+
+    支持精确匹配、前缀匹配与默认处理，解析结果会被缓存，
+    分发时只需一次字典查找。新的步骤类型通过 register 注册即可。
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._ops = {}  # key -> (op, handler, parser)
+        self._prefixes = []  # [(prefix, (op, handler, parser))]
+        self._default = None  # (op, handler, parser)
+        self._resolved = {}  # key -> (op, handler, parser)，解析缓存
+        self.timings = {}  # op -> [次数, 总耗时, 最大耗时]
+        self.listeners = []  # 步骤耗时监听函数 listener(name, step, elapsed)
+
+    def register(self, keys, handler, parser=None, op=None):
+        """
+        说明：
+            注册步骤处理函数
+        参数：
+            :param keys: 步骤键，可为字符串或字符串列表
+            :param handler: 处理函数 handler(step, ctx)
+            :param parser: 参数预解析函数 parser(value)
+            :param op: 步骤类型名称，默认为步骤键
+        """
+        if isinstance(keys, str):
+            keys = [keys]
+        for key in keys:
+            self._ops[key] = (op or key, handler, parser)
+        self._resolved.clear()
+
+    def register_prefix(self, prefix: str, handler, parser=None, op=None):
+        """注册以 prefix 开头的步骤键的处理函数"""
+        self._prefixes.append((prefix, (op or prefix, handler, parser)))
+        self._resolved.clear()
+
+    def set_default(self, op: str, handler, parser=None):
+        """设置未匹配任何步骤键时的处理函数"""
+        self._default = (op, handler, parser)
+        self._resolved.clear()
+
+    def add_listener(self, listener):
+        """添加步骤耗时监听函数 listener(name, step, elapsed)，重复添加无效"""
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+
+    def resolve(self, key: str) -> tuple:
+        """
+        说明：
+            查找步骤键对应的 (op, handler, parser)
+        """
+        entry = self._resolved.get(key)
+        if entry is None:
+            entry = self._ops.get(key)
+            if entry is None:
+                entry = next((e for prefix, e in self._prefixes
+                              if key.startswith(prefix)), self._default)
+            if entry is None:
+                raise KeyError(f"[{self.name}]未注册的步骤类型：{key}")
+            self._resolved[key] = entry
+        return entry
+
+    def compile(self, steps: list, step_ids: list = None) -> list:
+        """
+        说明：
+            将地图文件中的步骤列表预解析为 RouteStep 列表
+        参数：
+            :param steps: 地图文件中的步骤列表，如 map_data['map']
+            :param step_ids: 每个步骤在原路线中的序号，默认为列表中的位置
+        """
+        plan = []
+        for index, raw in zip(step_ids or range(len(steps)), steps):
+            key, value = next(iter(raw.items()))
+            op, handler, parser = self.resolve(key)
+            arg = parser(value) if parser else value
+            plan.append(RouteStep(index, key, value, arg, op, handler, raw))
+        return plan
+
+    def dispatch(self, step: RouteStep, ctx=None):
+        """
+        说明：
+            执行步骤并记录耗时
+        返回：
+            :return 处理函数的返回值，STEP_NEXT/STEP_CONTINUE/STEP_BREAK
+        """
+        start_time = time.perf_counter()
+        try:
+            return step.handler(step, ctx)
+        finally:
+            elapsed = time.perf_counter() - start_time
+            self._record(step.op, elapsed)
+            for listener in self.listeners:
+                listener(self.name, step, elapsed)
+
+    def _record(self, op: str, elapsed: float):
+        timing = self.timings.get(op)
+        if timing is None:
+            self.timings[op] = [1, elapsed, elapsed]
+        else:
+            timing[0] += 1
+            timing[1] += elapsed
+            timing[2] = max(timing[2], elapsed)
+
+    def reset_timings(self):
+        """重置耗时统计"""
+        self.timings.clear()
+
+    def timing_report(self) -> list:
+        """
+        返回按总耗时降序排列的 [(op, 次数, 总耗时, 最大耗时)]
+        """
+        return sorted(((op, *timing) for op, timing in self.timings.items()),
+                      key=lambda item: item[2], reverse=True)
+
+    def log_timings(self, top: int = 10):
+        """输出耗时最多的步骤类型"""
+        for op, count, total, longest in self.timing_report()[:top]:
+            log.info(
+                f"[{self.name}]{op}：{count}次，总计{total:.1f}秒，平均{total / count:.2f}秒，最长{longest:.2f}秒")
@@ -0,0 +1,178 @@
+import copy
+
+MOVE_KEYS = ("w", "a", "s", "d")
+SPRINT_MIN_VALUE = 2  # 移动时间大于该值时开启疾跑
+SPRINT_WALK_TIME = 1  # 开启疾跑前的步行时间
+SPRINT_SPEED = 1.53  # 疾跑相对步行的速度
+STOP_RUN_FIX = 0.07  # 疾跑后短距离移动的补偿时间
+MOVE_TAIL_SLEEP = 0.03  # 允许疾跑时每次移动结束后的等待时间
+NOOP_STEPS = ("await", "r")  # 参数为0时无任何效果的步骤
+
+
+class MoveState:
+    """
+    模拟 Handle.handle_move 中与疾跑相关的状态
+    """
+
+    def __init__(self, allow_run: bool = True, normal_run: bool = False):
+        self.allow_run = allow_run
+        self.normal_run = normal_run
+        self.last_step_run = False
+
+    def copy(self):
+        state = MoveState(self.allow_run, self.normal_run)
+        state.last_step_run = self.last_step_run
+        return state
+
+    def will_sprint(self, value: float) -> bool:
+        """该次移动是否会开启疾跑"""
+        return value > SPRINT_MIN_VALUE and self.allow_run and not self.normal_run
+
+    def move(self, value: float) -> tuple:
+        """
+        说明：
+            模拟一次移动并更新状态
+        返回：
+            :return (步行等效距离, 实际按键时间, 是否疾跑)
+        """
+        if self.will_sprint(value):
+            hold = round((value - SPRINT_WALK_TIME) / SPRINT_SPEED, 4) + SPRINT_WALK_TIME
+            # 与 Handle.handle_move 一致：缩短后不超过2秒的移动不记为疾跑
+            self.last_step_run = hold > SPRINT_MIN_VALUE
+            return value, hold, True
+        if value <= 1 and self.allow_run and self.last_step_run:
+            self.last_step_run = False
+            return value + STOP_RUN_FIX, value + STOP_RUN_FIX, False
+        if value <= SPRINT_MIN_VALUE:
+            self.last_step_run = False
+        return value, value, False
+
+    def step_cost(self, value: float) -> float:
+        """不改变状态，计算一次移动的耗时（按键时间 + 结束等待）"""
+        _, hold, _ = self.copy().move(value)
+        return hold + (MOVE_TAIL_SLEEP if self.allow_run else 0)
+
+
+def step_item(step: dict) -> tuple:
+    """返回步骤的 (key, value)"""
+    return next(iter(step.items()))
+
+
+def is_move(step: dict) -> bool:
+    return len(step) == 1 and step_item(step)[0] in MOVE_KEYS
+
+
+def is_noop(step: dict) -> bool:
+    key, value = step_item(step)
+    return len(step) == 1 and key in NOOP_STEPS and value == 0
+
+
+def _merge_value(state: MoveState, values: list):
+    """
+    说明：
+        计算合并连续同向移动后的时间，使步行等效距离与结束后的疾跑状态都与合并前一致
+    返回：
+        :return 合并后的时间，无法等效合并时返回 None
+    """
+    origin = state.copy()
+    distance = sum(origin.move(value)[0] for value in values)
+    for merged in (distance, distance - STOP_RUN_FIX):
+        merged = round(merged, 4)
+        if merged <= 0:
+            continue
+        trial = state.copy()
+        if abs(trial.move(merged)[0] - distance) < 1e-6 and trial.last_step_run == origin.last_step_run:
+            return merged
+    return None
+
+
+def optimize_route(steps: list, allow_run: bool = True, normal_run: bool = False) -> tuple:
+    """
+    说明：
+        优化路线步骤：删除无效步骤，合并连续同向移动。
+        合并遵循 handle_move 的疾跑补偿 (value - 1) / 1.53 + 1，保证移动距离不变
+    参数：
+        :param steps: 地图文件中的 map 步骤列表
+        :param allow_run: 是否允许疾跑（auto_run_in_map）
+        :param normal_run: 地图是否强制禁止疾跑
+    返回：
+        :return (优化后的步骤列表, 变更记录列表, 每个步骤在原路线中的序号)
+    """
+    result = []
+    changes = []
+    step_ids = []
+    state = MoveState(allow_run, normal_run)
+    prev_key = ""
+    index = 0
+    while index < len(steps):
+        step = steps[index]
+        key, value = step_item(step)
+        # 黄泉地图中 e 之后的步骤需要保持相邻关系
+        if is_noop(step) and prev_key != "e":
+            changes.append(("drop", index, [step], None))
+            index += 1
+            continue
+        if is_move(step):
+            end = index + 1
+            while end < len(steps) and is_move(steps[end]) and step_item(steps[end])[0] == key:
+                end += 1
+            group = steps[index:end]
+            if len(group) > 1:
+                merged = _merge_value(state, [step_item(s)[1] for s in group])
+                if merged is not None:
+                    state.move(merged)
+                    result.append({key: merged})
+                    step_ids.append(index)
+                    changes.append(("merge", index, group, {key: merged}))
+                    prev_key = key
+                    index = end
+                    continue
+            state.move(value)
+        result.append(copy.deepcopy(step))
+        step_ids.append(index)
+        prev_key = key
+        index += 1
+    return result, changes, step_ids
+
+
+def route_move_time(steps: list, allow_run: bool = True, normal_run: bool = False) -> float:
+    """计算路线中全部移动步骤的预计耗时"""
+    state = MoveState(allow_run, normal_run)
+    total = 0.0
+    for step in steps:
+        if is_move(step):
+            total += state.step_cost(step_item(step)[1])
+            state.move(step_item(step)[1])
+    return total
+
+
+def is_normal_run_map(map_data: dict) -> bool:
+    """地图传送阶段是否包含 normal_run（强制禁止疾跑）"""
+    return any("normal_run" in step for step in map_data.get("start", []))
+
+
+def optimize_map(map_data: dict, allow_run: bool = True) -> tuple:
+    """
+    说明：
+        优化整张地图
+    返回：
+        :return (优化后的地图数据, 变更记录列表, 节约时间（秒）, 每个步骤在原路线中的序号)
+    """
+    normal_run = is_normal_run_map(map_data)
+    steps, changes, step_ids = optimize_route(map_data["map"], allow_run, normal_run)
+    saved = route_move_time(map_data["map"], allow_run, normal_run) - \
+        route_move_time(steps, allow_run, normal_run)
+    optimized = dict(map_data)
+    optimized["map"] = steps
+    return optimized, changes, saved, step_ids
+
+
+def format_changes(changes: list) -> list:
+    """将变更记录格式化为可读的差异报告"""
+    lines = []
+    for kind, index, group, merged in changes:
+        if kind == "merge":
+            lines.append(f"  第{index + 1}-{index + len(group)}步 合并 {group} -> {merged}")
+        else:
+            lines.append(f"  第{index + 1}步 删除 {group[0]}")
+    return lines
@@ -0,0 +1,223 @@
+import os
+import sqlite3
+import statistics
+import threading
+import time
+
+from utils.log import LOG_DIR, RUN_ID, log
+from utils.singleton import SingletonMeta
+
+
+class RouteTimingDB(metaclass=SingletonMeta):
+    """
+    路线步骤耗时记录，保存在本地 SQLite 中，
+    以 (地图版本, 地图文件, 阶段, 步骤序号) 为键，用于预估剩余时间与排查异常路线
+    """
+    DB_FILE = os.path.join(LOG_DIR, "route_timing.db")
+    PLANNED_OPS = {"move", "await", "space", "caps", "r"}  # 参数即为计划耗时的步骤
+    MAP_PHASE = "map"  # 整张地图用时的阶段名称
+    RECENT_SAMPLES = 10  # 预估时只使用最近的样本数量
+    MOVE_AXES = {"w": ("前后", 1), "s": ("前后", -1), "d": ("左右", 1), "a": ("左右", -1)}  # 移动按键 -> (方向, 符号)
+
+    def __init__(self, db_file: str = None):
+        self.db_file = db_file or self.DB_FILE
+        self.map_version = ""
+        self.map_file = ""
+        self._rows = []  # 待写入的记录
+        self._move = None  # 当前移动步骤的 (按键, 误差补偿, 按键超时)
+        self._lock = threading.Lock()
+        self._conn = None
+        try:
+            os.makedirs(os.path.dirname(self.db_file) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.db_file, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS step_timing ("
+                "run_id TEXT, ts REAL, map_version TEXT, map_file TEXT, phase TEXT, "
+                "step_index INTEGER, op TEXT, planned REAL, actual REAL, correction REAL, hold_error REAL, "
+                "move_key TEXT)")
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(step_timing)")]
+            for column, column_type in (("correction", "REAL"), ("hold_error", "REAL"), ("move_key", "TEXT")):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE step_timing ADD COLUMN {column} {column_type}")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_step_timing "
+                "ON step_timing (map_version, map_file, phase, step_index)")
+            self._conn.commit()
+        except sqlite3.Error as e:
+            log.warning(f"路线耗时数据库不可用，将不记录步骤耗时：{e}")
+            self._conn = None
+
+    def begin_map(self, map_version: str, map_file: str):
+        """设置当前地图，之后的步骤耗时都记在该地图下"""
+        self.map_version = map_version
+        self.map_file = map_file
+
+    def record_step(self, phase: str, step, elapsed: float):
+        """
+        说明：
+            记录一个步骤的耗时，可直接作为 OpRegistry 的监听函数
+        参数：
+            :param phase: 阶段，start 为传送阶段，route 为路线阶段
+            :param step: RouteStep
+            :param elapsed: 实际耗时（秒）
+        """
+        planned = step.value if step.op in self.PLANNED_OPS and isinstance(
+            step.value, (int, float)) else None
+        move_key = correction = hold_error = None
+        if step.op == "move" and self._move is not None:
+            (move_key, correction, hold_error), self._move = self._move, None
+        self._append(phase, step.index, step.op, planned, elapsed, correction, hold_error, move_key)
+
+    def note_move(self, key: str, correction: float, hold_error: float):
+        """
+        说明：
+            记录当前移动步骤的按键结果，与该步骤的耗时一同写入
+        参数：
+            :param key: 移动按键
+            :param correction: 误差补偿缩短的按键时间（秒）
+            :param hold_error: 实际按键时间与补偿后按键时间之差（秒）
+        """
+        self._move = (key, round(correction, 4), round(hold_error, 4))
+
+    def record_map(self, elapsed: float):
+        """记录整张地图的用时并写入数据库"""
+        self._append(self.MAP_PHASE, -1, self.MAP_PHASE, None, elapsed)
+        self.flush()
+
+    def _append(self, phase, step_index, op, planned, actual, correction=None, hold_error=None, move_key=None):
+        if self._conn is None:
+            return
+        with self._lock:
+            self._rows.append((RUN_ID, time.time(), self.map_version, self.map_file,
+                               phase, step_index, op, planned, actual, correction, hold_error, move_key))
+
+    def flush(self):
+        """将缓存的记录写入数据库"""
+        if self._conn is None:
+            return
+        with self._lock:
+            rows, self._rows = self._rows, []
+            if not rows:
+                return
+            try:
+                self._conn.executemany(
+                    "INSERT INTO step_timing (run_id, ts, map_version, map_file, phase, step_index, "
+                    "op, planned, actual, correction, hold_error, move_key) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                self._conn.commit()
+            except sqlite3.Error as e:
+                log.warning(f"写入路线耗时失败：{e}")
+
+    def _query(self, sql: str, params: tuple = ()) -> list:
+        if self._conn is None:
+            return []
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def map_durations(self, map_version: str) -> dict:
+        """
+        返回 {地图文件: 最近用时的中位数}
+        """
+        samples = {}
+        for map_file, actual in self._query(
+                "SELECT map_file, actual FROM step_timing "
+                "WHERE map_version = ? AND phase = ? ORDER BY ts DESC",
+                (map_version, self.MAP_PHASE)):
+            durations = samples.setdefault(map_file, [])
+            if len(durations) < self.RECENT_SAMPLES:
+                durations.append(actual)
+        return {map_file: statistics.median(durations) for map_file, durations in samples.items()}
+
+    def predict_remaining(self, map_version: str, map_files: list) -> tuple:
+        """
+        说明：
+            预估运行 map_files 剩余地图所需时间，无记录的地图按已知地图的平均用时估算
+        返回：
+            :return (预估秒数, 有记录的地图数量)
+        """
+        durations = self.map_durations(map_version)
+        if not durations:
+            return 0.0, 0
+        fallback = statistics.mean(durations.values())
+        known = [durations[f] for f in map_files if f in durations]
+        total = sum(known) + fallback * (len(map_files) - len(known))
+        return total, len(known)
+
+    def map_shares(self, map_version: str) -> list:
+        """
+        返回按用时降序排列的 [(地图文件, 用时中位数, 占总用时比例)]
+        """
+        durations = self.map_durations(map_version)
+        total = sum(durations.values())
+        if not total:
+            return []
+        return sorted(((map_file, duration, duration / total) for map_file, duration in durations.items()),
+                      key=lambda item: item[1], reverse=True)
+
+    def unstable_steps(self, map_version: str, min_samples: int = 3, cv_threshold: float = 0.5) -> list:
+        """
+        说明：
+            查找耗时波动过大的步骤（变异系数 > cv_threshold），
+            常见于战斗时有时无、识图反复超时等路线异常
+        返回：
+            :return 按变异系数降序排列的 [(地图文件, 阶段, 步骤序号, 步骤类型, 样本数, 平均耗时, 变异系数)]
+        """
+        samples = {}
+        for map_file, phase, step_index, op, actual in self._query(
+                "SELECT map_file, phase, step_index, op, actual FROM step_timing "
+                "WHERE map_version = ? AND phase != ?", (map_version, self.MAP_PHASE)):
+            samples.setdefault((map_file, phase, step_index, op), []).append(actual)
+        unstable = []
+        for key, durations in samples.items():
+            if len(durations) < min_samples:
+                continue
+            mean = statistics.mean(durations)
+            if mean <= 0:
+                continue
+            cv = statistics.stdev(durations) / mean
+            if cv > cv_threshold:
+                unstable.append((*key, len(durations), mean, cv))
+        return sorted(unstable, key=lambda item: item[-1], reverse=True)
+
+    def start_sequences(self, map_version: str) -> list:
+        """
+        说明：
+            按运行编号返回各次运行中依次传送的地图与传送阶段用时，用于估算切换星球/区域的开销
+        返回：
+            :return [[(地图文件, 传送阶段用时), ...], ...]
+        """
+        runs = {}
+        for run_id, map_file, elapsed in self._query(
+                "SELECT run_id, map_file, SUM(actual) FROM step_timing "
+                "WHERE map_version = ? AND phase = 'start' "
+                "GROUP BY run_id, map_file ORDER BY run_id, MIN(ts)", (map_version,)):
+            runs.setdefault(run_id, []).append((map_file, elapsed))
+        return list(runs.values())
+
+    def move_errors(self, map_version: str) -> list:
+        """
+        说明：
+            按运行统计移动步骤的位移误差（实际按键时间 - 路线中的按键时间，即按键超时 - 误差补偿），
+            补偿生效时位移误差应接近 0，各方向的累计误差不随地图数量增加而持续增大，用于比较开启误差补偿前后的效果
+        返回：
+            :return 按时间排序的 [(运行编号, 移动步骤数, 平均位移误差, 位移误差标准差, 补偿的步骤数, 补偿总时间,
+                    {方向: 累计位移误差})]，误差单位为秒
+        """
+        runs = {}
+        for run_id, hold_error, correction, move_key in self._query(
+                "SELECT run_id, hold_error, correction, move_key FROM step_timing "
+                "WHERE map_version = ? AND op = 'move' AND hold_error IS NOT NULL ORDER BY ts",
+                (map_version,)):
+            runs.setdefault(run_id, []).append((hold_error - (correction or 0.0), correction or 0.0, move_key))
+        result = []
+        for run_id, rows in runs.items():
+            errors = [error for error, _, _ in rows]
+            corrections = [correction for _, correction, _ in rows if correction]
+            drift = {}
+            for error, _, move_key in rows:
+                if move_key in self.MOVE_AXES:
+                    axis, sign = self.MOVE_AXES[move_key]
+                    drift[axis] = drift.get(axis, 0.0) + sign * error
+            result.append((run_id, len(rows), statistics.mean(errors), statistics.pstdev(errors),
+                           len(corrections), sum(corrections), drift))
+        return result
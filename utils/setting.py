@@ -335,8 +335,7 @@ class Setting(metaclass=SingletonMeta):
         target = [map_name]
 
         # 更新配置文件
-        current = ConfigurationManager.read_json_file(
-            self.cfg.CONFIG_FILE_NAME, False).get(config_key, [])
+        current = self.cfg.config_file.get(config_key, [])
         updated = list(set(current + target))
 
         ConfigurationManager.modify_json_file(
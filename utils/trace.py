@@ -0,0 +1,154 @@
+import atexit
+import os
+import queue
+import threading
+import time
+
+import orjson
+
+from utils.config import ConfigurationManager
+from utils.log import LOG_DIR, RUN_ID, log
+from utils.singleton import SingletonMeta
+
+
+class RunTrace(metaclass=SingletonMeta):
+    """
+    结构化运行记录，与文字日志并行，每行一个 JSON 事件，
+    保存在 logs/trace/<运行编号>.jsonl，用于分析识图阈值、等待时间等参数。
+
+    事件先放入有界队列，由后台线程批量写入，队列满时丢弃新事件并计数，
+    不会阻塞跑图。由配置项 run_trace 控制是否记录
+    """
+    TRACE_DIR = os.path.join(LOG_DIR, "trace")
+    QUEUE_SIZE = 10000  # 队列上限
+    MAX_FILE_SIZE = 50 * 1024 * 1024  # 单个文件上限，超过后写入新文件
+    RETENTION_DAYS = 7  # 记录保留天数
+
+    def __init__(self, trace_dir: str = None):
+        self.cfg = ConfigurationManager()
+        self.trace_dir = trace_dir or self.TRACE_DIR
+        self.map_file = ""  # 当前地图，会写入每个事件
+        self.dropped = 0  # 队列满时丢弃的事件数量
+        self._queue = queue.Queue(maxsize=self.QUEUE_SIZE)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._part = 0
+        self._file = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.cfg.config_file.get("run_trace", False)
+
+    def begin_map(self, map_file: str):
+        """设置当前地图，之后的事件都记在该地图下"""
+        self.map_file = map_file
+
+    def emit(self, event: str, **fields):
+        """
+        说明：
+            记录一个事件
+        参数：
+            :param event: 事件类型，如 step、match、capture、fight_start、fight_end、load、key
+            :param fields: 事件内容
+        """
+        if not self.enabled:
+            return
+        if self._thread is None:
+            self._start()
+        fields["ts"] = round(time.time(), 4)
+        fields["event"] = event
+        fields["map"] = self.map_file
+        try:
+            self._queue.put_nowait(fields)
+        except queue.Full:
+            self.dropped += 1
+
+    def record_step(self, phase: str, step, elapsed: float):
+        """
+        记录一个路线步骤的开始时间与耗时，可直接作为 OpRegistry 的监听函数
+        """
+        if not self.enabled:
+            return
+        value = step.value if isinstance(step.value, (int, float, str, bool)) else str(step.value)
+        self.emit("step", phase=phase, index=step.index, op=step.op, key=step.key, value=value,
+                  start=round(time.time() - elapsed, 4), ms=round(elapsed * 1000, 1))
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            os.makedirs(self.trace_dir, exist_ok=True)
+            self._remove_expired()
+            self._thread = threading.Thread(
+                target=self._run, name="run_trace", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _remove_expired(self):
+        """删除超过保留天数的记录文件"""
+        expire_time = time.time() - self.RETENTION_DAYS * 86400
+        for name in os.listdir(self.trace_dir):
+            path = os.path.join(self.trace_dir, name)
+            try:
+                if name.endswith(".jsonl") and os.path.getmtime(path) < expire_time:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def _open(self):
+        suffix = f".{self._part}" if self._part else ""
+        path = os.path.join(self.trace_dir, f"{RUN_ID}{suffix}.jsonl")
+        return open(path, "ab")
+
+    @staticmethod
+    def _encode(event: dict) -> bytes:
+        """序列化一个事件，无法序列化时丢弃该事件，不影响后台线程继续写入"""
+        try:
+            return orjson.dumps(event, option=orjson.OPT_SERIALIZE_NUMPY) + b"\n"
+        except TypeError as e:
+            log.warning(f"运行记录事件无法序列化，已丢弃：{event.get('event')} {e}")
+            return b""
+
+    def _run(self):
+        """后台写入，每次取出队列中的全部事件后一次写入"""
+        try:
+            self._file = self._open()
+        except OSError as e:
+            log.warning(f"运行记录文件无法打开，将不记录：{e}")
+            return
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            closing = None in batch
+            lines = b"".join(self._encode(event) for event in batch if event is not None)
+            try:
+                self._file.write(lines)
+                self._file.flush()
+                if self._file.tell() > self.MAX_FILE_SIZE:
+                    self._file.close()
+                    self._part += 1
+                    self._file = self._open()
+            except (OSError, ValueError) as e:  # ValueError: 切换文件失败后写入已关闭的文件
+                log.debug(f"写入运行记录失败：{e}")
+            for _ in batch:
+                self._queue.task_done()
+            if closing:
+                self._file.close()
+                return
+
+    def close(self, timeout: float = 2.0):
+        """写入剩余事件并结束后台线程"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        if self.dropped:
+            log.info(f"运行记录队列已满，丢弃{self.dropped}条事件")
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
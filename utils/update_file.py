@@ -4,23 +4,107 @@
 # Created by AlisaCat at 2023/5/11
 
 import os
+import sys
 import time
 import shutil
 import asyncio
+import random
 import hashlib
+import threading
+import orjson
 
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm as tq
 from zipfile import ZipFile, BadZipFile
-from typing import Dict, Optional, Any, Union, Tuple, List
+from typing import Dict, Optional, Any, Union, Tuple, List, Callable, Awaitable
 
-from utils.log import log
+from utils.log import LOG_DIR, log
 from utils.requests import *
 from utils.exceptions import CustomException
 from utils.config import ConfigurationManager
 
 cfg = ConfigurationManager()
 tmp_dir = 'tmp'
+HASH_CACHE_FILE = os.path.join(LOG_DIR, 'hash_cache.json')  # 文件哈希缓存 {路径: [大小, 修改时间, 哈希]}
+HASH_CHUNK_SIZE = 1024 * 1024
+hash_cache_lock = threading.Lock()  # 地图与图片可能同时更新，读写哈希缓存时加锁
+RAW_BASE = 'https://raw.githubusercontent.com/Starry-Wind/SRA'  # 资源仓库地址，可替换为本地镜像
+MAX_CONNECTIONS = 8  # 增量更新时的最大并发下载数
+RETRY_TIMES = 3  # 网络请求的最大尝试次数
+RETRY_BASE_DELAY = 2  # 首次重试的基础等待时间（秒），之后每次翻倍
+
+def file_md5(file_path: Path) -> str:
+    """分块计算文件的md5"""
+    hasher = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def load_hash_cache() -> dict:
+    with hash_cache_lock:
+        return _read_hash_cache()
+
+def _read_hash_cache() -> dict:
+    try:
+        with open(HASH_CACHE_FILE, 'rb') as f:
+            return orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError):
+        return {}
+
+def update_hash_cache(entries: Dict[str, list]):
+    """
+    说明：
+        在锁内读取哈希缓存、合并新记录并保存，避免同时更新时覆盖其他任务写入的记录
+    参数：
+        :param entries: {文件地址: [大小, 修改时间, 哈希]}
+    """
+    if not entries:
+        return
+    with hash_cache_lock:
+        cache = _read_hash_cache()
+        cache.update(entries)
+        _write_hash_cache(cache)
+
+def _write_hash_cache(cache: dict):
+    try:
+        os.makedirs(os.path.dirname(HASH_CACHE_FILE), exist_ok=True)
+        with open(HASH_CACHE_FILE, 'wb') as f:
+            f.write(orjson.dumps(cache))
+    except OSError as e:
+        log.debug(f'[资源文件更新]保存哈希缓存失败: {e}')
+
+async def hash_files(paths: List[Path]) -> Dict[str, str]:
+    """
+    说明：
+        计算文件的md5，大小与修改时间未变化的文件直接使用缓存的哈希值，其余文件在线程池中分块计算
+    参数：
+        :param paths: 文件地址列表
+    返回:
+        :return {文件地址: md5}
+    """
+    cache = load_hash_cache()
+    stats = {str(file_path): (file_path, os.stat(file_path)) for file_path in paths}
+
+    def cached(key, stat):
+        entry = cache.get(key)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+        return None
+
+    to_hash = [(key, file_path, stat) for key, (file_path, stat) in stats.items() if cached(key, stat) is None]
+    if to_hash:
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as pool:
+            digests = await asyncio.gather(
+                *(loop.run_in_executor(pool, file_md5, file_path) for _, file_path, _ in to_hash))
+        entries = {key: [stat.st_size, stat.st_mtime_ns, digest]
+                   for (key, _, stat), digest in zip(to_hash, digests)}
+        cache.update(entries)
+        update_hash_cache(entries)
+    log.debug(f'[资源文件更新]计算{len(stats)}个文件的哈希，其中{len(stats) - len(to_hash)}个使用缓存')
+    return {key: cache[key][2] for key in stats}
 
 async def verify_file_hash(json_path: Path, keep_file: Optional[List[str]] = []) -> bool:
     """
@@ -31,23 +115,141 @@ async def verify_file_hash(json_path: Path, keep_file: Optional[List[str]] = [])
     返回:
         :return bool
     """
+    checks = []  # [(文件地址, 期望哈希)]
+    missing = None
     for data in json_path:
         file_path = Path() / data['path']
         if not os.path.exists(file_path):
-            return False, file_path
+            missing = file_path
+            break
         if os.path.isfile(file_path) and str(file_path) not in keep_file:
-            log.debug(hashlib.md5(file_path.read_bytes()).hexdigest())
-            if hashlib.md5(file_path.read_bytes()).hexdigest() != data['hash']:
-                return False, file_path
+            checks.append((file_path, data['hash']))
+
+    digests = await hash_files([file_path for file_path, _ in checks])
+    for file_path, expected in checks:
+        if digests[str(file_path)] != expected:
+            return False, file_path
+    if missing is not None:
+        return False, missing
     return True, None
 
-async def unzip(zip, zip_path: Path):
-    global tmp_dir
-    with ZipFile(zip, 'r') as zf:
-        for member in tq(zf.infolist(), desc='解压中'):
-            if member.filename.startswith(zip_path):
-                zf.extract(member, tmp_dir)
-                log.debug(f'[资源文件更新]正在提取{member.filename}')
+def backoff_delay(attempt: int) -> float:
+    """第 attempt 次重试前的等待时间：指数增长并加入随机抖动，避免并发的请求同时重试"""
+    return RETRY_BASE_DELAY * 2 ** attempt * random.uniform(0.5, 1.5)
+
+async def retry(func: Callable[[], Awaitable[Any]], desc: str) -> Any:
+    """
+    说明：
+        执行网络请求，失败时按 backoff_delay 等待后重试，最多尝试 RETRY_TIMES 次
+    参数：
+        :param func: 无参数的异步函数
+        :param desc: 请求说明，用于日志
+    """
+    for attempt in range(RETRY_TIMES):
+        try:
+            return await func()
+        except Exception as e:
+            if attempt == RETRY_TIMES - 1:
+                log.info(f'[资源文件更新]{desc}失败: {e}')
+                break
+            delay = backoff_delay(attempt)
+            log.info(f'[资源文件更新]{desc}失败, {delay:.1f}秒后重试: {e}')
+            await asyncio.sleep(delay)
+    log.info(f'[资源文件更新]重试次数已达上限，退出程序')
+    raise Exception(f'[资源文件更新]{desc}重试次数已达上限，退出程序')
+
+def raw_url(raw_proxy: str, version: str, path: str) -> str:
+    """
+    说明：
+        拼接资源仓库中文件的下载地址
+    参数：
+        :param raw_proxy: rawgithub代理
+        :param version: 分支
+        :param path: 文件在仓库中的路径
+    """
+    url = f'{RAW_BASE}/{version}/{path}'
+    return f'{raw_proxy}{url}' if 'http' in raw_proxy or raw_proxy == '' else url.replace('raw.githubusercontent.com', raw_proxy)
+
+def invalidate_resource_caches():
+    """资源文件已覆盖，清除路径缓存与已加载的模板图片"""
+    ConfigurationManager.path_resolver.invalidate()
+    img_module = sys.modules.get('utils.img')  # 只在识图模块已加载时清空，更新资源时不加载 cv2 与窗口模块
+    if img_module is not None:
+        img_module.TemplateCache().clear()
+
+def is_keep_file(file_path: Path, keep_file: List[str]) -> bool:
+    """文件名包含 keep_file 中任一字符串时保留本地文件"""
+    return any(ex_file in file_path.name for ex_file in keep_file)
+
+async def update_file_delta(raw_proxy: str, type: str, version: str, manifest: List[dict], keep_file: Optional[List[str]] = [],
+                            unzip_path: str = "", keep_folder: Optional[List[str]] = []) -> Tuple[int, int]:
+    """
+    说明：
+        按文件清单增量更新：只下载本地缺失或哈希不一致的文件，并删除上次清单中有、本次清单中没有的文件。
+        没有上次的清单时（首次增量更新），删除 unzip_path 下所有不在本次清单中的文件
+    参数：
+        :param raw_proxy: rawgithub代理
+        :param type: 更新文件的类型 map\picture
+        :param version: 分支
+        :param manifest: 远程文件清单 [{'path', 'hash'}]
+        :param keep_file: 保存的文件
+        :param unzip_path: 资源文件目录，没有上次的清单时在该目录中查找需要删除的文件
+        :param keep_folder: unzip_path 下保存的文件夹
+    返回:
+        :return (下载的文件数量, 删除的文件数量)
+    """
+    paths = [Path() / data['path'] for data in manifest]
+    local = await hash_files([file_path for file_path in paths if file_path.is_file()])
+    changed = [(data, file_path) for data, file_path in zip(manifest, paths)
+               if not is_keep_file(file_path, keep_file) and local.get(str(file_path)) != data['hash']]
+    log.info(f'[资源文件更新]增量更新：共{len(manifest)}个文件，需要下载{len(changed)}个')
+
+    semaphore = asyncio.Semaphore(MAX_CONNECTIONS)
+    async def fetch(data, file_path):
+        async with semaphore:
+            await retry(lambda: download(raw_url(raw_proxy, version, data['path']), file_path, data['hash'], progress=False),
+                        f'下载{data["path"]}')
+            log.debug(f'[资源文件更新]已下载{data["path"]}')
+    await asyncio.gather(*(fetch(data, file_path) for data, file_path in changed))
+
+    removed = 0
+    for file_path in stale_files(type, manifest, unzip_path, keep_folder):
+        if file_path.is_file() and not is_keep_file(file_path, keep_file):
+            os.remove(file_path)
+            removed += 1
+            log.debug(f'[资源文件更新]已删除{file_path}')
+    invalidate_resource_caches()
+    return len(changed), removed
+
+def stale_files(type: str, manifest: List[dict], unzip_path: str, keep_folder: List[str]) -> List[Path]:
+    """
+    说明：
+        本次清单中已没有的本地文件：有上次的清单时取两份清单的差集，
+        没有时列出 unzip_path 下不在本次清单中、也不在 keep_folder 中的文件
+    """
+    new_paths = {str(Path() / data['path']) for data in manifest}
+    old_manifest = load_manifest(type)
+    if old_manifest:
+        old_paths = {str(Path() / data['path']) for data in old_manifest}
+        return [Path(path) for path in sorted(old_paths - new_paths)]
+    if not manifest or not unzip_path or not os.path.isdir(unzip_path):  # 不扫描整个程序目录
+        return []
+    root = Path(unzip_path)
+    return [file_path for file_path in sorted(root.rglob('*'))
+            if file_path.is_file() and str(file_path) not in new_paths
+            and file_path.relative_to(root).parts[0] not in keep_folder]
+
+def load_manifest(type: str) -> List[dict]:
+    """读取上次更新完成时保存的文件清单，用于判断远程删除的文件"""
+    try:
+        return orjson.loads((Path(LOG_DIR) / f'{type}_list.json').read_bytes())
+    except (OSError, orjson.JSONDecodeError):
+        return []
+
+def save_manifest(type: str, manifest: List[dict]):
+    manifest_path = Path(LOG_DIR) / f'{type}_list.json'
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    manifest_path.write_bytes(orjson.dumps(manifest))
 
 async def remove_file(folder_path: Path,keep_folder: Optional[List[str]] = [],keep_file: Optional[List[str]] = []) -> None:
     if os.path.exists(folder_path):
@@ -58,29 +260,71 @@ async def remove_file(folder_path: Path,keep_folder: Optional[List[str]] = [],ke
             elif os.path.isfile(item_path) and item not in keep_file:
                 os.remove(item_path)
 
-async def move_file(src_folder: Path, dst_folder,keep_folder: Optional[List[str]] = [],keep_file: Optional[List[str]] = []) -> None:
-
-
-    for item in cfg.get_file(src_folder,keep_folder,keep_file, True):
-        if dst_folder in item:
-            dst_path = item.replace(src_folder, "./")
-
-            # 创建目标文件夹（如果不存在）
-            if not os.path.exists(dst_path.rsplit("/",1)[0]) and dst_path.rsplit("/",1)[0] != '.':
-                os.makedirs(dst_path.rsplit("/",1)[0])
-            #dst_path = os.path.join(dst_folder, item)
-            shutil.copy(item, dst_path)
-    # 遍历源文件夹中的所有文件和文件夹
-    '''
-    for item in os.listdir(src_folder):
-        # 构造源文件路径和目标文件路径
-        src_path = os.path.join(src_folder, item)
-        dst_path = os.path.join(dst_folder, item)
-        if os.path.isdir(src_path) and item not in keep_folder:
-            shutil.copy(src_path, dst_path)
-        if os.path.isfile(src_path) and item not in keep_file:
-            shutil.copy(src_path, dst_path)
-    '''
+def member_path(root: Path, name: str) -> Path:
+    """
+    说明：
+        压缩包中文件的安装地址（相对 root），包含 ..、绝对路径或盘符等会写到 root 之外的文件名抛出 ValueError
+    参数：
+        :param root: 安装目录（绝对路径）
+        :param name: 去掉目录前缀后的文件名
+    """
+    target = (root / name).resolve()
+    if target == root or not target.is_relative_to(root):
+        raise ValueError(f'压缩包中的文件路径不安全: {name}')
+    return target.relative_to(root)
+
+def install_zip(zip: Path, zip_path: str, unzip_path: str, keep_file: Optional[List[str]] = [],
+                expected: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """
+    说明：
+        流式安装压缩包：zip_path 下的文件直接解压到目标位置旁的临时文件，边写边计算md5，
+        写完后原子替换目标文件，不经过 tmp 目录中转，中途退出也不会留下写了一半的文件。
+        写入前检查全部文件名，有文件会写到当前目录之外时不安装任何文件
+    参数：
+        :param zip: 压缩包地址
+        :param zip_path: 压缩包中需要安装的目录前缀
+        :param unzip_path: 只安装路径中包含该字符串的文件
+        :param keep_file: 文件名包含其中任一字符串时保留本地文件
+        :param expected: 文件清单中的哈希 {文件地址: md5}，不一致时不覆盖本地文件并抛出 ValueError
+    返回:
+        :return {文件地址: md5}
+    """
+    digests = {}
+    root = Path().resolve()
+    with ZipFile(zip, 'r') as zf:
+        members = [(member, member_path(root, member.filename[len(zip_path):].lstrip('/')))
+                   for member in zf.infolist()
+                   if member.filename.startswith(zip_path) and not member.is_dir()]
+        try:
+            for member, file_path in tq(members, desc='安装中'):
+                if unzip_path not in str(Path() / member.filename) or is_keep_file(file_path, keep_file):
+                    continue
+                file_path.parent.mkdir(parents=True, exist_ok=True)
+                part_path = file_path.with_name(file_path.name + '.part')
+                hasher = hashlib.md5()
+                try:
+                    with zf.open(member) as src, open(part_path, 'wb') as dst:
+                        while chunk := src.read(HASH_CHUNK_SIZE):
+                            hasher.update(chunk)
+                            dst.write(chunk)
+                    if expected and expected.get(str(file_path), hasher.hexdigest()) != hasher.hexdigest():
+                        raise ValueError(f'{file_path} 与文件清单的哈希不一致')
+                    os.replace(part_path, file_path)
+                except BaseException:
+                    part_path.unlink(missing_ok=True)
+                    raise
+                digests[str(file_path)] = hasher.hexdigest()
+                log.debug(f'[资源文件更新]已安装{file_path}')
+        finally:
+            if digests:  # 中途失败时已覆盖的文件也需要清除缓存
+                invalidate_resource_caches()
+    # 写入时已得到哈希，校验时无需再次读取
+    entries = {}
+    for key, digest in digests.items():
+        stat = os.stat(key)
+        entries[key] = [stat.st_size, stat.st_mtime_ns, digest]
+    update_hash_cache(entries)
+    return digests
 
 async def update_file(url_proxy: str="",
                       raw_proxy: str="",
@@ -93,7 +337,8 @@ async def update_file(url_proxy: str="",
                       keep_folder: Optional[List[str]] = [],
                       keep_file: Optional[List[str]] = [],
                       zip_path: str="",
-                      name: str="") -> bool:
+                      name: str="",
+                      delta: bool=False) -> bool:
     """
     说明：
         更新文件
@@ -110,12 +355,13 @@ async def update_file(url_proxy: str="",
         :param keep_file: 保存的文件
         :param zip_path: 需要移动的文件地址
         :param name: 更新的文件名称
+        :param delta: 是否按文件清单增量更新，不下载压缩包
     """
     global tmp_dir
 
-    url_version = f'{raw_proxy}https://raw.githubusercontent.com/Starry-Wind/SRA/{version}/version.json' if 'http' in raw_proxy or raw_proxy == '' else f'https://raw.githubusercontent.com/Starry-Wind/SRA/{version}/version.json'.replace('raw.githubusercontent.com', raw_proxy)
+    url_version = raw_url(raw_proxy, version, 'version.json')
     url_zip = url_proxy+url_zip if 'http' in url_proxy or url_proxy == '' else url_zip.replace('github.com', url_proxy)
-    url_list = f'{raw_proxy}https://raw.githubusercontent.com/Starry-Wind/SRA/{version}/{type}_list.json' if 'http' in raw_proxy or raw_proxy == '' else f'https://raw.githubusercontent.com/Starry-Wind/SRA/{version}/{type}_list.json'.replace('raw.githubusercontent.com', raw_proxy)
+    url_list = raw_url(raw_proxy, version, f'{type}_list.json')
     
     #tmp_zip = os.path.join(tmp_dir, f'{type}.zip')
     tmp_zip = Path() / tmp_dir / f'{type}.zip'
@@ -127,95 +373,72 @@ async def update_file(url_proxy: str="",
     elif rm_all:
         ConfigurationManager.modify_json_file(ConfigurationManager.CONFIG_FILE_NAME, f"{type}_version", "0")
 
-    log.info(f'[资源文件更新]正在检查远程版本是否有更新...')
+    log.info(f'[资源文件更新]正在检查{name}远程版本是否有更新...')
 
-    for index, _ in enumerate(range(3)):
-        try:
-            remote_version = await get(url_version)
-            remote_version = remote_version.json()['version']
-            break
-        except BaseException as e:
-            if index < 2:
-                log.info(f'[资源文件更新]获取远程版本失败, 正在重试: {e}')
-            else:
-                log.info(f'[资源文件更新]获取远程版本失败: {e}')
-            log.info("将在10秒后重试")
-            await asyncio.sleep(10)
-    else:
-        log.info(f'[资源文件更新]重试次数已达上限，退出程序')
-        raise Exception(f'[资源文件更新]重试次数已达上限，退出程序')
+    async def get_json(url):
+        response = await get(url)
+        response.raise_for_status()
+        return response.json()
+
+    remote_version = (await retry(lambda: get_json(url_version), f'获取{name}远程版本'))['version']
+
+    log.info(f'[资源文件更新]获取{name}远程版本成功: {remote_version}')
 
-    log.info(f'[资源文件更新]获取远程版本成功: {remote_version}')
+    local_version = cfg.config_file.get(f'{type}_version', '0')
 
-    local_version = cfg.read_json_file(cfg.CONFIG_FILE_NAME).get(f'{type}_version', '0')
+    if remote_version != local_version and delta:
+        log.info(f'[资源文件更新]本地版本与远程版本不符，开始增量更新资源文件: {local_version} -> {remote_version}')
+        map_list = await retry(lambda: get_json(url_list), f'获取{name}文件列表')
 
-    if remote_version != local_version:
+        downloaded, removed = await update_file_delta(raw_proxy, type, version, map_list, keep_file,
+                                                      unzip_path, keep_folder)
+        log.info(f'[资源文件更新]增量更新完成，下载{downloaded}个文件，删除{removed}个文件')
+
+        verify, path = await verify_file_hash(map_list, keep_file)
+        if not verify:
+            raise Exception(f"[资源文件更新]{path}校验失败, 程序退出")
+
+        save_manifest(type, map_list)
+        log.info(f'[资源文件更新]校验完成, 更新本地{name}文件版本号 {local_version} -> {remote_version}')
+        ConfigurationManager.modify_json_file(ConfigurationManager.CONFIG_FILE_NAME, f"{type}_version", remote_version)
+    elif remote_version != local_version:
         log.info(f'[资源文件更新]本地版本与远程版本不符，开始更新资源文件->{url_zip}')
-        for _ in range(3):
-            try:
-                await download(url_zip, tmp_zip)
-                log.info(f'[资源文件更新]下载更新包成功, 正在覆盖本地文件: {local_version} -> {remote_version}')
-                await unzip(tmp_zip, zip_path)
-                break
-            except BadZipFile:
-                log.info(f'[资源文件更新]下载压缩包失败, 重试中: BadZipFile')
-            except BaseException as e:
-                log.info(f'[资源文件更新]下载压缩包失败: {e}')
-            log.info("将在10秒后重试")
-            await asyncio.sleep(10)
-        else:
-            log.info(f'[资源文件更新]重试次数已达上限，退出程序')
-            raise Exception(f'[资源文件更新]重试次数已达上限，退出程序')
+        # 先获取文件清单，安装时逐个文件校验，压缩包损坏时不会覆盖本地文件
+        map_list = await retry(lambda: get_json(url_list), f'获取{name}校验文件')
+        expected = {str(Path() / data['path']): data['hash'] for data in map_list}
 
+        async def download_and_install():
+            await download(url_zip, tmp_zip)
+            log.info(f'[资源文件更新]下载更新包成功, 正在覆盖本地文件: {local_version} -> {remote_version}')
+            try:
+                # 解压与计算哈希在线程中执行，不阻塞同时进行的其他资源更新
+                return await asyncio.get_running_loop().run_in_executor(
+                    None, install_zip, tmp_zip, zip_path, unzip_path, keep_file, expected)
+            except (ValueError, BadZipFile):
+                tmp_zip.unlink(missing_ok=True)  # 压缩包损坏，重试时重新下载
+                raise
 
-        #shutil.rmtree('..\SRA-beta-2.7')
-        #await remove_file(unzip_path, keep_folder, keep_file)
-        await move_file(os.path.join(tmp_dir, zip_path), unzip_path, [], keep_file)
+        installed = await retry(download_and_install, f'下载{name}压缩包')
+        log.info(f'[资源文件更新]已安装{len(installed)}个文件')
 
         log.info(f'[资源文件更新]正在校验资源文件')
-        for _ in range(3):
-            try:
-                map_list = await get(url_list)
-                map_list = map_list.json()
-                break
-            except BaseException as e:
-                log.info(f'[资源文件更新]校验文件下载失败: {e}')
-            log.info("将在10秒后重试")
-            await asyncio.sleep(10)
-        else:
-            log.info(f'[资源文件更新]重试次数已达上限，退出程序')
-            raise Exception(f'[资源文件更新]重试次数已达上限，退出程序')
-        
         verify, path = await verify_file_hash(map_list, keep_file)
         if not verify:
             raise Exception(f"[资源文件更新]{path}校验失败, 程序退出")
 
+        save_manifest(type, map_list)
         log.info(f'[资源文件更新]校验完成, 更新本地{name}文件版本号 {local_version} -> {remote_version}')
 
         # 更新版本号
         ConfigurationManager.modify_json_file(ConfigurationManager.CONFIG_FILE_NAME, f"{type}_version", remote_version)
 
-        log.info(f'[资源文件更新]删除临时文件{tmp_dir}')
-        shutil.rmtree(tmp_dir, ignore_errors=True)
+        log.info(f'[资源文件更新]删除临时文件{tmp_zip}')
+        tmp_zip.unlink(missing_ok=True)
     else:
-        log.info(f'[资源文件更新]资源文件已是最新版本 {local_version} = {remote_version}')
+        log.info(f'[资源文件更新]{name}资源文件已是最新版本 {local_version} = {remote_version}')
         if not skip_verify:
             log.info(f'[资源文件更新]准备校验资源文件')
-            for index, _ in enumerate(range(3)):
-                try:
-                    remote_map_list = await get(url_list)
-                    remote_map_list = remote_map_list.json()
-                    break
-                except BaseException as e:
-                    if index < 2:
-                        log.info(f'[资源文件更新]获取{name}文件列表失败, 正在重试: {e}')
-                    else:
-                        log.info(f'[资源文件更新]获取{name}文件列表失败: {e}')
-                    log.info("将在10秒后重试")
-                    await asyncio.sleep(10)
-            else:
-                log.info(f'[资源文件更新]获取{name}文件列表重试次数已达上限，退出程序')
-                raise Exception(f'[资源文件更新]获取{name}文件列表重试次数已达上限，退出程序')
+            remote_map_list = await retry(lambda: get_json(url_list), f'获取{name}文件列表')
 
             log.debug(f'[资源文件更新]获取{name}文件列表成功.')
 
@@ -226,9 +449,50 @@ async def update_file(url_proxy: str="",
                 return "rm_all"
             log.info(f'[资源文件更新]文件校验完成.')
 
-    log.info(f'[资源文件更新]更新完成.')
+    log.info(f'[资源文件更新]{name}更新完成.')
     return True
 
+async def update_files(tasks: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    说明：
+        并发更新多种资源文件，共用同一个 httpx 连接池。
+        校验发现文件缺失的资源会强制重新更新一次
+    参数：
+        :param tasks: 每种资源的 update_file 参数，如 [{'type': 'map', ...}, {'type': 'picture', ...}]
+    返回:
+        :return {资源类型: update_file 的返回值}
+    """
+    async def run(task):
+        status = await update_file(**task)
+        if status == "rm_all":
+            await asyncio.sleep(3)
+            status = await update_file(**{**task, 'rm_all': True})
+        elif status == "download_error":
+            status = await update_file(**task)
+        return status
+
+    start_time = time.perf_counter()
+    try:
+        results = await asyncio.gather(*(run(task) for task in tasks))
+    finally:
+        await close_client()
+        if os.path.isdir(tmp_dir) and not os.listdir(tmp_dir):
+            os.rmdir(tmp_dir)
+    log.info(f'[资源文件更新]{len(tasks)}种资源文件更新完成，用时{time.perf_counter() - start_time:.2f}秒')
+    return {task.get('type', ''): status for task, status in zip(tasks, results)}
+
+def update_files_main(tasks: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    说明：
+        同步执行 update_files
+    参数：
+        :param tasks: 每种资源的 update_file 参数
+    """
+    if os.name == 'nt':
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    for task in tasks:
+        log.info(f'[资源文件更新]即将资源文件更新，本操作会覆盖本地{task.get("name", "")}文件..')
+    return asyncio.run(update_files(tasks))
 
 def update_file_main(url_proxy: str="",
                     raw_proxy: str="",
@@ -241,7 +505,8 @@ def update_file_main(url_proxy: str="",
                     keep_folder: Optional[List[str]] = [],
                     keep_file: Optional[List[str]] = [],
                     zip_path: str="",
-                    name: str=""):
+                    name: str="",
+                    delta: bool=False):
     """
     说明：
         更新文件
@@ -257,12 +522,9 @@ def update_file_main(url_proxy: str="",
         :param keep_file: 保存的文件
         :param zip_path: 需要移动的文件地址
         :param name: 更新的文件名称
+        :param delta: 是否按文件清单增量更新
     """
-    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
-    log.info(f'[资源文件更新]即将资源文件更新，本操作会覆盖本地{name}文件..')
-    check_file_status = asyncio.run(update_file(url_proxy,raw_proxy,False,skip_verify,type,version,url_zip,unzip_path,keep_folder,keep_file,zip_path,name))
-    if check_file_status == "rm_all":
-        time.sleep(3)
-        check_file_status = asyncio.run(update_file(url_proxy,raw_proxy,True,skip_verify,type,version,url_zip,unzip_path,keep_folder,keep_file,zip_path,name))
-    elif check_file_status == "download_error":
-        check_file_status = asyncio.run(update_file(url_proxy,raw_proxy,False,skip_verify,type,version,url_zip,unzip_path,keep_folder,keep_file,zip_path,name))
+    return update_files_main([dict(url_proxy=url_proxy, raw_proxy=raw_proxy, rm_all=False, skip_verify=skip_verify,
+                                   type=type, version=version, url_zip=url_zip, unzip_path=unzip_path,
+                                   keep_folder=keep_folder, keep_file=keep_file, zip_path=zip_path,
+                                   name=name, delta=delta)])[type]
@@ -0,0 +1,75 @@
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Callable
+
+from utils.log import log
+from utils.singleton import SingletonMeta
+
+
+class VisionJob(Future):
+    """
+    识图任务，结果通过 Future 获取。任务函数的第一个参数为任务本身，
+    应使用 job.wait(秒) 代替 time.sleep，取消后立即返回 True
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._cancel_event = threading.Event()
+
+    def cancel(self) -> bool:
+        """请求取消：未开始的任务直接取消，执行中的任务在下一次 wait 时结束"""
+        self._cancel_event.set()
+        return super().cancel()
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def wait(self, timeout: float) -> bool:
+        """等待 timeout 秒，返回期间是否被取消"""
+        return self._cancel_event.wait(timeout)
+
+
+class VisionWorker(metaclass=SingletonMeta):
+    """
+    常驻的识图线程：按顺序执行提交的识图任务（如确认疾跑已开启），
+    避免每次移动都创建线程与事件循环
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, func: Callable, *args, **kwargs) -> VisionJob:
+        """
+        说明：
+            提交识图任务，立即返回
+        参数：
+            :param func: 任务函数，调用方式为 func(job, *args, **kwargs)
+        返回：
+            :return 任务，可用 cancel() 取消、result() 获取结果
+        """
+        self._start()
+        job = VisionJob()
+        self._queue.put((job, func, args, kwargs))
+        return job
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="vision_worker", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            job, func, args, kwargs = self._queue.get()
+            if not job.set_running_or_notify_cancel():
+                continue
+            try:
+                job.set_result(func(job, *args, **kwargs))
+            except Exception as e:
+                log.warning(f"识图任务出错：{e}")
+                job.set_exception(e)
@@ -0,0 +1,138 @@
+import asyncio
+import atexit
+import threading
+
+import httpx
+
+from utils.config import ConfigurationManager
+from utils.log import log
+from utils.singleton import SingletonMeta
+
+
+class WebhookDispatcher(metaclass=SingletonMeta):
+    """
+    后台发送 Webhook 消息：独立线程运行事件循环并复用同一个 httpx 连接池，
+    BATCH_WINDOW 秒内的消息合并为一条发送，失败时按指数退避重试，调用方不会被阻塞
+    """
+    BATCH_WINDOW = 2.0  # 合并消息的时间窗口（秒）
+    MAX_CONTENT = 1900  # 单条消息最大长度
+    MAX_RETRIES = 3  # 最大重试次数
+    RETRY_DELAY = 1.0  # 首次重试等待时间（秒），之后每次翻倍
+    TIMEOUT = 10
+
+    def __init__(self):
+        self.cfg = ConfigurationManager()
+        self.sent = 0  # 成功发送的请求数量
+        self.failed = 0  # 重试后仍失败的请求数量
+        self._loop = None
+        self._queue = None
+        self._client = None
+        self._thread = None
+        self._pending = 0  # 尚未发送完成的消息数量
+        self._idle = threading.Condition()
+        self._lock = threading.Lock()
+
+    def send(self, message: str, url: str = None):
+        """
+        说明：
+            提交一条消息，立即返回
+        参数：
+            :param message: 消息内容
+            :param url: Webhook 地址，默认使用配置中的 webhook_url
+        """
+        url = url or self.cfg.config_file.get("webhook_url")
+        if not url:
+            return
+        self._start()
+        with self._idle:
+            self._pending += 1
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, (url, message))
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """
+        等待已提交的消息发送完成（跳过合并等待），返回是否全部完成
+        """
+        if self._thread is None:
+            return True
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, None)
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            self._queue = asyncio.Queue()
+            self._thread = threading.Thread(
+                target=self._run, name="webhook", daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._client = httpx.AsyncClient(timeout=self.TIMEOUT)
+        self._loop.run_until_complete(self._consume())
+
+    async def _consume(self):
+        """取出第一条消息后等待 BATCH_WINDOW 秒，将期间的消息按地址合并发送"""
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                continue
+            batch = [item]
+            loop_time = self._loop.time
+            deadline = loop_time() + self.BATCH_WINDOW
+            while (remaining := deadline - loop_time()) > 0:
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:  # flush，立即发送
+                    break
+                batch.append(item)
+            messages = {}
+            for url, message in batch:
+                messages.setdefault(url, []).append(message)
+            for url, contents in messages.items():
+                try:
+                    for content in self._split(contents):
+                        await self._post(url, content)
+                except Exception as e:  # 如地址格式错误，记录后继续处理之后的消息
+                    self.failed += 1
+                    log.error(f"Webhook发送失败: {e!r}")
+            with self._idle:
+                self._pending -= len(batch)
+                self._idle.notify_all()
+
+    def _split(self, contents: list) -> list:
+        """将多条消息合并，每条不超过 MAX_CONTENT"""
+        chunks = []
+        current = ""
+        for content in contents:
+            content = content[:self.MAX_CONTENT]
+            if current and len(current) + len(content) + 1 > self.MAX_CONTENT:
+                chunks.append(current)
+                current = ""
+            current = f"{current}\n{content}" if current else content
+        if current:
+            chunks.append(current)
+        return chunks
+
+    async def _post(self, url: str, content: str):
+        delay = self.RETRY_DELAY
+        for attempt in range(self.MAX_RETRIES + 1):
+            try:
+                response = await self._client.post(url, json={"content": content})
+                response.raise_for_status()
+                self.sent += 1
+                return
+            except httpx.HTTPError as e:
+                client_error = isinstance(e, httpx.HTTPStatusError) and \
+                    400 <= e.response.status_code < 500 and e.response.status_code != 429
+                if client_error or attempt == self.MAX_RETRIES:
+                    self.failed += 1
+                    log.error(f"Webhook发送失败: {e}")
+                    return
+                await asyncio.sleep(delay)
+                delay *= 2